@@ -0,0 +1,158 @@
+"""
+Benchmark the log event formatting throughput
+
+Compares the per-event formatting (regex compiled on every call, `strftime` for
+every event and a validated `LogEvent` built for every formatted line) with
+the shared `LogEventFormatter`, and the validated `LogEventsList` parsing with
+the lightweight `LogEventsPage` records.
+
+Usage:
+    python benchmarks/log_formatting.py [--events N] [--repeat R]
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List
+
+from cloudwatcher.logwatcher import (
+    LogEvent,
+    LogEventFormatter,
+    LogEventsList,
+    LogEventsPage,
+)
+
+
+def make_events(n: int) -> List[LogEvent]:
+    """
+    Create synthetic log events, several events per second
+
+    Args:
+        n (int): number of events to create
+
+    Returns:
+        List[LogEvent]: the log events
+    """
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    return [
+        LogEvent(
+            message=f"[2023-01-01 00:00:00,{i % 1000:03d} - INFO] processed item {i}",
+            timestamp=start + timedelta(milliseconds=250 * i),
+        )
+        for i in range(n)
+    ]
+
+
+def make_response(events: List[LogEvent]) -> dict:
+    """
+    Create a synthetic `get_log_events` response
+
+    Args:
+        events (List[LogEvent]): the log events to include
+
+    Returns:
+        dict: the response
+    """
+    return {
+        "events": [
+            {
+                "message": event.message,
+                "timestamp": int(event.timestamp.timestamp() * 1000),
+            }
+            for event in events
+        ],
+        "nextForwardToken": "f/0",
+        "nextBackwardToken": "b/0",
+    }
+
+
+def legacy_format(events: List[LogEvent]) -> List[str]:
+    """
+    Format the events the way `LogEvent.format_message` used to
+    """
+    formatted = []
+    for event in events:
+        regex = r"^\[\d+-\d+-\d+\s\d+:\d+:\d+(.|,)\d+(\]|\s-\s\w+\])"
+        m = re.search(regex, event.message)
+        msg = event.message[m.end() :] if m else event.message
+        formatted_message = "[{time} UTC] {message}".format(
+            time=event.timestamp.strftime("%d-%m-%Y %H:%M:%S"), message=msg.strip()
+        )
+        formatted.append(
+            LogEvent(message=formatted_message, timestamp=event.timestamp).message
+        )
+    return formatted
+
+
+def formatter_format(events: List[LogEvent]) -> List[str]:
+    """
+    Format the events with a LogEventFormatter
+    """
+    return LogEventFormatter().format_events(events)
+
+
+def models_parse_format(response: dict) -> List[str]:
+    """
+    Parse the response into validated models and format them
+    """
+    return LogEventFormatter().format_events(
+        LogEventsList.from_response(response).events
+    )
+
+
+def records_parse_format(response: dict) -> List[str]:
+    """
+    Parse the response into lightweight records and format them
+    """
+    return LogEventFormatter().format_records(
+        LogEventsPage.from_response(response).events
+    )
+
+
+def measure(fun: Callable, arg: Any, n: int, repeat: int) -> float:
+    """
+    Measure the best throughput of the formatting function
+
+    Returns:
+        float: events per second
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun(arg)
+        best = min(best, time.perf_counter() - start)
+    return n / best
+
+
+def report(title: str, before: float, after: float) -> None:
+    print(title)
+    print(f"  before: {before:>12,.0f} events/s")
+    print(f"  after:  {after:>12,.0f} events/s ({after / before:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    assert legacy_format(events[:1000]) == formatter_format(events[:1000])
+    n = len(events)
+    report(
+        "format",
+        measure(legacy_format, events, n, args.repeat),
+        measure(formatter_format, events, n, args.repeat),
+    )
+    response = make_response(events)
+    assert models_parse_format(response) == records_parse_format(response)
+    report(
+        "parse + format",
+        measure(models_parse_format, response, n, args.repeat),
+        measure(records_parse_format, response, n, args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
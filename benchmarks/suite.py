@@ -0,0 +1,503 @@
+"""
+Benchmark suite for the metric and log hot paths
+
+Replays synthetic CloudWatch and CloudWatch Logs responses of realistic size
+through real boto3 clients, whose requests are answered locally with the
+serialized responses instead of being sent, so the suite runs offline and
+includes the botocore parsing. Measures the throughput (best of the repeats)
+and the peak memory (tracemalloc) of each benchmark and compares them with the
+baselines stored in `benchmarks/baselines.json`.
+
+Usage:
+    python benchmarks/suite.py [--filter NAME] [--repeat R] [--tolerance T]
+        [--update-baselines]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from botocore.awsrequest import AWSResponse  # noqa: E402
+from botocore.parsers import create_parser  # noqa: E402
+
+from cloudwatcher.governor import ApiGovernor, set_api_governor  # noqa: E402
+from cloudwatcher.logwatcher import (  # noqa: E402
+    LogEventsList,
+    LogEventsPage,
+    LogWatcher,
+)
+from cloudwatcher.metric_handlers import (  # noqa: E402
+    TimedMetricCsvSaver,
+    TimedMetricJsonSaver,
+    TimedMetricPlotter,
+    TimedMetricSummarizer,
+)
+from cloudwatcher.metricwatcher import MetricWatcher, get_metric_data  # noqa: E402
+from cloudwatcher.series_file import read_series, write_series  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+FAKE_CREDENTIALS = dict(
+    aws_access_key_id="benchmark",
+    aws_secret_access_key="benchmark",
+    aws_region_name="us-east-1",
+)
+CLOUDWATCH_XMLNS = "http://monitoring.amazonaws.com/doc/2010-08-01/"
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+# 7 days of 1-minute datapoints
+METRIC_DATAPOINTS = 10080
+METRIC_STATS = ["Maximum", "Average", "p99"]
+LOG_EVENTS_PER_PAGE = 10000
+LOG_PAGES = 5
+# the minimum duration of a timed sample, in seconds
+MIN_SAMPLE_TIME = 0.2
+# the minimum peak memory growth reported as a regression, in bytes
+MIN_MEMORY_GROWTH = 2**16
+
+
+class _RawBody:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class ReplayTransport:
+    """
+    Answer the requests of a client with queued serialized responses
+
+    The requests are signed and the responses parsed by botocore as usual,
+    only the network round trip is replaced.
+    """
+
+    def __init__(self, client) -> None:
+        self.responses: Deque[bytes] = deque()
+        client.meta.events.register("before-send", self._send)
+
+    def queue(self, *bodies: bytes) -> None:
+        self.responses.extend(bodies)
+
+    def _send(self, request, **kwargs) -> AWSResponse:
+        return AWSResponse(request.url, 200, {}, _RawBody(self.responses.popleft()))
+
+
+def metric_data_page(
+    ids: List[str], datapoints: int, offset: int = 0, next_token: Optional[str] = None
+) -> bytes:
+    """
+    Serialize a GetMetricData response page, newest datapoints first
+    """
+    results = []
+    for i, result_id in enumerate(ids):
+        timestamps = "".join(
+            f"<member>{(START + timedelta(minutes=offset + datapoints - j)).strftime('%Y-%m-%dT%H:%M:%SZ')}</member>"  # noqa: E501
+            for j in range(datapoints)
+        )
+        values = "".join(
+            f"<member>{1e9 + 1000.5 * ((offset + j) % 977) + i}</member>"
+            for j in range(datapoints)
+        )
+        results.append(
+            f"<member><Id>{result_id}</Id><Label>{result_id}</Label>"
+            f"<StatusCode>{'PartialData' if next_token else 'Complete'}</StatusCode>"
+            f"<Timestamps>{timestamps}</Timestamps><Values>{values}</Values></member>"
+        )
+    token = f"<NextToken>{next_token}</NextToken>" if next_token else ""
+    return (
+        f'<GetMetricDataResponse xmlns="{CLOUDWATCH_XMLNS}"><GetMetricDataResult>'
+        f"<MetricDataResults>{''.join(results)}</MetricDataResults>"
+        f"{token}<Messages/></GetMetricDataResult>"
+        "<ResponseMetadata><RequestId>benchmark</RequestId></ResponseMetadata>"
+        "</GetMetricDataResponse>"
+    ).encode()
+
+
+def log_events_response(events: int, page: int) -> Dict:
+    """
+    Create a GetLogEvents response page
+    """
+    first = page * events
+    start_ms = int(START.timestamp() * 1000)
+    return {
+        "events": [
+            {
+                "timestamp": start_ms + 250 * i,
+                "message": f"[2023-01-01 00:00:00,{i % 1000:03d} - INFO] "
+                f"processed item {i} in {i % 97} ms",
+                "ingestionTime": start_ms + 250 * i + 1000,
+            }
+            for i in range(first, first + events)
+        ],
+        "nextForwardToken": f"f/{page + 1:056d}",
+        "nextBackwardToken": f"b/{page:056d}",
+    }
+
+
+def log_events_page(events: int, page: int) -> bytes:
+    """
+    Serialize a GetLogEvents response page
+    """
+    return json.dumps(log_events_response(events, page)).encode()
+
+
+@dataclass
+class Benchmark:
+    """
+    A benchmark: the setup returns the measured function and the number of
+    items it processes
+    """
+
+    name: str
+    setup: Callable[[], Tuple[Callable[[], object], int]]
+    unit: str
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, unit: str):
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name=name, setup=setup, unit=unit)
+        return setup
+
+    return register
+
+
+def metric_watcher() -> Tuple[MetricWatcher, ReplayTransport]:
+    watcher = MetricWatcher(
+        namespace="NepheleNamespaceEC2",
+        dimensions_list=[],
+        metric_name="mem_used",
+        metric_id="mem_used",
+        metric_unit="Bytes",
+        **FAKE_CREDENTIALS,
+    )
+    return watcher, ReplayTransport(watcher.client)
+
+
+def metric_response() -> Dict:
+    watcher, transport = metric_watcher()
+    transport.queue(*metric_pages(watcher))
+    return query(watcher)
+
+
+def metric_pages(watcher: MetricWatcher) -> List[bytes]:
+    ids = list(watcher.stat_query_ids(METRIC_STATS))
+    half = METRIC_DATAPOINTS // 2
+    return [
+        metric_data_page(ids, half, offset=half, next_token="page-2"),
+        metric_data_page(ids, METRIC_DATAPOINTS - half),
+    ]
+
+
+def query(watcher: MetricWatcher) -> Dict:
+    return watcher.query_ec2_metrics(
+        days=7, hours=0, minutes=0, stat=METRIC_STATS, period=60
+    )
+
+
+@benchmark("metric_query", unit="datapoints")
+def bench_metric_query():
+    watcher, transport = metric_watcher()
+    pages = metric_pages(watcher)
+
+    def run():
+        transport.queue(*pages)
+        return query(watcher)
+
+    return run, METRIC_DATAPOINTS * len(METRIC_STATS)
+
+
+@benchmark("metric_query_compact", unit="datapoints")
+def bench_metric_query_compact():
+    watcher, transport = metric_watcher()
+    pages = metric_pages(watcher)
+
+    def run():
+        transport.queue(*pages)
+        end_time = START + timedelta(minutes=METRIC_DATAPOINTS)
+        return watcher.query_metric_series(
+            start_time=end_time - timedelta(days=7),
+            end_time=end_time,
+            stat=METRIC_STATS,
+            period=60,
+        )
+
+    return run, METRIC_DATAPOINTS * len(METRIC_STATS)
+
+
+class ParsingClient:
+    """
+    Answer GetMetricData with queued serialized pages, parsed by botocore
+
+    Only the parsing of the pages is done, the requests are neither built
+    nor signed.
+    """
+
+    def __init__(self, client) -> None:
+        service_model = client.meta.service_model
+        self.output_shape = service_model.operation_model("GetMetricData").output_shape
+        self.parser = create_parser(service_model.protocol)
+        self.pages: Deque[bytes] = deque()
+
+    def get_metric_data(self, **kwargs) -> Dict:
+        response = self.parser.parse(
+            {"status_code": 200, "headers": {}, "body": self.pages.popleft()},
+            self.output_shape,
+        )
+        response["ResponseMetadata"]["HTTPStatusCode"] = 200
+        return response
+
+
+@benchmark("metric_parsing", unit="datapoints")
+def bench_metric_parsing():
+    watcher, _ = metric_watcher()
+    client = ParsingClient(watcher.client)
+    pages = metric_pages(watcher)
+    queries = watcher.metric_data_queries(stat=METRIC_STATS, period=60)
+    end_time = START + timedelta(minutes=METRIC_DATAPOINTS)
+
+    def run():
+        client.pages.extend(pages)
+        response = get_metric_data(
+            client, queries, end_time - timedelta(days=7), end_time
+        )
+        return MetricWatcher.timed_metric_factory(response)
+
+    return run, METRIC_DATAPOINTS * len(METRIC_STATS)
+
+
+def timed_metric():
+    return MetricWatcher.timed_metric_factory(metric_response())[0]
+
+
+@benchmark("metric_summary", unit="datapoints")
+def bench_metric_summary():
+    handler = TimedMetricSummarizer(timed_metric())
+    return (
+        lambda: handler(target=None, metric_unit="Bytes", summarizer=("Max", max)),
+        METRIC_DATAPOINTS,
+    )
+
+
+@benchmark("metric_resample", unit="datapoints")
+def bench_metric_resample():
+    metric = timed_metric()
+    return (
+        lambda: metric.resample(period=3600, fill="previous"),
+        METRIC_DATAPOINTS,
+    )
+
+
+@benchmark("metric_csv_export", unit="datapoints")
+def bench_metric_csv_export():
+    handler = TimedMetricCsvSaver(timed_metric())
+    target = os.path.join(tempfile.mkdtemp(), "metric.csv")
+    return lambda: handler(target=target), METRIC_DATAPOINTS
+
+
+@benchmark("metric_json_export", unit="datapoints")
+def bench_metric_json_export():
+    handler = TimedMetricJsonSaver(timed_metric())
+    target = os.path.join(tempfile.mkdtemp(), "metric.json")
+    return lambda: handler(target=target), METRIC_DATAPOINTS
+
+
+@benchmark("metric_binary_export", unit="datapoints")
+def bench_metric_binary_export():
+    metric = timed_metric()
+    target = os.path.join(tempfile.mkdtemp(), "metric.cws")
+    return lambda: write_series(target, metric), METRIC_DATAPOINTS
+
+
+@benchmark("metric_binary_load", unit="datapoints")
+def bench_metric_binary_load():
+    target = os.path.join(tempfile.mkdtemp(), "metric.cws")
+    write_series(target, timed_metric())
+
+    def run():
+        metric = read_series(target)
+        metric.values.max()
+
+    return run, METRIC_DATAPOINTS
+
+
+@benchmark("metric_plot", unit="datapoints")
+def bench_metric_plot():
+    handler = TimedMetricPlotter(timed_metric())
+    target = os.path.join(tempfile.mkdtemp(), "metric.png")
+    return lambda: handler(target=target, metric_unit="Bytes"), METRIC_DATAPOINTS
+
+
+@benchmark("log_events_models", unit="events")
+def bench_log_events_models():
+    response = log_events_response(LOG_EVENTS_PER_PAGE, 0)
+    return lambda: LogEventsList.from_response(response), LOG_EVENTS_PER_PAGE
+
+
+@benchmark("log_events_records", unit="events")
+def bench_log_events_records():
+    response = log_events_response(LOG_EVENTS_PER_PAGE, 0)
+    return lambda: LogEventsPage.from_response(response), LOG_EVENTS_PER_PAGE
+
+
+@benchmark("log_format_messages", unit="events")
+def bench_log_format_messages():
+    events = LogEventsList.from_response(log_events_response(LOG_EVENTS_PER_PAGE, 0))
+    return events.format_messages, LOG_EVENTS_PER_PAGE
+
+
+def log_streaming(prefetch: bool):
+    watcher = LogWatcher(
+        log_group_name="benchmark", log_stream_name="benchmark", **FAKE_CREDENTIALS
+    )
+    transport = ReplayTransport(watcher.client)
+    pages = [log_events_page(LOG_EVENTS_PER_PAGE, i) for i in range(LOG_PAGES)]
+    # the stream ends after an empty page and the empty pages retries
+    empty = json.dumps(
+        {"events": [], "nextForwardToken": "f/end", "nextBackwardToken": "b/end"}
+    ).encode()
+
+    def run():
+        transport.queue(*pages, *[empty] * 6)
+        for _ in watcher.stream_formatted_logs(
+            events_limit=LOG_EVENTS_PER_PAGE, prefetch=prefetch
+        ):
+            pass
+
+    return run, LOG_EVENTS_PER_PAGE * LOG_PAGES
+
+
+@benchmark("log_streaming", unit="events")
+def bench_log_streaming():
+    return log_streaming(prefetch=False)
+
+
+@benchmark("log_streaming_prefetch", unit="events")
+def bench_log_streaming_prefetch():
+    return log_streaming(prefetch=True)
+
+
+def measure(bench: Benchmark, repeat: int) -> Dict[str, float]:
+    """
+    Measure the best throughput and the peak memory of the benchmark
+
+    Returns:
+        Dict[str, float]: items per second and peak memory in bytes
+    """
+    run, n = bench.setup()
+    # warm up the caches and calibrate the loops so each sample lasts long
+    # enough for the timer resolution
+    start = time.perf_counter()
+    run()
+    loops = max(1, int(MIN_SAMPLE_TIME / max(time.perf_counter() - start, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        best = min(best, (time.perf_counter() - start) / loops)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"throughput": n / best, "peak_memory": peak}
+
+
+def compare(
+    name: str, result: Dict[str, float], baseline: Optional[Dict], tolerance: float
+) -> bool:
+    """
+    Report the result against the baseline
+
+    Returns:
+        bool: whether the result regressed beyond the tolerance
+    """
+    unit = BENCHMARKS[name].unit
+    line = (
+        f"{name:<24} {result['throughput']:>14,.0f} {unit}/s "
+        f"{result['peak_memory'] / 2**20:>9.1f} MiB"
+    )
+    if baseline is None:
+        print(f"{line}   (no baseline)")
+        return False
+    speed = result["throughput"] / baseline["throughput"]
+    memory = result["peak_memory"] / max(baseline["peak_memory"], 1)
+    # the peak memory of the small benchmarks is within the allocator noise
+    grown = result["peak_memory"] - baseline["peak_memory"] > MIN_MEMORY_GROWTH
+    regressed = speed < 1 - tolerance or (memory > 1 + tolerance and grown)
+    print(
+        f"{line}   {speed:>5.2f}x speed {memory:>5.2f}x memory"
+        + ("   REGRESSION" if regressed else "")
+    )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", help="Run the benchmarks containing the string")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Relative slowdown or memory growth reported as a regression",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="Store the results as the new baselines",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    # the responses are local, the API rate limits do not apply
+    set_api_governor(ApiGovernor(rate_limits={}))
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = []
+    for name, bench in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(bench, args.repeat)
+        if compare(name, results[name], baselines.get(name), args.tolerance):
+            regressions.append(name)
+
+    if args.update_baselines:
+        baselines.update(
+            {
+                name: {key: round(value, 1) for key, value in result.items()}
+                for name, result in results.items()
+            }
+        )
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baselines to: {BASELINES_PATH}")
+    elif regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,23 @@
 import argparse
 from importlib.metadata import version
 
-from cloudwatcher.const import CLI_DEFAULTS, LOG_CMD, METRIC_CMD, SUBPARSER_MESSAGES
+from cloudwatcher.const import (
+    CLI_DEFAULTS,
+    COLLECT_CMD,
+    DISCOVER_CMD,
+    LOG_CMD,
+    LOG_EVENTS_LIMIT_MAX,
+    LOG_OUTPUT_FORMATS,
+    LOG_PARSER_NAMES,
+    METRIC_CMD,
+    SUBPARSER_MESSAGES,
+    TOP_CMD,
+    UPTIME_CMD,
+)
+from cloudwatcher.fleet import RANK_BY
+from cloudwatcher.metric_handlers import HANDLER_EXECUTORS
+from cloudwatcher.resampling import AGGREGATIONS, FILL_METHODS
+from cloudwatcher.uptime import REPORT_FORMATS
 
 cloudwatcher_version = version("cloudwatcher")
 
@@ -18,6 +34,30 @@ class _VersionInHelpParser(argparse.ArgumentParser):
         )
 
 
+def _period(value: str):
+    """Parse the period argument, 'auto' lets the query planner choose it."""
+    if value == "auto":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid period: '{value}', must be an integer or 'auto'"
+        )
+
+
+def _fill(value: str):
+    """Parse the fill argument, a fill method or a constant."""
+    if value in FILL_METHODS:
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid fill: '{value}', must be a number or one of: {FILL_METHODS}"
+        )
+
+
 def build_argparser():
     """Build argument parser"""
 
@@ -84,6 +124,25 @@ def build_argparser():
             required=False,
             metavar="T",
         )
+        sps[cmd].add_argument(
+            "--max-attempts",
+            help="Maximum number of attempts of the throttled or failed AWS API calls (default: %(default)s)",
+            default=CLI_DEFAULTS["max_attempts"],
+            type=int,
+            metavar="N",
+        )
+        sps[cmd].add_argument(
+            "--stats",
+            help="Whether to print the AWS API calls and handlers statistics at exit (default: %(default)s)",
+            action="store_true",
+        )
+        sps[cmd].add_argument(
+            "--stats-json",
+            help="Path to save the AWS API calls and handlers statistics to at exit, in JSON format",
+            default=None,
+            type=str,
+            metavar="F",
+        )
         sps[cmd].add_argument(
             "--save",
             help="Whether to save the results to files in the selected directory (default: %(default)s)",
@@ -160,8 +219,9 @@ def build_argparser():
     )
     preset.add_argument(
         "--preset-dir",
-        help="Path to the preset directory",
+        help="Path to the preset directory. Can be specified multiple times, the presets found in the directories specified first take precedence",
         default=None,
+        action="append",
         type=str,
         metavar="D",
     )
@@ -194,33 +254,128 @@ def build_argparser():
     sps[METRIC_CMD].add_argument(
         "-s",
         "--stat",
-        help="The statistic to apply over the time intervals, e.g. 'Maximum' (default: %(default)s)",
+        help="The statistics to apply over the time intervals, e.g. 'Maximum Average p99'. Multiple statistics are retrieved in a single request (default: %(default)s)",
         default=CLI_DEFAULTS["stat"],
         type=str,
+        nargs="+",
         metavar="S",
     )
     sps[METRIC_CMD].add_argument(
         "-p",
         "--period",
         help="""
-            The granularity, in seconds, of the returned data points. Choices: 1, 5, 10, 30, 60, or any multiple of 60 (default: %(default)s).
-            It affects the data availability. See the docs 'Usage' section for more details.
+            The granularity, in seconds, of the returned data points. Choices: 1, 5, 10, 30, 60, any multiple of 60 or 'auto' (default: %(default)s).
+            It affects the data availability. With 'auto' the period is chosen to fit the --max-datapoints budget and the data retention.
+            See the docs 'Usage' section for more details.
             """,
         default=CLI_DEFAULTS["period"],
+        type=_period,
+        metavar="P",
+    )
+    sps[METRIC_CMD].add_argument(
+        "--max-datapoints",
+        help="The datapoints budget used to choose the period with '--period auto' (default: %(default)s)",
+        default=CLI_DEFAULTS["max_datapoints"],
+        type=int,
+        metavar="N",
+    )
+    sps[METRIC_CMD].add_argument(
+        "--high-resolution",
+        help="Whether the metric is a high resolution metric, which allows sub-minute periods with '--period auto' (default: %(default)s)",
+        action="store_true",
+    )
+    resampling = sps[METRIC_CMD].add_argument_group(
+        "RESAMPLING",
+        "Roll the data points up to coarser buckets before they are reported.",
+    )
+    resampling.add_argument(
+        "--resample",
+        help="The bucket size, in seconds, to resample the data points to. Not resampled if not provided",
+        default=None,
         type=int,
         metavar="P",
     )
+    resampling.add_argument(
+        "--aggregation",
+        help="The aggregation of the data points of each bucket. Defaults to the aggregation matching the statistic, e.g. 'max' for 'Maximum'",
+        choices=AGGREGATIONS,
+        default=None,
+        type=str,
+    )
+    resampling.add_argument(
+        "--fill",
+        help=f"How to fill the buckets without data points: a number or one of {FILL_METHODS}. Dropped if not provided",
+        default=None,
+        type=_fill,
+        metavar="F",
+    )
     sps[METRIC_CMD].add_argument(
         "--plot",
         help="Whether to plot the metric data (default: %(default)s)",
         action="store_true",
     )
+    sps[METRIC_CMD].add_argument(
+        "--binary",
+        help="Whether to also save the metric data in the binary series format, that can be memory-mapped. Used with `--save` (default: %(default)s)",
+        action="store_true",
+    )
+    sps[METRIC_CMD].add_argument(
+        "--low-memory",
+        help="Whether to parse the response into compact series, without keeping the raw response, and handle them one at a time to bound the memory used. The raw response is neither logged nor saved (default: %(default)s)",
+        action="store_true",
+    )
+    sps[METRIC_CMD].add_argument(
+        "--handler-workers",
+        help="Maximum number of series saved or plotted in parallel (default: %(default)s)",
+        default=CLI_DEFAULTS["handler_workers"],
+        type=int,
+        metavar="N",
+    )
+    sps[METRIC_CMD].add_argument(
+        "--handler-executor",
+        help="Where the series are saved and plotted with `--handler-workers`. By default the plots are drawn in a process pool and the files written in a thread pool",
+        choices=HANDLER_EXECUTORS,
+        default=None,
+        type=str,
+    )
     sps[METRIC_CMD].add_argument(
         "--namespace",
         help="Namespace to monitor the metrics within. This value must match the 'Namespace' value in the CloudWatchAgent config.",
         type=str,
         metavar="N",
     )
+    for cmd in [METRIC_CMD, COLLECT_CMD]:
+        store = sps[cmd].add_argument_group(
+            "LOCAL STORE",
+            "Keep the metric data points in a local SQLite database, beyond the CloudWatch retention.",
+        )
+        store.add_argument(
+            "--store",
+            help="Path to the local store database the data points are written to",
+            default=None,
+            type=str,
+            metavar="F",
+        )
+        store.add_argument(
+            "--compact-days",
+            help="Downsample the stored data points older than this number of days to '--compact-period'. Not compacted if not provided",
+            default=None,
+            type=int,
+            metavar="D",
+        )
+        store.add_argument(
+            "--compact-period",
+            help="The granularity, in seconds, of the compacted data points (default: %(default)s)",
+            default=CLI_DEFAULTS["compact_period"],
+            type=int,
+            metavar="P",
+        )
+        if cmd == METRIC_CMD:
+            store.add_argument(
+                "--offline",
+                help="Whether to read the data points from the local store instead of querying CloudWatch. With '--period auto' the stored data points are returned (default: %(default)s)",
+                action="store_true",
+            )
     sps[LOG_CMD].add_argument(
         "-g",
         "--log-group-name",
@@ -237,5 +392,504 @@ def build_argparser():
         type=str,
         metavar="S",
     )
+    sps[LOG_CMD].add_argument(
+        "--events-limit",
+        help=f"The number of log events to retrieve per request, up to {LOG_EVENTS_LIMIT_MAX} (default: %(default)s)",
+        default=CLI_DEFAULTS["events_limit"],
+        type=int,
+        metavar="N",
+    )
+    sps[LOG_CMD].add_argument(
+        "--prefetch",
+        help="Whether to fetch the next page of log events in the background while the current one is processed (default: %(default)s)",
+        action="store_true",
+    )
+    sps[LOG_CMD].add_argument(
+        "--output-format",
+        help="Format of the log output. Structured formats parse each log event with the selected `--parser` (default: %(default)s)",
+        choices=LOG_OUTPUT_FORMATS,
+        default=CLI_DEFAULTS["log_output_format"],
+        type=str,
+    )
+    sps[LOG_CMD].add_argument(
+        "--parser",
+        help="Parser to structure the log messages with. Used with structured `--output-format` (default: %(default)s)",
+        choices=LOG_PARSER_NAMES,
+        default=CLI_DEFAULTS["log_parser"],
+        type=str,
+    )
+    sps[LOG_CMD].add_argument(
+        "--parser-regex",
+        help="Regex with named groups to structure the log messages with. Used with `--parser regex`",
+        default=None,
+        type=str,
+        metavar="R",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--preset-name",
+        help="Name of the preset to collect. Can be specified multiple times",
+        default=[],
+        action="append",
+        type=str,
+        metavar="N",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--preset-path",
+        help="Path to the preset file to collect. Can be specified multiple times",
+        default=[],
+        action="append",
+        type=str,
+        metavar="P",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--preset-dir",
+        help="Path to the preset directory. Can be specified multiple times, the presets found in the directories specified first take precedence",
+        default=None,
+        action="append",
+        type=str,
+        metavar="D",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--dimensions",
+        help="Elements of the dimensions list to use for all the presets. Must be of the form: name1:value1 name2:value2",
+        default=None,
+        type=str,
+        metavar="A",
+        nargs="+",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--namespace",
+        help="Namespace to monitor the metrics within, overrides the presets namespace.",
+        type=str,
+        metavar="N",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "-s",
+        "--stat",
+        help="The statistics to apply over the time intervals, e.g. 'Maximum Average p99' (default: %(default)s)",
+        default=CLI_DEFAULTS["stat"],
+        type=str,
+        nargs="+",
+        metavar="S",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "-p",
+        "--period",
+        help="The granularity, in seconds, of the collected data points (default: %(default)s)",
+        default=CLI_DEFAULTS["period"],
+        type=int,
+        metavar="P",
+    )
+    sps[COLLECT_CMD].add_argument(
+        "--low-memory",
+        help="Whether to parse the responses into compact series and write them one at a time, to bound the memory used by large responses (default: %(default)s)",
+        action="store_true",
+    )
+    schedule = sps[COLLECT_CMD].add_argument_group(
+        "SCHEDULE", "When and how far back to poll for the new data points."
+    )
+    schedule.add_argument(
+        "--interval",
+        help="Time between the polls, in seconds (default: %(default)s)",
+        default=CLI_DEFAULTS["interval"],
+        type=float,
+        metavar="S",
+    )
+    schedule.add_argument(
+        "--jitter",
+        help="Maximum random delay added to the interval, in seconds (default: %(default)s)",
+        default=CLI_DEFAULTS["jitter"],
+        type=float,
+        metavar="S",
+    )
+    schedule.add_argument(
+        "--lookback",
+        help="Maximum age of the data points queried by a poll, in seconds (default: %(default)s)",
+        default=CLI_DEFAULTS["lookback"],
+        type=float,
+        metavar="S",
+    )
+    schedule.add_argument(
+        "--max-polls",
+        help="Number of polls to run before exiting, unlimited by default",
+        default=None,
+        type=int,
+        metavar="N",
+    )
+    output = sps[COLLECT_CMD].add_argument_group(
+        "OUTPUT",
+        "The samples are written to standard output, or with `--save` to the rotating 'metrics.ndjson' file in the selected directory.",
+    )
+    output.add_argument(
+        "--max-bytes",
+        help="Maximum size of the samples file before it is rotated (default: %(default)s)",
+        default=CLI_DEFAULTS["max_bytes"],
+        type=int,
+        metavar="B",
+    )
+    output.add_argument(
+        "--backup-count",
+        help="Number of rotated samples files to keep (default: %(default)s)",
+        default=CLI_DEFAULTS["backup_count"],
+        type=int,
+        metavar="N",
+    )
+    exporter = sps[COLLECT_CMD].add_argument_group(
+        "EXPORTER",
+        "Serve the latest samples in the OpenMetrics text format for Prometheus to scrape. The samples are not written to standard output in this mode.",
+    )
+    exporter.add_argument(
+        "--exporter-port",
+        help="Port to serve the samples at the '/metrics' path on. The exporter is disabled if not provided",
+        default=None,
+        type=int,
+        metavar="P",
+    )
+    exporter.add_argument(
+        "--exporter-address",
+        help="Address to serve the samples on (default: %(default)s)",
+        default=CLI_DEFAULTS["exporter_address"],
+        type=str,
+        metavar="A",
+    )
+    exporter.add_argument(
+        "--exporter-max-age",
+        help="Age of the samples, in seconds, after which their series are no longer served, e.g. for terminated instances. Kept forever if not provided",
+        default=None,
+        type=float,
+        metavar="S",
+    )
+    detection = sps[COLLECT_CMD].add_argument_group(
+        "DETECTION",
+        "Flag the anomalous data points as they are collected. The events are logged and, with `--save`, appended to the 'events.ndjson' file in the selected directory.",
+    )
+    detection.add_argument(
+        "--alert-above",
+        help="Flag the data points crossing above this threshold, and their recovery",
+        default=None,
+        type=float,
+        metavar="T",
+    )
+    detection.add_argument(
+        "--alert-below",
+        help="Flag the data points crossing below this threshold, and their recovery",
+        default=None,
+        type=float,
+        metavar="T",
+    )
+    detection.add_argument(
+        "--alert-rate",
+        help="Flag the data points increasing faster than this change per second",
+        default=None,
+        type=float,
+        metavar="R",
+    )
+    detection.add_argument(
+        "--alert-zscore",
+        help="Flag the data points with a z-score, against the previous data points, beyond this value",
+        default=None,
+        type=float,
+        metavar="Z",
+    )
+    detection.add_argument(
+        "--zscore-window",
+        help="Number of previous data points the z-score is computed over (default: %(default)s)",
+        default=CLI_DEFAULTS["zscore_window"],
+        type=int,
+        metavar="N",
+    )
+    sps[TOP_CMD].add_argument(
+        "--namespace",
+        help="Namespace of the metric.",
+        required=True,
+        type=str,
+        metavar="N",
+    )
+    sps[TOP_CMD].add_argument(
+        "-m",
+        "--metric",
+        help="Name of the metric to rank the instances by.",
+        required=True,
+        metavar="N",
+    )
+    sps[TOP_CMD].add_argument(
+        "-u",
+        "--unit",
+        help="The unit of the metric, e.g. 'Percent'",
+        type=str,
+        metavar="U",
+    )
+    sps[TOP_CMD].add_argument(
+        "--dimension-name",
+        help="Name of the dimension identifying the instances (default: %(default)s)",
+        default=CLI_DEFAULTS["dimension_name"],
+        type=str,
+        metavar="D",
+    )
+    sps[TOP_CMD].add_argument(
+        "--dimension-values",
+        help="Values of the dimension to rank. Discovered with ListMetrics if not provided",
+        default=None,
+        type=str,
+        nargs="+",
+        metavar="V",
+    )
+    sps[TOP_CMD].add_argument(
+        "--dimensions",
+        help="Other dimensions shared by all the instances. Must be of the form: name1:value1 name2:value2",
+        default=None,
+        type=str,
+        metavar="A",
+        nargs="+",
+    )
+    sps[TOP_CMD].add_argument(
+        "-s",
+        "--stat",
+        help="The statistic to apply over the time intervals (default: %(default)s)",
+        default=CLI_DEFAULTS["stat"],
+        type=str,
+        metavar="S",
+    )
+    sps[TOP_CMD].add_argument(
+        "-p",
+        "--period",
+        help="The granularity, in seconds, of the data points (default: %(default)s)",
+        default=CLI_DEFAULTS["period"],
+        type=int,
+        metavar="P",
+    )
+    top_time = sps[TOP_CMD].add_argument_group(
+        "TIME RANGE", "The time range to rank the instances over."
+    )
+    top_time.add_argument(
+        "--days",
+        help="How many days to subtract from the current date to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["days"],
+        type=int,
+        metavar="D",
+    )
+    top_time.add_argument(
+        "-hr",
+        "--hours",
+        help="How many hours to subtract from the current time to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["hours"],
+        type=int,
+        metavar="H",
+    )
+    top_time.add_argument(
+        "-mi",
+        "--minutes",
+        help="How many minutes to subtract from the current time to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["minutes"],
+        type=int,
+        metavar="M",
+    )
+    ranking = sps[TOP_CMD].add_argument_group(
+        "RANKING", "How the instances are summarized and ranked."
+    )
+    ranking.add_argument(
+        "--top",
+        help="Number of instances to report (default: %(default)s)",
+        default=CLI_DEFAULTS["top"],
+        type=int,
+        metavar="N",
+    )
+    ranking.add_argument(
+        "--rank-by",
+        help="The statistic of the data points of each instance to rank by (default: %(default)s)",
+        choices=RANK_BY,
+        default=CLI_DEFAULTS["rank_by"],
+        type=str,
+    )
+    ranking.add_argument(
+        "--percentile",
+        help="The percentile of the data points of each instance to compute (default: %(default)s)",
+        default=CLI_DEFAULTS["percentile"],
+        type=float,
+        metavar="Q",
+    )
+    ranking.add_argument(
+        "--threshold",
+        help="Report the instances with data points above the threshold, e.g. 90 for a disk usage in percent",
+        default=None,
+        type=float,
+        metavar="X",
+    )
+    ranking.add_argument(
+        "--ascending",
+        help="Whether to rank the lowest values first (default: %(default)s)",
+        action="store_true",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "-i",
+        "--instance-ids",
+        help="IDs of the EC2 instances to report. All the instances described by EC2 if neither this nor '--instance-ids-file' is provided",
+        default=[],
+        type=str,
+        nargs="+",
+        metavar="ID",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "--instance-ids-file",
+        help="Path to a file listing the IDs of the EC2 instances to report, one per line",
+        default=None,
+        type=str,
+        metavar="F",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "--namespace",
+        help="Namespace of the metric reported by every instance, used to estimate the uptime of the instances not running (default: %(default)s)",
+        default=CLI_DEFAULTS["uptime_namespace"],
+        type=str,
+        metavar="N",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "-m",
+        "--metric",
+        help="Name of the metric reported by every instance (default: %(default)s)",
+        default=CLI_DEFAULTS["uptime_metric"],
+        type=str,
+        metavar="N",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "--dimension-name",
+        help="Name of the dimension holding the instance ID (default: %(default)s)",
+        default=CLI_DEFAULTS["dimension_name"],
+        type=str,
+        metavar="D",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "-p",
+        "--period",
+        help="The granularity, in seconds, of the data points, i.e. the precision of the estimated uptime (default: %(default)s)",
+        default=CLI_DEFAULTS["uptime_period"],
+        type=int,
+        metavar="P",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "--workers",
+        help="Maximum number of AWS API requests sent concurrently (default: %(default)s)",
+        default=CLI_DEFAULTS["workers"],
+        type=int,
+        metavar="N",
+    )
+    sps[UPTIME_CMD].add_argument(
+        "--format",
+        help="Format of the report saved with `--save`, 'parquet' requires pyarrow (default: %(default)s)",
+        choices=REPORT_FORMATS,
+        default=CLI_DEFAULTS["report_format"],
+        type=str,
+    )
+    uptime_time = sps[UPTIME_CMD].add_argument_group(
+        "TIME RANGE",
+        "The time range the data points of the instances not running are looked up in.",
+    )
+    uptime_time.add_argument(
+        "--days",
+        help="How many days to subtract from the current date to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["uptime_days"],
+        type=int,
+        metavar="D",
+    )
+    uptime_time.add_argument(
+        "-hr",
+        "--hours",
+        help="How many hours to subtract from the current time to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["hours"],
+        type=int,
+        metavar="H",
+    )
+    uptime_time.add_argument(
+        "-mi",
+        "--minutes",
+        help="How many minutes to subtract from the current time to determine the start time (default: %(default)s).",
+        default=CLI_DEFAULTS["minutes"],
+        type=int,
+        metavar="M",
+    )
+    sps[DISCOVER_CMD].add_argument(
+        "--namespace",
+        help="Namespace of the metrics. All the namespaces if not provided",
+        default=None,
+        type=str,
+        metavar="N",
+    )
+    sps[DISCOVER_CMD].add_argument(
+        "-m",
+        "--metric",
+        help="Case insensitive shell-style pattern of the metric names, e.g. 'mem_*'",
+        default=None,
+        type=str,
+        metavar="P",
+    )
+    sps[DISCOVER_CMD].add_argument(
+        "--dimension-names",
+        help="Exact names of the dimensions of the metrics",
+        default=None,
+        type=str,
+        nargs="+",
+        metavar="D",
+    )
+    sps[DISCOVER_CMD].add_argument(
+        "--dimensions",
+        help="Dimensions the metrics are listed with. Must be of the form: name1:value1 name2: (an empty value matches any value)",
+        default=None,
+        type=str,
+        metavar="A",
+        nargs="+",
+    )
+    catalog = sps[DISCOVER_CMD].add_argument_group(
+        "CATALOG", "The local catalog the listed metrics are kept in."
+    )
+    catalog.add_argument(
+        "--catalog",
+        help="Path to the catalog file (default: ~/.cache/cloudwatcher/metrics_catalog.json)",
+        default=None,
+        type=str,
+        metavar="F",
+    )
+    catalog.add_argument(
+        "--ttl",
+        help="Number of seconds after which the listed metrics are listed again (default: %(default)s)",
+        default=CLI_DEFAULTS["catalog_ttl"],
+        type=float,
+        metavar="S",
+    )
+    catalog_mode = catalog.add_mutually_exclusive_group()
+    catalog_mode.add_argument(
+        "--refresh",
+        help="Whether to list the metrics again, even if the catalog is fresh (default: %(default)s)",
+        action="store_true",
+    )
+    catalog_mode.add_argument(
+        "--offline",
+        help="Whether to only search the catalog, without listing the metrics (default: %(default)s)",
+        action="store_true",
+    )
+    discover_preset = sps[DISCOVER_CMD].add_argument_group(
+        "PRESET", "Generate a preset from the discovered metrics."
+    )
+    discover_preset.add_argument(
+        "--preset",
+        help="Path to the preset file to write, a bundle if several metrics are discovered",
+        default=None,
+        type=str,
+        metavar="F",
+    )
+    discover_preset.add_argument(
+        "-u",
+        "--unit",
+        help="The unit of the metrics in the preset, not reported by ListMetrics",
+        default=None,
+        type=str,
+        metavar="U",
+    )
+    discover_preset.add_argument(
+        "--preset-description",
+        help="Description of the preset",
+        default=None,
+        type=str,
+        metavar="T",
+    )
 
     return parser
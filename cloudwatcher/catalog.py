@@ -0,0 +1,463 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from rich.table import Table
+
+from cloudwatcher.cloudwatcher import CloudWatcher
+from cloudwatcher.preset import Dimension, MetricBundleSetup, MetricWatcherSetup
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = Path.home() / ".cache" / "cloudwatcher" / "metrics_catalog.json"
+CATALOG_VERSION = 1
+
+
+@dataclass(frozen=True)
+class CatalogMetric:
+    """
+    A metric listed by ListMetrics
+
+    Args:
+        namespace (str): The namespace of the metric
+        metric_name (str): The name of the metric
+        dimensions (Tuple[Tuple[str, str], ...]): The names and values of the
+            dimensions, sorted by name
+    """
+
+    namespace: str
+    metric_name: str
+    dimensions: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def dimension_names(self) -> Tuple[str, ...]:
+        return tuple(name for name, _ in self.dimensions)
+
+    @classmethod
+    def from_response(cls, metric: Dict) -> "CatalogMetric":
+        """
+        Create the metric from an item of the ListMetrics response
+
+        Args:
+            metric (Dict): the item of the `Metrics` list
+
+        Returns:
+            CatalogMetric: the metric
+        """
+        return cls(
+            namespace=metric["Namespace"],
+            metric_name=metric["MetricName"],
+            dimensions=tuple(
+                sorted((d["Name"], d["Value"]) for d in metric.get("Dimensions", []))
+            ),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "namespace": self.namespace,
+            "metric_name": self.metric_name,
+            "dimensions": [list(dimension) for dimension in self.dimensions],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CatalogMetric":
+        return cls(
+            namespace=data["namespace"],
+            metric_name=data["metric_name"],
+            dimensions=tuple(tuple(dimension) for dimension in data["dimensions"]),
+        )
+
+
+@dataclass
+class MetricSchema:
+    """
+    The metrics of the same name reported with the same dimension names
+
+    Args:
+        namespace (str): The namespace of the metric
+        metric_name (str): The name of the metric
+        dimension_names (Tuple[str, ...]): The names of the dimensions, sorted
+        dimension_values (Dict[str, List[str]]): The values of each dimension,
+            sorted
+        series (int): The number of metrics, i.e. the dimension value combinations
+    """
+
+    namespace: str
+    metric_name: str
+    dimension_names: Tuple[str, ...]
+    dimension_values: Dict[str, List[str]]
+    series: int
+
+
+def _scan_key(
+    region: str, namespace: Optional[str], dimension_filters: List[Dimension]
+) -> str:
+    """
+    Get the key of a ListMetrics scan in the catalog
+    """
+    filters = sorted(
+        f"{dimension.Name}={dimension.Value}"
+        if dimension.Value
+        else str(dimension.Name)
+        for dimension in dimension_filters
+    )
+    return "|".join([region, namespace or "*"] + filters)
+
+
+def _metric_id(metric_name: str) -> str:
+    """
+    Get a valid query ID from the metric name, e.g. `mem_used_percent`
+    """
+    metric_id = re.sub(r"[^a-zA-Z0-9_]", "_", metric_name)
+    metric_id = metric_id[0].lower() + metric_id[1:] if metric_id else "m"
+    return metric_id if metric_id[0].isalpha() else f"m_{metric_id}"
+
+
+class MetricCatalog(CloudWatcher):
+    """
+    A local catalog of the metrics listed by ListMetrics
+
+    Each scan, i.e. the metrics of a namespace matching the dimension filters,
+    is paged through once and kept in a JSON file for `ttl` seconds, so the
+    metrics can be searched and turned into presets locally, without scanning
+    them again. The stale scans are refreshed on the next use.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[Path, str]] = None,
+        ttl: float = 86400.0,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        aws_region_name: Optional[str] = None,
+        client: Optional[Any] = None,
+    ) -> None:
+        """
+        Initialize MetricCatalog
+
+        Args:
+            path (Optional[Union[Path, str]]): the path of the catalog file,
+                `~/.cache/cloudwatcher/metrics_catalog.json` by default
+            ttl (float): the number of seconds after which a scan is refreshed
+            aws_access_key_id (Optional[str]): the AWS access key ID
+            aws_secret_access_key (Optional[str]): the AWS secret access key
+            aws_session_token (Optional[str]): the AWS session token
+            aws_region_name (Optional[str]): the AWS region name
+            client (Optional[Any]): an existing CloudWatch client to reuse
+        """
+        super().__init__(
+            service_name="cloudwatch",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            aws_region_name=aws_region_name,
+            client=client,
+        )
+        self.path = Path(path) if path is not None else DEFAULT_CATALOG_PATH
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._scans: Dict[str, Dict[str, Any]] = self._load()
+        self._metrics: Optional[List[CatalogMetric]] = None
+
+    def __repr__(self) -> str:
+        return f"MetricCatalog({self.path})"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            _LOGGER.warning(f"Ignoring the unreadable metrics catalog {self.path}: {e}")
+            return {}
+        if data.get("version") != CATALOG_VERSION:
+            return {}
+        return data["scans"]
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "scans": self._scans}, f)
+        os.replace(temp_path, self.path)
+
+    def is_fresh(
+        self,
+        namespace: Optional[str] = None,
+        dimension_filters: Optional[List[Dimension]] = None,
+    ) -> bool:
+        """
+        Check if a scan is in the catalog and younger than the TTL
+
+        Args:
+            namespace (Optional[str]): the namespace, all namespaces if not provided
+            dimension_filters (Optional[List[Dimension]]): the dimension filters,
+                the dimensions without a value match any value
+
+        Returns:
+            bool: True if the scan does not need to be refreshed
+        """
+        key = _scan_key(self.aws_region_name, namespace, dimension_filters or [])
+        scan = self._scans.get(key)
+        return scan is not None and time.time() - scan["refreshed_at"] <= self.ttl
+
+    def refresh(
+        self,
+        namespace: Optional[str] = None,
+        dimension_filters: Optional[List[Dimension]] = None,
+        force: bool = False,
+    ) -> int:
+        """
+        Page through ListMetrics, unless the scan is fresh
+
+        Args:
+            namespace (Optional[str]): the namespace, all namespaces if not provided
+            dimension_filters (Optional[List[Dimension]]): the dimension filters,
+                the dimensions without a value match any value
+            force (bool): whether to refresh a fresh scan
+
+        Returns:
+            int: the number of metrics listed, 0 if the scan was fresh
+        """
+        dimension_filters = dimension_filters or []
+        if not force and self.is_fresh(namespace, dimension_filters):
+            return 0
+        kwargs: Dict[str, Any] = {}
+        if namespace is not None:
+            kwargs["Namespace"] = namespace
+        if dimension_filters:
+            kwargs["Dimensions"] = [
+                {"Name": d.Name, "Value": d.Value} if d.Value else {"Name": d.Name}
+                for d in dimension_filters
+            ]
+        metrics = {
+            CatalogMetric.from_response(metric)
+            for page in self.client.get_paginator("list_metrics").paginate(**kwargs)
+            for metric in page["Metrics"]
+        }
+        with self._lock:
+            key = _scan_key(self.aws_region_name, namespace, dimension_filters)
+            self._scans[key] = {
+                "refreshed_at": time.time(),
+                "region": self.aws_region_name,
+                "metrics": [metric.to_dict() for metric in sorted(metrics, key=str)],
+            }
+            self._metrics = None
+            self._save()
+        _LOGGER.info(
+            f"Listed {len(metrics)} metrics in namespace: {namespace or 'all'}"
+        )
+        return len(metrics)
+
+    def metrics(self) -> List[CatalogMetric]:
+        """
+        Get all the metrics of the catalog in the region
+
+        Returns:
+            List[CatalogMetric]: the metrics, without duplicates across the scans
+        """
+        with self._lock:
+            if self._metrics is None:
+                metrics = {
+                    CatalogMetric.from_dict(metric)
+                    for scan in self._scans.values()
+                    if scan["region"] == self.aws_region_name
+                    for metric in scan["metrics"]
+                }
+                self._metrics = sorted(
+                    metrics, key=lambda m: (m.namespace, m.metric_name, m.dimensions)
+                )
+            return list(self._metrics)
+
+    def search(
+        self,
+        namespace: Optional[str] = None,
+        metric_name: Optional[str] = None,
+        dimension_names: Optional[Iterable[str]] = None,
+        dimensions: Optional[List[Dimension]] = None,
+    ) -> List[CatalogMetric]:
+        """
+        Search the catalog, without any API call
+
+        Args:
+            namespace (Optional[str]): the namespace
+            metric_name (Optional[str]): a case insensitive shell-style pattern
+                of the metric name, e.g. `mem_*`
+            dimension_names (Optional[Iterable[str]]): the exact names of the
+                dimensions
+            dimensions (Optional[List[Dimension]]): dimensions the metrics must
+                have, the dimensions without a value match any value
+
+        Returns:
+            List[CatalogMetric]: the matching metrics
+        """
+        names = tuple(sorted(dimension_names)) if dimension_names is not None else None
+        pattern = (
+            re.compile(fnmatch.translate(metric_name), re.IGNORECASE)
+            if metric_name is not None
+            else None
+        )
+        matches = []
+        for metric in self.metrics():
+            if namespace is not None and metric.namespace != namespace:
+                continue
+            if pattern is not None and not pattern.match(metric.metric_name):
+                continue
+            if names is not None and metric.dimension_names != names:
+                continue
+            metric_dimensions = dict(metric.dimensions)
+            if dimensions and not all(
+                d.Name in metric_dimensions
+                and (not d.Value or metric_dimensions[d.Name] == d.Value)
+                for d in dimensions
+            ):
+                continue
+            matches.append(metric)
+        return matches
+
+    @staticmethod
+    def schemas(metrics: Iterable[CatalogMetric]) -> List[MetricSchema]:
+        """
+        Group the metrics by namespace, name and dimension names
+
+        Args:
+            metrics (Iterable[CatalogMetric]): the metrics
+
+        Returns:
+            List[MetricSchema]: the groups, sorted
+        """
+        groups: Dict[Tuple[str, str, Tuple[str, ...]], List[CatalogMetric]] = {}
+        for metric in metrics:
+            key = (metric.namespace, metric.metric_name, metric.dimension_names)
+            groups.setdefault(key, []).append(metric)
+        return [
+            MetricSchema(
+                namespace=namespace,
+                metric_name=metric_name,
+                dimension_names=names,
+                dimension_values={
+                    name: sorted({dict(m.dimensions)[name] for m in group})
+                    for name in names
+                },
+                series=len(group),
+            )
+            for (namespace, metric_name, names), group in sorted(groups.items())
+        ]
+
+    @staticmethod
+    def table(schemas: List[MetricSchema], title: str, max_values: int = 3) -> Table:
+        """
+        Create a table of the metric schemas
+
+        Args:
+            schemas (List[MetricSchema]): the metric schemas
+            title (str): the title of the table
+            max_values (int): the number of dimension values to show
+
+        Returns:
+            Table: the table
+        """
+        table = Table(title=title, show_header=True, header_style="bold magenta")
+        table.add_column("Namespace")
+        table.add_column("Metric")
+        table.add_column("Dimensions")
+        table.add_column("Series", justify="right")
+        for schema in schemas:
+            dimensions = []
+            for name, values in schema.dimension_values.items():
+                shown = ", ".join(values[:max_values])
+                more = len(values) - max_values
+                dimensions.append(
+                    f"{name}: {shown}" + (f" (+{more})" if more > 0 else "")
+                )
+            table.add_row(
+                schema.namespace,
+                schema.metric_name,
+                "\n".join(dimensions),
+                str(schema.series),
+            )
+        return table
+
+    @staticmethod
+    def to_preset(
+        schemas: List[MetricSchema],
+        description: Optional[str] = None,
+        metric_unit: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Create a preset from the metric schemas
+
+        The dimensions with a single value in the catalog are set to it, the
+        other ones are left empty, to be set with `--dimensions`. A single
+        metric makes a metric preset, multiple metrics a bundle preset.
+        ListMetrics does not report the units, so the unit of the metrics
+        has to be provided.
+
+        Args:
+            schemas (List[MetricSchema]): the metric schemas, in a single namespace
+            description (Optional[str]): the description of the preset
+            metric_unit (Optional[str]): the unit of the metrics, e.g. `Bytes`
+
+        Returns:
+            Dict[str, Any]: the preset data, validated
+        """
+        if not schemas:
+            raise ValueError("No metrics to create the preset from")
+        namespaces = {schema.namespace for schema in schemas}
+        if len(namespaces) > 1:
+            raise ValueError(
+                f"The metrics of a preset must share the namespace, found: {namespaces}"
+            )
+
+        def dimensions_list(schema: MetricSchema) -> List[Dict[str, str]]:
+            return [
+                {"Name": name, "Value": values[0] if len(values) == 1 else ""}
+                for name, values in schema.dimension_values.items()
+            ]
+
+        metric_ids: Dict[str, int] = {}
+        metrics = []
+        for schema in schemas:
+            metric_id = _metric_id(schema.metric_name)
+            count = metric_ids[metric_id] = metric_ids.get(metric_id, 0) + 1
+            metrics.append(
+                {
+                    "metric_name": schema.metric_name,
+                    "metric_id": metric_id if count == 1 else f"{metric_id}_{count}",
+                    "metric_unit": metric_unit,
+                    "dimensions_list": dimensions_list(schema),
+                }
+            )
+        if len(metrics) == 1:
+            preset: Dict[str, Any] = dict(namespace=namespaces.pop(), **metrics[0])
+            if description is not None:
+                preset["metric_description"] = description
+            MetricWatcherSetup.from_dict(preset)
+            return preset
+        # the dimensions shared by all the metrics are declared once
+        shared = [
+            dimension
+            for dimension in metrics[0]["dimensions_list"]
+            if all(dimension in metric["dimensions_list"] for metric in metrics)
+        ]
+        for metric in metrics:
+            metric["dimensions_list"] = [
+                d for d in metric["dimensions_list"] if d not in shared
+            ]
+            if not metric["dimensions_list"]:
+                del metric["dimensions_list"]
+        preset = {"namespace": namespaces.pop(), "dimensions_list": shared}
+        if description is not None:
+            preset["bundle_description"] = description
+        preset["metrics"] = metrics
+        MetricBundleSetup.from_dict(preset)
+        return preset
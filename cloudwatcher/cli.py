@@ -1,16 +1,249 @@
+import argparse
+import atexit
+import datetime
+import json
 import logging
 import os
+import re
+import signal
 import sys
+from typing import Any, Dict, List, Optional, Tuple, Type
 
+import pytz
 from rich.console import Console
 from rich.logging import RichHandler
 
-from cloudwatcher.const import LOG_CMD, METRIC_CMD
+from cloudwatcher.catalog import MetricCatalog
+from cloudwatcher.collector import MetricCollector, build_watchers
+from cloudwatcher.const import (
+    COLLECT_CMD,
+    DISCOVER_CMD,
+    LOG_CMD,
+    LOG_EVENTS_LIMIT_MAX,
+    METRIC_CMD,
+    TOP_CMD,
+    UPTIME_CMD,
+)
+from cloudwatcher.detection import (
+    AnomalyDetector,
+    AnomalySink,
+    Detector,
+    RateOfChangeDetector,
+    ThresholdDetector,
+    ZScoreDetector,
+)
+from cloudwatcher.exporter import OpenMetricsCache, OpenMetricsExporter
+from cloudwatcher.fleet import FleetAggregator, FleetWatcher
+from cloudwatcher.governor import ApiGovernor, set_api_governor
+from cloudwatcher.instrumentation import get_instrumentation
+from cloudwatcher.log_parsers import get_log_parser
 from cloudwatcher.logwatcher import LogWatcher
+from cloudwatcher.metric_handlers import (
+    TimedMetric,
+    TimedMetricCsvSaver,
+    TimedMetricJsonSaver,
+    TimedMetricLogger,
+    TimedMetricPlotter,
+    TimedMetricSummarizer,
+)
+from cloudwatcher.metric_sinks import (
+    MetricSink,
+    RotatingFileMetricSink,
+    StreamMetricSink,
+)
+from cloudwatcher.metric_store import MetricStore
+from cloudwatcher.resampling import resample_response
+from cloudwatcher.series_file import SERIES_FILE_EXTENSION, TimedMetricBinarySaver
+from cloudwatcher.uptime import UptimeReporter
 
 from .argparser import build_argparser
-from .metricwatcher import MetricWatcher
-from .preset import Dimension, PresetFilesInventory, get_metric_watcher_setup
+from .metricwatcher import MetricBundleWatcher, MetricWatcher
+from .preset import (
+    Dimension,
+    MetricBundleSetup,
+    get_metric_watcher_setup,
+    get_preset_registry,
+)
+
+
+def handle_metric_response(
+    metric_watcher: MetricWatcher, response: Optional[Dict], args: argparse.Namespace
+) -> None:
+    """
+    Log, save and plot the metric data as requested in the CLI arguments
+
+    Args:
+        metric_watcher (MetricWatcher): the metric watcher the response belongs to
+        response (Optional[Dict]): the response from the query
+        args (argparse.Namespace): the CLI arguments
+    """
+    if response is not None and args.resample is not None:
+        response = resample_response(
+            response, period=args.resample, how=args.aggregation, fill=args.fill
+        )
+    metric_watcher.log_response(response=response)
+    metric_watcher.log_metric(response=response)
+    metric_watcher.log_metric_summary(response=response)
+
+    name_prefix = f"{metric_watcher.metric_id}_{metric_watcher.metric_name}"
+    if args.save:
+        metric_watcher.save_metric_json(
+            file_path=os.path.join(args.dir, f"{name_prefix}.json"),
+            response=response,
+        )
+        metric_watcher.save_metric_csv(
+            file_path=os.path.join(args.dir, f"{name_prefix}.csv"),
+            response=response,
+        )
+        metric_watcher.save_response_json(
+            file_path=os.path.join(args.dir, f"{name_prefix}_response.json"),
+            response=response,
+        )
+        if args.binary:
+            metric_watcher.save_metric_binary(
+                file_path=os.path.join(
+                    args.dir, f"{name_prefix}{SERIES_FILE_EXTENSION}"
+                ),
+                response=response,
+            )
+
+    if args.plot:
+        metric_watcher.save_metric_plot(
+            file_path=os.path.join(args.dir, f"{name_prefix}.png"),
+            response=response,
+        )
+
+
+def handle_metric_series(
+    metric_watcher: MetricWatcher, series: List[TimedMetric], args: argparse.Namespace
+) -> None:
+    """
+    Log, save and plot the compact timed metrics as requested in the CLI arguments
+
+    The timed metrics are handled one at a time and released once handled.
+    The raw response is not kept, so it is neither logged nor saved.
+
+    Args:
+        metric_watcher (MetricWatcher): the metric watcher the series belong to
+        series (List[TimedMetric]): the compact timed metrics. The list is emptied
+        args (argparse.Namespace): the CLI arguments
+    """
+    name_prefix = os.path.join(
+        args.dir, f"{metric_watcher.metric_id}_{metric_watcher.metric_name}"
+    )
+    handlers: List[Tuple[Type, Dict[str, Any]]] = [
+        (TimedMetricLogger, dict(target=None)),
+        (
+            TimedMetricSummarizer,
+            dict(
+                target=None,
+                metric_unit=metric_watcher.metric_unit,
+                summarizer=("Max", max),
+            ),
+        ),
+    ]
+    if args.save:
+        handlers.append((TimedMetricJsonSaver, dict(target=f"{name_prefix}.json")))
+        handlers.append((TimedMetricCsvSaver, dict(target=f"{name_prefix}.csv")))
+        if args.binary:
+            handlers.append(
+                (
+                    TimedMetricBinarySaver,
+                    dict(
+                        target=f"{name_prefix}{SERIES_FILE_EXTENSION}",
+                        metric_unit=metric_watcher.metric_unit,
+                    ),
+                )
+            )
+    if args.plot:
+        handlers.append(
+            (
+                TimedMetricPlotter,
+                dict(
+                    target=f"{name_prefix}.png", metric_unit=metric_watcher.metric_unit
+                ),
+            )
+        )
+
+    def resample(timed_metric: TimedMetric) -> TimedMetric:
+        return timed_metric.resample(
+            args.resample, how=args.aggregation, fill=args.fill
+        )
+
+    metric_watcher.handle_series(
+        series, handlers, transform=resample if args.resample is not None else None
+    )
+
+
+def report_stats(governor: ApiGovernor, args: argparse.Namespace) -> None:
+    """
+    Print and save the run statistics as requested in the CLI arguments
+
+    Args:
+        governor (ApiGovernor): the API governor to report the retries of
+        args (argparse.Namespace): the CLI arguments
+    """
+    instrumentation = get_instrumentation()
+    if args.stats:
+        Console(stderr=True).print(instrumentation.summary_table(governor))
+    if args.stats_json:
+        with open(args.stats_json, "w") as f:
+            f.write(instrumentation.to_json(governor))
+        logging.getLogger(__name__).info(f"Saved run statistics to: {args.stats_json}")
+
+
+def build_detector(args: argparse.Namespace) -> Optional[AnomalyDetector]:
+    """
+    Create the anomaly detector requested in the CLI arguments
+
+    Args:
+        args (argparse.Namespace): the CLI arguments
+
+    Returns:
+        Optional[AnomalyDetector]: the anomaly detector, None if no detection
+            is requested
+    """
+
+    def detectors() -> List[Detector]:
+        series_detectors: List[Detector] = []
+        if args.alert_above is not None:
+            series_detectors.append(ThresholdDetector(args.alert_above, "above"))
+        if args.alert_below is not None:
+            series_detectors.append(ThresholdDetector(args.alert_below, "below"))
+        if args.alert_rate is not None:
+            series_detectors.append(RateOfChangeDetector(args.alert_rate))
+        if args.alert_zscore is not None:
+            series_detectors.append(
+                ZScoreDetector(args.alert_zscore, window=args.zscore_window)
+            )
+        return series_detectors
+
+    # validate the arguments before the first series is seen
+    if not detectors():
+        return None
+    return AnomalyDetector(detectors)
+
+
+def open_store(args: argparse.Namespace) -> Optional[MetricStore]:
+    """
+    Open the local metric store and compact it as requested in the CLI arguments
+
+    Args:
+        args (argparse.Namespace): the CLI arguments
+
+    Returns:
+        Optional[MetricStore]: the metric store, None if not requested
+    """
+    if args.store is None:
+        return None
+    store = MetricStore(args.store)
+    if args.compact_days is not None:
+        store.compact(
+            before=datetime.datetime.now(pytz.utc)
+            - datetime.timedelta(days=args.compact_days),
+            period=args.compact_period,
+        )
+    return store
 
 
 def main():
@@ -34,56 +267,104 @@ def main():
 
     _LOGGER.debug(f"CLI arguments: {args}")
 
+    if args.max_attempts < 1:
+        parser.error("argument --max-attempts: must be at least 1")
+    governor = ApiGovernor(max_attempts=args.max_attempts)
+    set_api_governor(governor)
+    if args.stats or args.stats_json:
+        get_instrumentation().reset()
+        atexit.register(report_stats, governor, args)
+
     if args.command == METRIC_CMD:
 
         if args.preset_list:
-            Console().print(
-                PresetFilesInventory(presets_dir=args.preset_dir).presets_table
-            )
+            Console().print(get_preset_registry(args.preset_dir).presets_table)
             sys.exit(0)
 
         if not os.path.exists(args.dir):
             _LOGGER.info(f"Creating directory: {args.dir}")
             os.makedirs(args.dir, exist_ok=True)
 
+        if args.resample is not None and args.resample <= 0:
+            parser.error("argument --resample: must be a positive number of seconds")
+        if args.handler_workers < 1:
+            parser.error("argument --handler-workers: must be at least 1")
+        if args.offline and args.store is None:
+            parser.error("argument --offline: requires --store")
+        if args.offline and args.uptime:
+            parser.error("argument --uptime: not available with --offline")
+        store = open_store(args)
         mw_setup = get_metric_watcher_setup(namespace=args, presets_dir=args.preset_dir)
-        metric_watcher = MetricWatcher(**mw_setup.to_dict())
-
-        response = metric_watcher.query_ec2_metrics(
+        if isinstance(mw_setup, MetricBundleSetup) and (args.metric or args.id):
+            parser.error(
+                "argument --metric/--id: not available with a bundle preset, "
+                "its metrics are named in the preset"
+            )
+        query_kwargs = dict(
             days=args.days,
             hours=args.hours,
             minutes=args.minutes,
             stat=args.stat,
             period=args.period,
+            max_datapoints=args.max_datapoints,
+            high_resolution=args.high_resolution,
+            offline=args.offline,
         )
-
-        metric_watcher.log_response(response=response)
-        metric_watcher.log_metric(response=response)
-        metric_watcher.log_metric_summary(response=response)
-
-        name_prefix = f"{metric_watcher.metric_id}_{metric_watcher.metric_name}"
-        if args.save:
-            metric_watcher.save_metric_json(
-                file_path=os.path.join(args.dir, f"{name_prefix}.json"),
-                response=response,
-            )
-            metric_watcher.save_metric_csv(
-                file_path=os.path.join(args.dir, f"{name_prefix}.csv"),
-                response=response,
-            )
-            metric_watcher.save_response_json(
-                file_path=os.path.join(args.dir, f"{name_prefix}_response.json"),
-                response=response,
+        now = datetime.datetime.now(pytz.utc)
+        series_kwargs = dict(
+            start_time=now
+            - datetime.timedelta(
+                days=args.days, hours=args.hours, minutes=args.minutes
+            ),
+            end_time=now,
+            stat=args.stat,
+            period=args.period,
+            max_datapoints=args.max_datapoints,
+            high_resolution=args.high_resolution,
+            offline=args.offline,
+        )
+        if isinstance(mw_setup, MetricBundleSetup):
+            bundle_watcher = MetricBundleWatcher(
+                **mw_setup.to_dict(),
+                store=store,
+                handler_workers=args.handler_workers,
+                handler_executor=args.handler_executor,
             )
-
-        if args.plot:
-            metric_watcher.save_metric_plot(
-                file_path=os.path.join(args.dir, f"{name_prefix}.png"),
-                response=response,
+            if args.low_memory:
+                bundle_series = bundle_watcher.query_metric_series(**series_kwargs)
+                if bundle_series is None:
+                    sys.exit(1)
+                routed_series = bundle_watcher.route_series(bundle_series)
+                del bundle_series
+                for metric_watcher, series in routed_series.values():
+                    handle_metric_series(metric_watcher, series, args)
+            else:
+                bundle_response = bundle_watcher.query_ec2_metrics(**query_kwargs)
+                if bundle_response is None:
+                    sys.exit(1)
+                for metric_watcher, response in bundle_watcher.route_response(
+                    bundle_response
+                ).values():
+                    handle_metric_response(metric_watcher, response, args)
+        else:
+            metric_watcher = MetricWatcher(
+                **mw_setup.to_dict(),
+                store=store,
+                handler_workers=args.handler_workers,
+                handler_executor=args.handler_executor,
             )
+            if args.low_memory:
+                series = metric_watcher.query_metric_series(**series_kwargs)
+                if series is not None:
+                    handle_metric_series(metric_watcher, series, args)
+            else:
+                response = metric_watcher.query_ec2_metrics(**query_kwargs)
+                handle_metric_response(metric_watcher, response, args)
 
         if args.uptime:
-            dimensions_list = [Dimension.from_cli(dimension_str) for dimension_str in args.dimensions]
+            dimensions_list = [
+                Dimension.from_cli(dimension_str) for dimension_str in args.dimensions
+            ]
             for dimension in dimensions_list:
                 if dimension.Name == "InstanceId":
                     ec2_instance_id = dimension.Value
@@ -97,9 +378,9 @@ def main():
                 sys.exit(1)
             try:
                 seconds_run = metric_watcher.get_ec2_uptime(
-                    days=max(
-                        15, args.days
-                    ),  # metrics with a period of 60 seconds are available for 15 days
+                    # look back at least 15 days, the period of the older
+                    # reports is adjusted to the data retention
+                    days=max(15, args.days),
                     hours=args.hours,
                     minutes=args.minutes,
                     ec2_instance_id=ec2_instance_id,
@@ -109,8 +390,23 @@ def main():
             except Exception as e:
                 _LOGGER.warning(f"Failed to get instance uptime ({e})")
 
+        if store is not None:
+            store.close()
+
     if args.command == LOG_CMD:
 
+        if not 0 < args.events_limit <= LOG_EVENTS_LIMIT_MAX:
+            parser.error(
+                f"argument --events-limit: must be between 1 and {LOG_EVENTS_LIMIT_MAX}"
+            )
+        if args.output_format != "text":
+            if args.parser == "regex" and args.parser_regex is None:
+                parser.error("argument --parser: regex requires --parser-regex")
+            try:
+                log_parser = get_log_parser(args.parser, regex=args.parser_regex)
+            except re.error as e:
+                parser.error(f"argument --parser-regex: invalid regex ({e})")
+
         log_watcher = LogWatcher(
             log_group_name=args.log_group_name,
             log_stream_name=args.log_stream_name,
@@ -120,10 +416,278 @@ def main():
             aws_region_name=args.aws_region,
         )
 
-        print(log_watcher.return_formatted_logs()[0])
+        if args.output_format == "text":
+            print(
+                log_watcher.return_formatted_logs(
+                    events_limit=args.events_limit, prefetch=args.prefetch
+                )[0]
+            )
+            if args.save:
+                log_watcher.save_log_file(
+                    file_path=os.path.join(
+                        args.dir, f"{args.log_group_name}-{args.log_stream_name}.log"
+                    ),
+                    events_limit=args.events_limit,
+                    prefetch=args.prefetch,
+                )
+        else:
+            if args.save:
+                log_watcher.save_structured_log_file(
+                    file_path=os.path.join(
+                        args.dir,
+                        f"{args.log_group_name}-{args.log_stream_name}"
+                        + (
+                            ".ndjson"
+                            if args.output_format == "ndjson"
+                            else f".{args.output_format}.ndjson"
+                        ),
+                    ),
+                    parser=log_parser,
+                    output_format=args.output_format,
+                    events_limit=args.events_limit,
+                    prefetch=args.prefetch,
+                )
+            else:
+                log_watcher.write_structured_logs(
+                    stream=sys.stdout,
+                    parser=log_parser,
+                    output_format=args.output_format,
+                    events_limit=args.events_limit,
+                    prefetch=args.prefetch,
+                )
+
+    if args.command == COLLECT_CMD:
+
+        if not args.preset_name and not args.preset_path:
+            parser.error("at least one --preset-name or --preset-path is required")
+        try:
+            detector = build_detector(args)
+        except ValueError as e:
+            parser.error(str(e))
+
+        setups = [
+            get_metric_watcher_setup(
+                namespace=argparse.Namespace(
+                    preset_name=preset_name,
+                    preset_path=preset_path,
+                    namespace=args.namespace,
+                    dimensions=args.dimensions,
+                    metric=None,
+                    id=None,
+                ),
+                presets_dir=args.preset_dir,
+            )
+            for preset_name, preset_path in [(name, None) for name in args.preset_name]
+            + [(None, path) for path in args.preset_path]
+        ]
+        watchers = build_watchers(
+            setups,
+            aws_access_key_id=args.aws_access_key_id,
+            aws_secret_access_key=args.aws_secret_access_key,
+            aws_session_token=args.aws_session_token,
+            aws_region_name=args.aws_region,
+        )
+        sinks: List[MetricSink] = []
+        exporter = None
+        if args.exporter_port is not None:
+            cache = OpenMetricsCache(max_age=args.exporter_max_age)
+            exporter = OpenMetricsExporter(
+                cache, host=args.exporter_address, port=args.exporter_port
+            )
+            sinks.append(cache)
         if args.save:
-            log_watcher.save_log_file(
-                file_path=os.path.join(
-                    args.dir, f"{args.log_group_name}-{args.log_stream_name}.log"
+            os.makedirs(args.dir, exist_ok=True)
+            sinks.append(
+                RotatingFileMetricSink(
+                    file_path=os.path.join(args.dir, "metrics.ndjson"),
+                    max_bytes=args.max_bytes,
+                    backup_count=args.backup_count,
+                )
+            )
+        store = open_store(args)
+        if store is not None:
+            sinks.append(store)
+        elif not args.save and exporter is None:
+            sinks.append(StreamMetricSink(sys.stdout))
+        if detector is not None:
+            sinks.append(
+                AnomalySink(
+                    detector,
+                    file_path=os.path.join(args.dir, "events.ndjson")
+                    if args.save
+                    else None,
+                )
+            )
+        collector = MetricCollector(
+            watchers=watchers,
+            sinks=sinks,
+            stat=args.stat,
+            period=args.period,
+            interval=args.interval,
+            jitter=args.jitter,
+            lookback=args.lookback,
+            low_memory=args.low_memory,
+        )
+        signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+        _LOGGER.info(
+            f"Collecting {len(watchers)} presets every {args.interval} seconds"
+        )
+        if exporter is not None:
+            exporter.start()
+        try:
+            collector.run(max_polls=args.max_polls)
+        except KeyboardInterrupt:
+            collector.stop()
+        finally:
+            if exporter is not None:
+                exporter.stop()
+
+    if args.command == TOP_CMD:
+
+        try:
+            aggregator = FleetAggregator(
+                top=args.top,
+                rank_by=args.rank_by,
+                ascending=args.ascending,
+                percentile=args.percentile,
+                threshold=args.threshold,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        fleet_watcher = FleetWatcher(
+            namespace=args.namespace,
+            metric_name=args.metric,
+            dimension_name=args.dimension_name,
+            dimension_values=args.dimension_values,
+            dimensions_list=[
+                Dimension.from_cli(dimension_str)
+                for dimension_str in args.dimensions or []
+            ],
+            metric_unit=args.unit,
+            aws_access_key_id=args.aws_access_key_id,
+            aws_secret_access_key=args.aws_secret_access_key,
+            aws_session_token=args.aws_session_token,
+            aws_region_name=args.aws_region,
+        )
+        now = datetime.datetime.now(pytz.utc)
+        fleet_watcher.aggregate(
+            aggregator,
+            start_time=now
+            - datetime.timedelta(
+                days=args.days, hours=args.hours, minutes=args.minutes
+            ),
+            end_time=now,
+            stat=args.stat,
+            period=args.period,
+        )
+        console = Console()
+        console.print(
+            aggregator.table(
+                aggregator.ranked(),
+                title=f"Top {args.top} of {aggregator.series_count} "
+                f"'{args.dimension_name}' by {args.rank_by} {args.stat} "
+                f"'{args.metric}'",
+            )
+        )
+        if args.threshold is not None:
+            console.print(
+                aggregator.table(
+                    aggregator.exceeding(),
+                    title=f"'{args.dimension_name}' with '{args.metric}' "
+                    f"above {args.threshold:g}",
+                )
+            )
+        if args.save:
+            os.makedirs(args.dir, exist_ok=True)
+            aggregator.save_csv(
+                os.path.join(args.dir, f"top_{args.metric}.csv"), aggregator.ranked()
+            )
+            if args.threshold is not None:
+                aggregator.save_csv(
+                    os.path.join(args.dir, f"exceeding_{args.metric}.csv"),
+                    aggregator.exceeding(),
+                )
+
+    if args.command == UPTIME_CMD:
+
+        instance_ids = list(args.instance_ids)
+        if args.instance_ids_file is not None:
+            with open(args.instance_ids_file) as f:
+                instance_ids.extend(line.strip() for line in f if line.strip())
+        try:
+            uptime_reporter = UptimeReporter(
+                namespace=args.namespace,
+                metric_name=args.metric,
+                dimension_name=args.dimension_name,
+                workers=args.workers,
+                aws_access_key_id=args.aws_access_key_id,
+                aws_secret_access_key=args.aws_secret_access_key,
+                aws_session_token=args.aws_session_token,
+                aws_region_name=args.aws_region,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        now = datetime.datetime.now(pytz.utc)
+        lifetimes = uptime_reporter.report(
+            start_time=now
+            - datetime.timedelta(
+                days=args.days, hours=args.hours, minutes=args.minutes
+            ),
+            end_time=now,
+            instance_ids=instance_ids or None,
+            period=args.period,
+        )
+        Console().print(
+            uptime_reporter.table(
+                lifetimes, title=f"Uptime of {len(lifetimes)} EC2 instances"
+            )
+        )
+        if args.save:
+            os.makedirs(args.dir, exist_ok=True)
+            uptime_reporter.save(
+                os.path.join(args.dir, f"uptime.{args.format}"),
+                lifetimes,
+                file_format=args.format,
+            )
+
+    if args.command == DISCOVER_CMD:
+
+        catalog = MetricCatalog(
+            path=args.catalog,
+            ttl=args.ttl,
+            aws_access_key_id=args.aws_access_key_id,
+            aws_secret_access_key=args.aws_secret_access_key,
+            aws_session_token=args.aws_session_token,
+            aws_region_name=args.aws_region,
+        )
+        dimensions = [
+            Dimension.from_cli(dimension_str) for dimension_str in args.dimensions or []
+        ]
+        if not args.offline:
+            catalog.refresh(args.namespace, dimensions, force=args.refresh)
+        schemas = catalog.schemas(
+            catalog.search(
+                namespace=args.namespace,
+                metric_name=args.metric,
+                dimension_names=args.dimension_names,
+                dimensions=dimensions,
+            )
+        )
+        Console().print(
+            catalog.table(
+                schemas,
+                title=f"{len(schemas)} metrics in namespace: {args.namespace or 'all'}",
+            )
+        )
+        if args.preset is not None:
+            try:
+                preset = catalog.to_preset(
+                    schemas, description=args.preset_description, metric_unit=args.unit
                 )
+            except ValueError as e:
+                parser.error(str(e))
+            with open(args.preset, "w") as f:
+                json.dump(preset, f, indent=4)
+            _LOGGER.info(
+                f"Saved the preset of {len(schemas)} metrics to: {args.preset}"
             )
@@ -1,7 +1,10 @@
-from typing import Optional
+from typing import Any, Optional
 
 import boto3
 
+from cloudwatcher.governor import NO_RETRIES_CONFIG, get_api_governor
+from cloudwatcher.instrumentation import get_instrumentation
+
 
 class CloudWatcher:
     """
@@ -15,6 +18,7 @@ class CloudWatcher:
         aws_access_key_id: Optional[str] = None,
         aws_secret_access_key: Optional[str] = None,
         aws_session_token: Optional[str] = None,
+        client: Optional[Any] = None,
     ) -> None:
         """
         Initialize CloudWatcher
@@ -25,13 +29,25 @@ class CloudWatcher:
             aws_access_key_id (Optional[str]): The AWS access key ID.
             aws_secret_access_key (Optional[str]): The AWS secret access key.
             aws_session_token (Optional[str]): The AWS session token.
+            client (Optional[Any]): An existing client of the service to reuse.
+                The credentials are not used to create a client if provided.
+
+        The calls of the client are rate limited and retried by the shared
+        API governor, see `cloudwatcher.governor.get_api_governor`, and recorded
+        by the shared instrumentation, see
+        `cloudwatcher.instrumentation.get_instrumentation`.
         """
         self.aws_region_name = aws_region_name or "us-east-1"
         self.service_name = service_name
-        self.client: boto3.Session.client = boto3.client(
+        self.client: boto3.Session.client = client or boto3.client(
             service_name=self.service_name,
             region_name=self.aws_region_name,
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
+            config=NO_RETRIES_CONFIG,
         )
+        self.governor = get_api_governor()
+        self.governor.attach(self.client)
+        self.instrumentation = get_instrumentation()
+        self.instrumentation.attach(self.client)
@@ -0,0 +1,281 @@
+import datetime
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import pytz
+
+from cloudwatcher.instrumentation import get_instrumentation
+from cloudwatcher.metric_handlers import TimedMetric
+from cloudwatcher.metric_sinks import MetricSample, MetricSink
+from cloudwatcher.metricwatcher import MetricBundleWatcher, MetricWatcher
+from cloudwatcher.preset import MetricBundleSetup, Preset
+
+_LOGGER = logging.getLogger(__name__)
+
+Watcher = Union[MetricWatcher, MetricBundleWatcher]
+
+
+def build_watchers(
+    setups: List[Preset],
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    aws_region_name: Optional[str] = None,
+) -> List[Watcher]:
+    """
+    Create the metric watchers for the presets, sharing a single client
+
+    Args:
+        setups (List[Preset]): the metric watcher or bundle setups
+        aws_access_key_id (Optional[str]): the AWS access key ID
+        aws_secret_access_key (Optional[str]): the AWS secret access key
+        aws_session_token (Optional[str]): the AWS session token
+        aws_region_name (Optional[str]): the AWS region name
+
+    Returns:
+        List[Watcher]: the metric watchers
+    """
+    watchers: List[Watcher] = []
+    client = None
+    for setup in setups:
+        setup_dict = dict(setup.to_dict())
+        setup_dict.update(
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            aws_region_name=aws_region_name,
+        )
+        watcher_class = (
+            MetricBundleWatcher
+            if isinstance(setup, MetricBundleSetup)
+            else MetricWatcher
+        )
+        watcher = watcher_class(**setup_dict, client=client)
+        client = watcher.client
+        watchers.append(watcher)
+    return watchers
+
+
+class MetricCollector:
+    """
+    Poll the metric watchers on a schedule and write the new datapoints to sinks
+
+    The watchers and their clients are created once and reused by every poll.
+    Each poll only queries the time range since the newest datapoint seen
+    for the watcher, bounded by the lookback, and only the datapoints newer
+    than the ones already written are passed to the sinks. The polls end at the
+    start of the current period, so the period still being aggregated, whose
+    datapoint would be revised, is written by a later poll once complete.
+    """
+
+    def __init__(
+        self,
+        watchers: List[Watcher],
+        sinks: List[MetricSink],
+        stat: Union[str, List[str]] = "Maximum",
+        period: int = 60,
+        interval: float = 60.0,
+        jitter: float = 5.0,
+        lookback: float = 600.0,
+        low_memory: bool = False,
+    ) -> None:
+        """
+        Initialize the collector
+
+        Args:
+            watchers (List[Watcher]): the metric watchers to poll
+            sinks (List[MetricSink]): the sinks to write the samples to
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query
+            period (int): the period of the metrics
+            interval (float): the time between the polls, in seconds
+            jitter (float): the maximum random delay added to the interval,
+                in seconds
+            lookback (float): the maximum age of the queried datapoints,
+                in seconds
+            low_memory (bool): whether to parse the responses into compact timed
+                metrics and write the samples of one timed metric at a time,
+                releasing it once written, to bound the memory used by large
+                responses
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid polling interval: {interval}")
+        if jitter < 0:
+            raise ValueError(f"Invalid polling jitter: {jitter}")
+        if lookback < period:
+            raise ValueError(
+                f"The lookback ({lookback}s) must not be shorter "
+                f"than the period ({period}s)"
+            )
+        self.watchers = watchers
+        self.sinks = sinks
+        self.stat = stat
+        self.period = period
+        self.interval = interval
+        self.jitter = jitter
+        self.lookback = lookback
+        self.low_memory = low_memory
+        self._watermarks: Dict[Tuple[int, Optional[str]], datetime.datetime] = {}
+        self._stop = threading.Event()
+
+    def _members(
+        self, watcher: Watcher, response: Dict
+    ) -> List[Tuple[MetricWatcher, Dict]]:
+        """
+        Get the metric watchers and their responses
+        """
+        if isinstance(watcher, MetricBundleWatcher):
+            return list(watcher.route_response(response).values())
+        return [(watcher, response)]
+
+    def _new_samples(
+        self, key: int, watcher: MetricWatcher, timed_metric: TimedMetric
+    ) -> List[MetricSample]:
+        """
+        Get the samples newer than the watermark and advance the watermark
+        """
+        watermark = self._watermarks.get((key, timed_metric.id))
+        samples = [
+            sample
+            for sample in watcher.metric_samples(timed_metric)
+            if watermark is None or sample.timestamp > watermark
+        ]
+        if samples:
+            samples.sort(key=lambda sample: sample.timestamp)
+            self._watermarks[(key, timed_metric.id)] = samples[-1].timestamp
+        return samples
+
+    def _write_series(
+        self, key: int, watcher: Watcher, series: List[TimedMetric]
+    ) -> int:
+        """
+        Write the new samples of the timed metrics to the sinks, one timed
+        metric at a time, and release each of them once written
+
+        Args:
+            key (int): the index of the watcher
+            watcher (Watcher): the watcher the timed metrics were queried by
+            series (List[TimedMetric]): the timed metrics. The list is emptied
+
+        Returns:
+            int: the number of samples written
+        """
+        if isinstance(watcher, MetricBundleWatcher):
+            members = list(watcher.route_series(series).values())
+        else:
+            members = [(watcher, list(series))]
+        series.clear()
+        instrumentation = get_instrumentation()
+        written = 0
+        for member, member_series in members:
+            member_series.reverse()
+            while member_series:
+                samples = self._new_samples(key, member, member_series.pop())
+                if not samples:
+                    continue
+                for sink in self.sinks:
+                    with instrumentation.timer(f"{sink.__class__.__name__}.write"):
+                        sink.write(samples)
+                written += len(samples)
+        return written
+
+    def poll(self, now: Optional[datetime.datetime] = None) -> int:
+        """
+        Query the new datapoints of all the watchers and write them to the sinks
+
+        Args:
+            now (Optional[datetime.datetime]): the time of the poll, the queried
+                time range ends at the start of its period
+
+        Returns:
+            int: the number of samples written
+        """
+        now = now or datetime.datetime.now(pytz.utc)
+        end_time = datetime.datetime.fromtimestamp(
+            now.timestamp() // self.period * self.period, pytz.utc
+        )
+        instrumentation = get_instrumentation()
+        earliest = end_time - datetime.timedelta(seconds=self.lookback)
+        written = 0
+        for key, watcher in enumerate(self.watchers):
+            watermarks = [
+                watermark
+                for (watcher_key, _), watermark in self._watermarks.items()
+                if watcher_key == key
+            ]
+            # the newest datapoint seen is queried again, it is filtered out
+            start_time = max([earliest, min(watermarks)] if watermarks else [earliest])
+            if self.low_memory:
+                series = watcher.query_metric_series(
+                    start_time=start_time,
+                    end_time=end_time,
+                    stat=self.stat,
+                    period=self.period,
+                )
+                if series is None:
+                    _LOGGER.warning(f"Failed to query the metrics of {watcher}")
+                    continue
+                written += self._write_series(key, watcher, series)
+                continue
+            response = watcher.query_metrics(
+                start_time=start_time,
+                end_time=end_time,
+                stat=self.stat,
+                period=self.period,
+            )
+            if response is None:
+                _LOGGER.warning(f"Failed to query the metrics of {watcher}")
+                continue
+            samples = [
+                sample
+                for member, member_response in self._members(watcher, response)
+                for timed_metric in member.timed_metric_factory(member_response)
+                for sample in self._new_samples(key, member, timed_metric)
+            ]
+            if not samples:
+                continue
+            for sink in self.sinks:
+                with instrumentation.timer(f"{sink.__class__.__name__}.write"):
+                    sink.write(samples)
+            written += len(samples)
+        _LOGGER.info(f"Collected {written} new samples")
+        return written
+
+    def run(self, max_polls: Optional[int] = None) -> None:
+        """
+        Poll the watchers until stopped
+
+        A failed poll is logged and the collection continues with the next poll.
+        The sinks are closed when the collection stops.
+
+        Args:
+            max_polls (Optional[int]): the number of polls to run, unlimited
+                if not provided
+        """
+        polls = 0
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.poll()
+                except Exception as e:
+                    _LOGGER.error(f"Failed to collect the metrics ({e})")
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+                elapsed = time.monotonic() - started
+                self._stop.wait(
+                    max(0.0, self.interval - elapsed) + random.uniform(0, self.jitter)
+                )
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+    def stop(self) -> None:
+        """
+        Stop the collection after the current poll
+        """
+        self._stop.set()
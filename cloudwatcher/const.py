@@ -1,9 +1,17 @@
 METRIC_CMD = "metric"
 LOG_CMD = "log"
+COLLECT_CMD = "collect"
+TOP_CMD = "top"
+UPTIME_CMD = "uptime"
+DISCOVER_CMD = "discover"
 
 SUBPARSER_MESSAGES = {
     METRIC_CMD: "Interact with AWS CloudWatch metrics.",
     LOG_CMD: "Interact with AWS CloudWatch logs.",
+    COLLECT_CMD: "Collect AWS CloudWatch metrics continuously.",
+    TOP_CMD: "Rank the instances by a statistic of an AWS CloudWatch metric.",
+    UPTIME_CMD: "Report the uptime of many EC2 instances.",
+    DISCOVER_CMD: "Discover the AWS CloudWatch metrics and generate presets.",
 }
 
 CLI_DEFAULTS = {
@@ -15,6 +23,37 @@ CLI_DEFAULTS = {
     "unit": "Bytes",
     "stat": "Maximum",
     "period": 60,
+    "max_datapoints": 1440,
     "dir": "./",
     "region": "us-east-1",
+    "max_attempts": 5,
+    "log_output_format": "text",
+    "log_parser": "json",
+    "events_limit": 1000,
+    "interval": 60.0,
+    "jitter": 5.0,
+    "lookback": 600.0,
+    "max_bytes": 10485760,
+    "backup_count": 5,
+    "exporter_address": "0.0.0.0",
+    "compact_period": 3600,
+    "dimension_name": "InstanceId",
+    "top": 20,
+    "rank_by": "maximum",
+    "percentile": 95.0,
+    "zscore_window": 30,
+    "uptime_namespace": "AWS/EC2",
+    "uptime_metric": "CPUUtilization",
+    "uptime_period": 300,
+    "uptime_days": 14,
+    "workers": 4,
+    "report_format": "csv",
+    "catalog_ttl": 86400.0,
+    "handler_workers": 1,
 }
+
+# maximum number of log events returned by a single GetLogEvents call
+LOG_EVENTS_LIMIT_MAX = 10000
+
+LOG_OUTPUT_FORMATS = ["text", "ndjson", "columnar"]
+LOG_PARSER_NAMES = ["json", "logfmt", "regex"]
@@ -0,0 +1,410 @@
+import json
+import logging
+import math
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from cloudwatcher.metric_handlers import TimedMetric
+from cloudwatcher.metric_sinks import MetricSample, MetricSink
+
+_LOGGER = logging.getLogger(__name__)
+
+DIRECTIONS = ["above", "below"]
+
+
+@dataclass
+class AnomalyEvent:
+    """
+    A datapoint flagged by a detector
+
+    Args:
+        series (str): The key of the series the datapoint belongs to
+        kind (str): The kind of the event, e.g. `threshold` or `zscore`
+        timestamp (datetime): The timestamp of the datapoint
+        value (float): The value of the datapoint
+        score (float): The value compared to the limit, e.g. the rate of
+            change or the z-score
+        limit (float): The limit the score crossed
+        message (str): A human readable description of the event
+    """
+
+    series: str
+    kind: str
+    timestamp: datetime
+    value: float
+    score: float
+    limit: float
+    message: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the event to a JSON serializable dictionary
+
+        Returns:
+            Dict[str, Any]: The event, with the timestamp in ISO 8601 format
+        """
+        return {
+            "series": self.series,
+            "kind": self.kind,
+            "timestamp": self.timestamp.isoformat(),
+            "value": self.value,
+            "score": self.score,
+            "limit": self.limit,
+            "message": self.message,
+        }
+
+
+class Detector:
+    """
+    Class to establish the interface for a streaming detector
+
+    A detector is fed the datapoints of a single series in ascending time order
+    and keeps a bounded state, so each datapoint is processed in constant time.
+    """
+
+    def update(
+        self, series: str, timestamp: datetime, value: float
+    ) -> Optional[AnomalyEvent]:
+        """
+        Process the next datapoint of the series
+
+        Args:
+            series (str): the key of the series, used in the events
+            timestamp (datetime): the timestamp of the datapoint
+            value (float): the value of the datapoint
+
+        Returns:
+            Optional[AnomalyEvent]: the event, if the datapoint is flagged
+        """
+        raise NotImplementedError
+
+
+class ThresholdDetector(Detector):
+    """
+    Flag the datapoints crossing a threshold
+
+    Only the crossings are flagged, not every datapoint beyond the threshold,
+    and the return within the threshold is flagged as a `recovery` event.
+    """
+
+    def __init__(self, threshold: float, direction: str = "above") -> None:
+        """
+        Initialize the detector
+
+        Args:
+            threshold (float): the threshold
+            direction (str): whether the values `above` or `below` the
+                threshold are flagged
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(
+                f"Invalid threshold direction: {direction}. "
+                f"Must be one of: {DIRECTIONS}"
+            )
+        self.threshold = threshold
+        self.direction = direction
+        self._breached = False
+
+    def update(
+        self, series: str, timestamp: datetime, value: float
+    ) -> Optional[AnomalyEvent]:
+        breached = (
+            value > self.threshold
+            if self.direction == "above"
+            else value < self.threshold
+        )
+        if breached == self._breached:
+            return None
+        self._breached = breached
+        if breached:
+            kind = "threshold"
+            message = f"{series}: {value} is {self.direction} {self.threshold}"
+        else:
+            kind = "recovery"
+            message = f"{series}: {value} is back within {self.threshold}"
+        return AnomalyEvent(
+            series=series,
+            kind=kind,
+            timestamp=timestamp,
+            value=value,
+            score=value,
+            limit=self.threshold,
+            message=message,
+        )
+
+
+class RateOfChangeDetector(Detector):
+    """
+    Flag the datapoints changing faster than a rate from the previous datapoint
+    """
+
+    def __init__(self, max_rate: float, absolute: bool = False) -> None:
+        """
+        Initialize the detector
+
+        Args:
+            max_rate (float): the maximum change per second
+            absolute (bool): whether the decreases are flagged too, only the
+                increases are flagged otherwise
+        """
+        if max_rate <= 0:
+            raise ValueError(f"Invalid maximum rate of change: {max_rate}")
+        self.max_rate = max_rate
+        self.absolute = absolute
+        self._previous: Optional[Tuple[datetime, float]] = None
+
+    def update(
+        self, series: str, timestamp: datetime, value: float
+    ) -> Optional[AnomalyEvent]:
+        previous, self._previous = self._previous, (timestamp, value)
+        if previous is None:
+            return None
+        elapsed = (timestamp - previous[0]).total_seconds()
+        if elapsed <= 0:
+            return None
+        rate = (value - previous[1]) / elapsed
+        if (abs(rate) if self.absolute else rate) <= self.max_rate:
+            return None
+        return AnomalyEvent(
+            series=series,
+            kind="rate",
+            timestamp=timestamp,
+            value=value,
+            score=rate,
+            limit=self.max_rate,
+            message=f"{series}: changed by {rate:.6g}/s, faster than {self.max_rate}/s",
+        )
+
+
+class ZScoreDetector(Detector):
+    """
+    Flag the datapoints far from the mean of the previous datapoints
+
+    The mean and the variance of the rolling window are updated as datapoints
+    enter and leave it (Welford's method), so the window is never scanned and
+    large values, e.g. memory in bytes, do not lose precision. A datapoint is
+    compared to the window before it is added to it.
+    """
+
+    def __init__(
+        self, threshold: float = 3.0, window: int = 30, min_datapoints: int = 10
+    ) -> None:
+        """
+        Initialize the detector
+
+        Args:
+            threshold (float): the z-score beyond which the datapoints are flagged
+            window (int): the number of previous datapoints in the window
+            min_datapoints (int): the number of datapoints in the window required
+                before the datapoints are scored
+        """
+        if threshold <= 0:
+            raise ValueError(f"Invalid z-score threshold: {threshold}")
+        if window < 2:
+            raise ValueError(f"Invalid z-score window: {window}")
+        self.threshold = threshold
+        self.window = window
+        self.min_datapoints = max(2, min(min_datapoints, window))
+        self._values: Deque[float] = deque(maxlen=window)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def _score(self, value: float) -> Optional[float]:
+        """
+        Get the z-score of the value against the window, None if the window
+        is too short or constant
+        """
+        count = len(self._values)
+        if count < self.min_datapoints:
+            return None
+        std = math.sqrt(max(self._m2, 0.0) / count)
+        # a constant window does not tell how unusual a change is
+        if std == 0:
+            return None
+        return (value - self._mean) / std
+
+    def update(
+        self, series: str, timestamp: datetime, value: float
+    ) -> Optional[AnomalyEvent]:
+        score = self._score(value)
+        if len(self._values) == self.window:
+            dropped = self._values.popleft()
+            if self._values:
+                delta = dropped - self._mean
+                self._mean -= delta / len(self._values)
+                self._m2 -= delta * (dropped - self._mean)
+            else:
+                self._mean = self._m2 = 0.0
+        self._values.append(value)
+        delta = value - self._mean
+        self._mean += delta / len(self._values)
+        self._m2 += delta * (value - self._mean)
+        if score is None or abs(score) <= self.threshold:
+            return None
+        return AnomalyEvent(
+            series=series,
+            kind="zscore",
+            timestamp=timestamp,
+            value=value,
+            score=score,
+            limit=self.threshold,
+            message=f"{series}: z-score of {score:.3g} over the last "
+            f"{len(self._values) - 1} datapoints",
+        )
+
+
+DetectorFactory = Callable[[], List[Detector]]
+
+
+class AnomalyDetector:
+    """
+    Run the detectors over the series, incrementally
+
+    Each series gets its own detectors and a watermark, the timestamp of
+    the newest datapoint processed. The datapoints at or before the watermark,
+    e.g. from overlapping repeated queries or revisited pages, are skipped,
+    so every datapoint is processed once, in ascending time order.
+    """
+
+    def __init__(self, detectors: DetectorFactory) -> None:
+        """
+        Initialize the detection stage
+
+        Args:
+            detectors (DetectorFactory): a function creating the detectors
+                of a new series
+        """
+        self.detectors = detectors
+        self._series: Dict[str, Tuple[List[Detector], Optional[datetime]]] = {}
+
+    def update(
+        self, series: str, datapoints: List[Tuple[datetime, float]]
+    ) -> List[AnomalyEvent]:
+        """
+        Process the new datapoints of a series
+
+        Args:
+            series (str): the key of the series
+            datapoints (List[Tuple[datetime, float]]): the timestamps and values,
+                in any order
+
+        Returns:
+            List[AnomalyEvent]: the events, in ascending time order
+        """
+        detectors, watermark = self._series.get(series) or (self.detectors(), None)
+        events: List[AnomalyEvent] = []
+        for timestamp, value in sorted(datapoints, key=lambda x: x[0]):
+            if watermark is not None and timestamp <= watermark:
+                continue
+            watermark = timestamp
+            if value is None or math.isnan(value):
+                continue
+            for detector in detectors:
+                event = detector.update(series, timestamp, value)
+                if event is not None:
+                    events.append(event)
+        self._series[series] = (detectors, watermark)
+        return events
+
+    def process(
+        self, timed_metric: TimedMetric, series: Optional[str] = None
+    ) -> List[AnomalyEvent]:
+        """
+        Process the new datapoints of a timed metric
+
+        Args:
+            timed_metric (TimedMetric): the timed metric, e.g. the latest page
+                or query of the series
+            series (Optional[str]): the key of the series, defaults to
+                the ID or label of the timed metric
+
+        Returns:
+            List[AnomalyEvent]: the events, in ascending time order
+        """
+        return self.update(
+            series or timed_metric.id or timed_metric.label,
+            list(zip(timed_metric.timestamps, timed_metric.values)),
+        )
+
+    def reset(self, series: Optional[str] = None) -> None:
+        """
+        Forget the state of a series, or of all the series
+
+        Args:
+            series (Optional[str]): the key of the series, all the series
+                if not provided
+        """
+        if series is None:
+            self._series.clear()
+        else:
+            self._series.pop(series, None)
+
+
+def sample_series(sample: MetricSample) -> str:
+    """
+    Get the key of the series of a metric sample
+
+    Args:
+        sample (MetricSample): the sample
+
+    Returns:
+        str: the label or ID of the result, followed by the statistic and
+            the dimensions
+    """
+    dimensions = ",".join(f"{k}={v}" for k, v in sorted(sample.dimensions.items()))
+    name = sample.label or sample.metric_id or sample.metric_name
+    return f"{name}[{sample.stat}]" + (f"{{{dimensions}}}" if dimensions else "")
+
+
+class AnomalySink(MetricSink):
+    """
+    Run an anomaly detector over the collected samples and emit the events
+
+    The events are logged as warnings and, if a file is provided, appended to it
+    as one JSON object per event.
+    """
+
+    def __init__(
+        self,
+        detector: AnomalyDetector,
+        file_path: Optional[str] = None,
+        callback: Optional[Callable[[AnomalyEvent], None]] = None,
+    ) -> None:
+        """
+        Initialize the sink
+
+        Args:
+            detector (AnomalyDetector): the detector
+            file_path (Optional[str]): the path of the file to write the events to
+            callback (Optional[Callable[[AnomalyEvent], None]]): a function
+                called with each event
+        """
+        self.detector = detector
+        self.file_path = file_path
+        self.callback = callback
+        self.stream: Optional[IO[str]] = (
+            open(file_path, "a", encoding="UTF8") if file_path is not None else None
+        )
+
+    def write(self, samples: List[MetricSample]) -> None:
+        grouped: Dict[str, List[Tuple[datetime, float]]] = {}
+        for sample in samples:
+            grouped.setdefault(sample_series(sample), []).append(
+                (sample.timestamp, sample.value)
+            )
+        for series, datapoints in grouped.items():
+            for event in self.detector.update(series, datapoints):
+                _LOGGER.warning(f"{event.kind} at {event.timestamp}: {event.message}")
+                if self.stream is not None:
+                    self.stream.write(json.dumps(event.to_dict()) + "\n")
+                if self.callback is not None:
+                    self.callback(event)
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
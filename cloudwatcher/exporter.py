@@ -0,0 +1,270 @@
+import datetime
+import logging
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from cloudwatcher.metric_sinks import MetricSample, MetricSink
+
+_LOGGER = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+OPENMETRICS_PATH = "/metrics"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+# the labels set by the exporter, the dimensions with these names are prefixed
+RESERVED_LABELS = ["namespace", "id", "stat"]
+DIMENSION_LABEL_PREFIX = "dimension_"
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _sanitize_name(name: str) -> str:
+    """
+    Convert the name to a valid OpenMetrics metric or label name
+
+    Args:
+        name (str): the name to convert
+
+    Returns:
+        str: the name with the invalid characters replaced with underscores
+    """
+    name = _INVALID_NAME_CHARS.sub("_", name)
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def _escape_label_value(value: str) -> str:
+    """
+    Escape the label value for the OpenMetrics text format
+
+    Args:
+        value (str): the label value
+
+    Returns:
+        str: the escaped label value
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """
+    Format the sample value for the OpenMetrics text format
+
+    Args:
+        value (float): the sample value
+
+    Returns:
+        str: the value, with the non-finite values spelled as in OpenMetrics
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _dimension_label(dim_name: str) -> str:
+    """
+    Convert the dimension name to a label name not colliding with the labels
+    set by the exporter
+
+    Args:
+        dim_name (str): the dimension name
+
+    Returns:
+        str: the label name
+    """
+    label = _sanitize_name(dim_name)
+    return f"{DIMENSION_LABEL_PREFIX}{label}" if label in RESERVED_LABELS else label
+
+
+class OpenMetricsCache(MetricSink):
+    """
+    Keep the latest sample of each series and its OpenMetrics exposition
+
+    The exposition is rendered once per batch of written samples, so serving it
+    does not depend on the number of scrapes nor on the CloudWatch latency.
+    """
+
+    def __init__(self, prefix: str = "cloudwatch", max_age: Optional[float] = None):
+        """
+        Initialize the cache
+
+        Args:
+            prefix (str): the prefix of the exposed metric names
+            max_age (Optional[float]): the age of the samples, in seconds, after
+                which the series are no longer exposed, e.g. the metrics of
+                terminated instances. Kept forever if not provided
+        """
+        self.prefix = _sanitize_name(prefix)
+        self.max_age = max_age
+        self._latest: Dict[SeriesKey, MetricSample] = {}
+        self._lock = threading.Lock()
+        self._payload = b"# EOF\n"
+
+    def series_key(self, sample: MetricSample) -> SeriesKey:
+        """
+        Get the metric name and the labels of the sample series
+
+        Args:
+            sample (MetricSample): the sample
+
+        Returns:
+            SeriesKey: the metric name and the sorted labels
+        """
+        metric_name = sample.metric_name or sample.metric_id or "metric"
+        name = f"{self.prefix}_{_sanitize_name(metric_name)}"
+        labels = {
+            _dimension_label(dim_name): dim_value
+            for dim_name, dim_value in sample.dimensions.items()
+        }
+        labels.update(
+            {
+                key: value
+                for key, value in [
+                    ("namespace", sample.namespace),
+                    ("id", sample.metric_id),
+                    ("stat", sample.stat),
+                ]
+                if value is not None
+            }
+        )
+        return name, tuple(sorted(labels.items()))
+
+    def write(self, samples: List[MetricSample]) -> None:
+        with self._lock:
+            for sample in samples:
+                key = self.series_key(sample)
+                latest = self._latest.get(key)
+                if latest is None or sample.timestamp >= latest.timestamp:
+                    self._latest[key] = sample
+            if self.max_age is not None:
+                oldest = datetime.datetime.now(pytz.utc) - datetime.timedelta(
+                    seconds=self.max_age
+                )
+                self._latest = {
+                    key: sample
+                    for key, sample in self._latest.items()
+                    if sample.timestamp >= oldest
+                }
+            self._payload = self.render().encode("utf-8")
+
+    def render(self) -> str:
+        """
+        Render the latest samples in the OpenMetrics text format
+
+        Returns:
+            str: the exposition
+        """
+        families: Dict[str, List[str]] = {}
+        units: Dict[str, Optional[str]] = {}
+        for (name, labels), sample in sorted(self._latest.items()):
+            labels_str = ",".join(
+                f'{label}="{_escape_label_value(value)}"' for label, value in labels
+            )
+            families.setdefault(name, []).append(
+                f"{name}{{{labels_str}}} {_format_value(sample.value)} "
+                f"{sample.timestamp.timestamp()}"
+            )
+            units.setdefault(name, sample.unit)
+        lines = []
+        for name, family in families.items():
+            unit = units[name]
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(
+                f"# HELP {name} CloudWatch metric"
+                + (f" in {unit}" if unit and unit != "None" else "")
+            )
+            lines.extend(family)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    @property
+    def payload(self) -> bytes:
+        """
+        The latest OpenMetrics exposition, encoded
+
+        Returns:
+            bytes: the exposition
+        """
+        return self._payload
+
+
+class _OpenMetricsHandler(BaseHTTPRequestHandler):
+    cache: OpenMetricsCache
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != OPENMETRICS_PATH:
+            self.send_error(404)
+            return
+        payload = self.cache.payload
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        _LOGGER.debug(f"{self.address_string()} - {format % args}")
+
+
+class OpenMetricsExporter:
+    """
+    Serve the cached samples in the OpenMetrics text format over HTTP
+
+    The exposition is served at the `/metrics` path from a background thread.
+    """
+
+    def __init__(
+        self, cache: OpenMetricsCache, host: str = "0.0.0.0", port: int = 9106
+    ) -> None:
+        """
+        Initialize the exporter
+
+        Args:
+            cache (OpenMetricsCache): the cache to serve the samples from
+            host (str): the address to listen on
+            port (int): the port to listen on, 0 to pick a free port
+        """
+        handler_class = type(
+            "OpenMetricsHandler", (_OpenMetricsHandler,), {"cache": cache}
+        )
+        self.cache = cache
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        The address and the port the exporter listens on
+
+        Returns:
+            Tuple[str, int]: the address and the port
+        """
+        return self.server.server_address[:2]
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread
+        """
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="openmetrics-exporter", daemon=True
+        )
+        self._thread.start()
+        host, port = self.address
+        _LOGGER.info(f"Serving metrics at: http://{host}:{port}{OPENMETRICS_PATH}")
+
+    def stop(self) -> None:
+        """
+        Stop serving and release the socket
+        """
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
@@ -0,0 +1,480 @@
+import csv
+import datetime
+import heapq
+import itertools
+import logging
+import math
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from rich.table import Table
+
+from cloudwatcher.catalog import MetricCatalog
+from cloudwatcher.cloudwatcher import CloudWatcher
+from cloudwatcher.metric_handlers import TimedMetric
+from cloudwatcher.metricwatcher import METRIC_DATA_QUERIES_MAX, get_metric_data
+from cloudwatcher.preset import Dimension
+
+_LOGGER = logging.getLogger(__name__)
+
+RANK_BY = ["maximum", "minimum", "mean", "last", "percentile", "exceeded"]
+
+
+@dataclass
+class SeriesSummary:
+    """
+    Statistics of the datapoints of a single series, e.g. of an instance
+
+    Args:
+        key (str): The dimension value identifying the series
+        label (str): The label of the series
+        datapoints (int): The number of datapoints
+        minimum (float): The minimum value
+        maximum (float): The maximum value
+        mean (float): The mean value
+        last (float): The value of the latest datapoint
+        percentile (float): The value at the requested percentile
+        exceeded (int): The number of datapoints above the threshold
+        latest (Optional[datetime.datetime]): The timestamp of the latest datapoint
+    """
+
+    key: str
+    label: str
+    datapoints: int
+    minimum: float
+    maximum: float
+    mean: float
+    last: float
+    percentile: float
+    exceeded: int
+    latest: Optional[datetime.datetime]
+
+    @classmethod
+    def from_timed_metric(
+        cls,
+        key: str,
+        timed_metric: TimedMetric,
+        percentile: float = 95.0,
+        threshold: Optional[float] = None,
+    ) -> "SeriesSummary":
+        """
+        Summarize the datapoints of the timed metric in a single pass
+
+        Args:
+            key (str): the dimension value identifying the series
+            timed_metric (TimedMetric): the timed metric to summarize
+            percentile (float): the percentile of the datapoints to compute
+            threshold (Optional[float]): the value above which the datapoints
+                are counted as exceeding
+
+        Returns:
+            SeriesSummary: the summary, with NaN statistics if there are no
+                datapoints
+        """
+        values = np.asarray(timed_metric.values, dtype=np.float64)
+        if not len(values):
+            return cls(
+                key=key,
+                label=timed_metric.label,
+                datapoints=0,
+                minimum=math.nan,
+                maximum=math.nan,
+                mean=math.nan,
+                last=math.nan,
+                percentile=math.nan,
+                exceeded=0,
+                latest=None,
+            )
+        newest = int(np.argmax([t.timestamp() for t in timed_metric.timestamps]))
+        return cls(
+            key=key,
+            label=timed_metric.label,
+            datapoints=len(values),
+            minimum=float(values.min()),
+            maximum=float(values.max()),
+            mean=float(values.mean()),
+            last=float(values[newest]),
+            percentile=float(np.percentile(values, percentile)),
+            exceeded=int((values > threshold).sum()) if threshold is not None else 0,
+            latest=timed_metric.timestamps[newest],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the summary to a dictionary, with the timestamp in ISO 8601 format
+
+        Returns:
+            Dict[str, Any]: the summary
+        """
+        summary = asdict(self)
+        summary["latest"] = self.latest.isoformat() if self.latest else None
+        return summary
+
+
+class FleetAggregator:
+    """
+    Rank the series of many instances by a statistic, keeping the top N only
+
+    The series are summarized as they are added and then discarded, so the
+    memory used depends on the number of ranked series, not on the number of
+    datapoints. The top N summaries are kept in a bounded heap.
+    """
+
+    def __init__(
+        self,
+        top: int = 20,
+        rank_by: str = "maximum",
+        ascending: bool = False,
+        percentile: float = 95.0,
+        threshold: Optional[float] = None,
+    ) -> None:
+        """
+        Initialize the aggregator
+
+        Args:
+            top (int): the number of series to rank
+            rank_by (str): the statistic to rank the series by, one of
+                `maximum`, `minimum`, `mean`, `last`, `percentile` and `exceeded`
+            ascending (bool): whether to rank the lowest values first
+            percentile (float): the percentile of the datapoints to compute
+            threshold (Optional[float]): the value above which the datapoints
+                are counted as exceeding, and the series reported
+        """
+        if top < 1:
+            raise ValueError(f"Invalid number of series to rank: {top}")
+        if rank_by not in RANK_BY:
+            raise ValueError(f"Invalid statistic to rank by: {rank_by}")
+        if rank_by == "exceeded" and threshold is None:
+            raise ValueError("A threshold is required to rank by the exceeded count")
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"Invalid percentile: {percentile}")
+        self.top = top
+        self.rank_by = rank_by
+        self.ascending = ascending
+        self.percentile = percentile
+        self.threshold = threshold
+        self.series_count = 0
+        self.datapoints_count = 0
+        self._heap: List[Tuple[float, int, SeriesSummary]] = []
+        self._exceeding: List[SeriesSummary] = []
+        self._counter = itertools.count()
+
+    def add(self, key: str, timed_metric: TimedMetric) -> SeriesSummary:
+        """
+        Summarize the series and rank it
+
+        Args:
+            key (str): the dimension value identifying the series
+            timed_metric (TimedMetric): the series
+
+        Returns:
+            SeriesSummary: the summary of the series
+        """
+        summary = SeriesSummary.from_timed_metric(
+            key, timed_metric, percentile=self.percentile, threshold=self.threshold
+        )
+        self.series_count += 1
+        self.datapoints_count += summary.datapoints
+        if summary.exceeded:
+            self._exceeding.append(summary)
+        score = float(getattr(summary, self.rank_by))
+        if math.isnan(score):
+            return summary
+        # a min-heap of the best series, the worst of them is replaced
+        entry = (-score if self.ascending else score, next(self._counter), summary)
+        if len(self._heap) < self.top:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heappushpop(self._heap, entry)
+        return summary
+
+    def ranked(self) -> List[SeriesSummary]:
+        """
+        Get the top ranked series
+
+        Returns:
+            List[SeriesSummary]: the summaries, best first
+        """
+        return [summary for _, _, summary in sorted(self._heap, reverse=True)]
+
+    def exceeding(self) -> List[SeriesSummary]:
+        """
+        Get the series with datapoints above the threshold
+
+        Returns:
+            List[SeriesSummary]: the summaries, most exceeded first
+        """
+        return sorted(
+            self._exceeding, key=lambda s: (s.exceeded, s.maximum), reverse=True
+        )
+
+    def table(
+        self, summaries: List[SeriesSummary], title: Optional[str] = None
+    ) -> Table:
+        """
+        Get a table of the summaries
+
+        Args:
+            summaries (List[SeriesSummary]): the summaries to tabulate
+            title (Optional[str]): the title of the table
+
+        Returns:
+            Table: the table
+        """
+        table = Table(show_header=True, header_style="bold magenta", title=title)
+        table.add_column("Rank", justify="right")
+        table.add_column("Series", style="dim")
+        table.add_column("Datapoints", justify="right")
+        table.add_column("Minimum", justify="right")
+        table.add_column("Mean", justify="right")
+        table.add_column("Maximum", justify="right")
+        table.add_column(f"p{self.percentile:g}", justify="right")
+        table.add_column("Last", justify="right")
+        if self.threshold is not None:
+            table.add_column(f"> {self.threshold:g}", justify="right")
+        for rank, summary in enumerate(summaries, start=1):
+            row = [
+                str(rank),
+                summary.key,
+                str(summary.datapoints),
+                f"{summary.minimum:.6g}",
+                f"{summary.mean:.6g}",
+                f"{summary.maximum:.6g}",
+                f"{summary.percentile:.6g}",
+                f"{summary.last:.6g}",
+            ]
+            if self.threshold is not None:
+                row.append(str(summary.exceeded))
+            table.add_row(*row)
+        return table
+
+    def save_csv(self, file_path: str, summaries: List[SeriesSummary]) -> None:
+        """
+        Save the summaries to a CSV file
+
+        Args:
+            file_path (str): the path to the file
+            summaries (List[SeriesSummary]): the summaries to save
+        """
+        with open(file_path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=["rank"] + list(SeriesSummary.__dataclass_fields__)
+            )
+            writer.writeheader()
+            for rank, summary in enumerate(summaries, start=1):
+                writer.writerow(dict(rank=rank, **summary.to_dict()))
+        _LOGGER.info(f"Saved {len(summaries)} series summaries to: {file_path}")
+
+
+class FleetWatcher(CloudWatcher):
+    """
+    A class for AWS CloudWatch retrieval of a metric across many instances
+
+    The metric is queried for each value of a dimension, e.g. each `InstanceId`,
+    with up to 500 series per batched request. The series are yielded batch
+    by batch, so that they do not all have to be held in memory.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        metric_name: str,
+        dimension_name: str = "InstanceId",
+        dimension_values: Optional[List[str]] = None,
+        dimensions_list: Optional[List[Dimension]] = None,
+        metric_unit: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        aws_region_name: Optional[str] = None,
+        client: Optional[Any] = None,
+        catalog: Optional[MetricCatalog] = None,
+    ) -> None:
+        """
+        Initialize FleetWatcher
+
+        Args:
+            namespace (str): the namespace of the metric
+            metric_name (str): the name of the metric
+            dimension_name (str): the name of the dimension identifying the series
+            dimension_values (Optional[List[str]]): the values of the dimension
+                to query, discovered with `ListMetrics` if not provided
+            dimensions_list (Optional[List[Dimension]]): the other dimensions
+                shared by all the series
+            metric_unit (Optional[str]): the unit of the metric
+            aws_access_key_id (Optional[str]): the AWS access key ID
+            aws_secret_access_key (Optional[str]): the AWS secret access key
+            aws_session_token (Optional[str]): the AWS session token
+            aws_region_name (Optional[str]): the AWS region name
+            client (Optional[Any]): an existing CloudWatch client to reuse
+            catalog (Optional[MetricCatalog]): the metrics catalog the dimension
+                values are discovered from, refreshed when stale
+        """
+        super().__init__(
+            service_name="cloudwatch",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            aws_region_name=aws_region_name,
+            client=client,
+        )
+        self.namespace = namespace
+        self.metric_name = metric_name
+        self.dimension_name = dimension_name
+        self.dimension_values = dimension_values
+        self.dimensions_list = dimensions_list or []
+        self.metric_unit = metric_unit
+        self.catalog = catalog
+
+    def __repr__(self) -> str:
+        return (
+            f"FleetWatcher({self.namespace}/{self.metric_name} "
+            f"by {self.dimension_name})"
+        )
+
+    def discover_dimension_values(self) -> List[str]:
+        """
+        List the values of the dimension the metric is reported with
+
+        Returns:
+            List[str]: the dimension values, sorted
+        """
+        if self.catalog is not None:
+            dimension_filters = [
+                Dimension(Name=self.dimension_name, Value="")
+            ] + self.dimensions_list
+            self.catalog.refresh(self.namespace, dimension_filters)
+            # only the metrics reported with exactly these dimensions
+            values = {
+                dict(metric.dimensions)[self.dimension_name]
+                for metric in self.catalog.search(
+                    namespace=self.namespace,
+                    dimension_names=[d.Name for d in dimension_filters],
+                    dimensions=dimension_filters,
+                )
+                if metric.metric_name == self.metric_name
+            }
+            _LOGGER.info(
+                f"Discovered {len(values)} '{self.dimension_name}' values "
+                f"of '{self.metric_name}' in {self.catalog}"
+            )
+            return sorted(values)
+        dimension_filters = [{"Name": self.dimension_name}] + [
+            dim.dict() for dim in self.dimensions_list
+        ]
+        values = set()
+        for page in self.client.get_paginator("list_metrics").paginate(
+            Namespace=self.namespace,
+            MetricName=self.metric_name,
+            Dimensions=dimension_filters,
+        ):
+            for metric in page["Metrics"]:
+                dimensions = {d["Name"]: d["Value"] for d in metric["Dimensions"]}
+                # only the metrics reported with exactly these dimensions
+                if len(dimensions) == len(dimension_filters):
+                    values.add(dimensions[self.dimension_name])
+        _LOGGER.info(
+            f"Discovered {len(values)} '{self.dimension_name}' values "
+            f"of '{self.metric_name}'"
+        )
+        return sorted(values)
+
+    def _query(self, query_id: str, value: str, stat: str, period: int) -> Dict:
+        metric_stat: Dict[str, Any] = {
+            "Metric": {
+                "Namespace": self.namespace,
+                "MetricName": self.metric_name,
+                "Dimensions": [
+                    {"Name": self.dimension_name, "Value": value},
+                    *[dim.dict() for dim in self.dimensions_list],
+                ],
+            },
+            "Stat": stat,
+            "Period": period,
+        }
+        # the datapoints of any unit are returned if not provided
+        if self.metric_unit is not None:
+            metric_stat["Unit"] = self.metric_unit
+        return {"Id": query_id, "Label": value, "MetricStat": metric_stat}
+
+    def iter_timed_metrics(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: str,
+        period: int,
+        batch_size: int = METRIC_DATA_QUERIES_MAX,
+    ) -> Iterator[Tuple[str, TimedMetric]]:
+        """
+        Query the metric of each dimension value, batch by batch
+
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (str): the statistic to query
+            period (int): the period of the metric
+            batch_size (int): the number of series queried per request
+
+        Yields:
+            Tuple[str, TimedMetric]: the dimension value and its timed metric
+        """
+        if not 0 < batch_size <= METRIC_DATA_QUERIES_MAX:
+            raise ValueError(f"Invalid batch size: {batch_size}")
+        values = self.dimension_values
+        if values is None:
+            values = self.discover_dimension_values()
+        for i in range(0, len(values), batch_size):
+            batch = values[i : i + batch_size]
+            queries = [
+                self._query(f"m{j}", value, stat, period)
+                for j, value in enumerate(batch)
+            ]
+            _LOGGER.info(
+                f"Querying '{self.metric_name}' for {len(batch)} "
+                f"'{self.dimension_name}' values ({i + len(batch)}/{len(values)})"
+            )
+            response = get_metric_data(
+                client=self.client,
+                queries=queries,
+                start_time=start_time,
+                end_time=end_time,
+            )
+            if response is None:
+                raise RuntimeError(f"Failed to query the metric of {self}")
+            for result in response["MetricDataResults"]:
+                value = batch[int(result["Id"][1:])]
+                yield value, TimedMetric(
+                    label=result.get("Label", value),
+                    timestamps=result["Timestamps"],
+                    values=result["Values"],
+                    id=result["Id"],
+                    stat=result.get("Stat"),
+                )
+
+    def aggregate(
+        self,
+        aggregator: FleetAggregator,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: str,
+        period: int,
+    ) -> FleetAggregator:
+        """
+        Query the metric of each dimension value and rank the series
+
+        Args:
+            aggregator (FleetAggregator): the aggregator to add the series to
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (str): the statistic to query
+            period (int): the period of the metric
+
+        Returns:
+            FleetAggregator: the aggregator
+        """
+        for value, timed_metric in self.iter_timed_metrics(
+            start_time=start_time, end_time=end_time, stat=stat, period=period
+        ):
+            aggregator.add(value, timed_metric)
+        return aggregator
@@ -0,0 +1,325 @@
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.config import Config
+
+_LOGGER = logging.getLogger(__name__)
+
+# requests per second per account and region, see:
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/cloudwatch_limits.html
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/logs/cloudwatch_limits_cwl.html
+DEFAULT_RATE_LIMITS: Dict[Tuple[str, str], float] = {
+    ("cloudwatch", "GetMetricData"): 50.0,
+    ("cloudwatch", "ListMetrics"): 25.0,
+    ("cloudwatch-logs", "GetLogEvents"): 25.0,
+    ("cloudwatch-logs", "DescribeLogStreams"): 25.0,
+    ("ec2", "DescribeInstances"): 20.0,
+}
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "LimitExceededException",
+    "SlowDown",
+}
+TRANSIENT_ERROR_CODES = {
+    "RequestTimeout",
+    "RequestTimeoutException",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+    "InternalError",
+    "InternalFailure",
+    "InternalServiceError",
+}
+# the clients are created without the botocore retries, the governor retries
+NO_RETRIES_CONFIG = Config(retries={"mode": "standard", "max_attempts": 1})
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket rate limiter
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        """
+        Initialize the bucket
+
+        Args:
+            rate (float): the number of tokens added per second
+            burst (Optional[float]): the capacity of the bucket, equal to the rate
+                if not provided
+        """
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token from the bucket, wait for it if the bucket is empty
+
+        Returns:
+            float: the time waited, in seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            # the token is reserved, the waits are serialized by the debt
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+@dataclass
+class ApiCallStats:
+    """
+    Counters of the calls of an API operation
+
+    Args:
+        attempts (int): The number of requests sent, including the retries
+        retries (int): The number of retried requests
+        throttles (int): The number of throttled requests
+        failures (int): The number of calls that failed after the last attempt
+        wait_time (float): The time spent waiting for the rate limiter, in seconds
+        backoff_time (float): The time spent backing off before the retries,
+            in seconds
+    """
+
+    attempts: int = 0
+    retries: int = 0
+    throttles: int = 0
+    failures: int = 0
+    wait_time: float = 0.0
+    backoff_time: float = 0.0
+
+
+class ApiGovernor:
+    """
+    Rate limit and retry the AWS API calls of the attached clients
+
+    Each API operation is rate limited per region by a token bucket shared by all
+    the attached clients. The throttled and transient failures are retried with
+    a capped exponential backoff with full jitter. The governor hooks into the
+    client events, so the paginators and the resources are governed too.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 0.25,
+        max_delay: float = 20.0,
+        rate_limits: Optional[Dict[Tuple[str, str], float]] = None,
+    ) -> None:
+        """
+        Initialize the governor
+
+        Args:
+            max_attempts (int): the maximum number of attempts of a call
+            base_delay (float): the backoff delay of the first retry, in seconds
+            max_delay (float): the maximum backoff delay, in seconds
+            rate_limits (Optional[Dict[Tuple[str, str], float]]): the requests per
+                second allowed per service and operation, e.g.
+                `{("cloudwatch", "GetMetricData"): 50}`. The operations that are
+                not listed are not rate limited
+        """
+        if max_attempts < 1:
+            raise ValueError(f"Invalid maximum number of attempts: {max_attempts}")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limits = dict(
+            DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        )
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self._stats: Dict[Tuple[str, str], ApiCallStats] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return (
+            f"ApiGovernor(max_attempts={self.max_attempts}, "
+            f"rate_limits={self.rate_limits})"
+        )
+
+    def attach(self, client: Any) -> Any:
+        """
+        Govern the calls of the client
+
+        Attaching the same client more than once has no effect.
+
+        Args:
+            client (Any): the boto3 client
+
+        Returns:
+            Any: the client
+        """
+        region = client.meta.region_name
+        events = client.meta.events
+        events.register_first(
+            "before-send",
+            lambda **kwargs: self._before_send(region=region, **kwargs),
+            unique_id=f"cloudwatcher-governor-{id(self)}-before-send",
+        )
+        events.register_first(
+            "needs-retry",
+            self._needs_retry,
+            unique_id=f"cloudwatcher-governor-{id(self)}-needs-retry",
+        )
+        return client
+
+    def _operation_stats(self, service: str, operation: str) -> ApiCallStats:
+        key = (service, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, ApiCallStats())
+        return stats
+
+    def _bucket(
+        self, service: str, region: str, operation: str
+    ) -> Optional[TokenBucket]:
+        rate = self.rate_limits.get((service, operation))
+        if rate is None:
+            return None
+        key = (service, region, operation)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(rate))
+        return bucket
+
+    def _before_send(self, region: str, event_name: str, **kwargs) -> None:
+        """
+        Wait for the rate limiter before each attempt
+        """
+        _, service, operation = event_name.split(".")
+        stats = self._operation_stats(service, operation)
+        bucket = self._bucket(service, region, operation)
+        wait = bucket.acquire() if bucket is not None else 0.0
+        with self._lock:
+            stats.attempts += 1
+            stats.wait_time += wait
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Get the delay before the retry, with full jitter
+
+        Args:
+            attempt (int): the number of the failed attempt, starting at 1
+
+        Returns:
+            float: the delay, in seconds
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def _needs_retry(
+        self,
+        event_name: str,
+        attempts: int,
+        response: Optional[Tuple[Any, Dict]] = None,
+        caught_exception: Optional[Exception] = None,
+        **kwargs,
+    ) -> Optional[float]:
+        """
+        Decide whether the attempt is retried and how long to back off before
+
+        Returns:
+            Optional[float]: the delay before the retry, None if not retried
+        """
+        _, service, operation = event_name.split(".")
+        if caught_exception is not None:
+            retryable, throttled = True, False
+            reason = type(caught_exception).__name__
+        elif response is not None:
+            http_response, parsed = response
+            code = parsed.get("Error", {}).get("Code", "")
+            throttled = (
+                code in THROTTLING_ERROR_CODES or http_response.status_code == 429
+            )
+            retryable = (
+                throttled
+                or code in TRANSIENT_ERROR_CODES
+                or http_response.status_code >= 500
+            )
+            reason = code or str(http_response.status_code)
+        else:
+            return None
+        stats = self._operation_stats(service, operation)
+        if not retryable:
+            return None
+        with self._lock:
+            stats.throttles += throttled
+        if attempts >= self.max_attempts:
+            with self._lock:
+                stats.failures += 1
+            _LOGGER.warning(
+                f"Giving up on '{operation}' after {attempts} attempts ({reason})"
+            )
+            return None
+        delay = self.backoff_delay(attempts)
+        with self._lock:
+            stats.retries += 1
+            stats.backoff_time += delay
+        _LOGGER.debug(
+            f"Retrying '{operation}' in {delay:.2f}s, attempt {attempts} failed "
+            f"({reason})"
+        )
+        return delay
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get a snapshot of the call counters
+
+        Returns:
+            Dict[str, Dict[str, Any]]: the counters keyed by `service.operation`
+        """
+        with self._lock:
+            return {
+                f"{service}.{operation}": asdict(stats)
+                for (service, operation), stats in sorted(self._stats.items())
+            }
+
+
+_API_GOVERNOR: Optional[ApiGovernor] = None
+
+
+def get_api_governor() -> ApiGovernor:
+    """
+    Get the API governor shared by the clients created by cloudwatcher
+
+    Returns:
+        ApiGovernor: the shared API governor
+    """
+    global _API_GOVERNOR
+    if _API_GOVERNOR is None:
+        _API_GOVERNOR = ApiGovernor()
+    return _API_GOVERNOR
+
+
+def set_api_governor(governor: ApiGovernor) -> None:
+    """
+    Replace the API governor shared by the clients created afterwards
+
+    Args:
+        governor (ApiGovernor): the API governor to share
+    """
+    global _API_GOVERNOR
+    _API_GOVERNOR = governor
@@ -0,0 +1,313 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from rich.table import Table
+
+_LOGGER = logging.getLogger(__name__)
+
+_START_TIME_KEY = "cloudwatcher_start_time"
+
+# functions counting the datapoints of the parsed responses, per operation
+DATAPOINTS_COUNTERS: Dict[str, Callable[[Dict], int]] = {
+    "GetMetricData": lambda parsed: sum(
+        len(result.get("Values", [])) for result in parsed.get("MetricDataResults", [])
+    ),
+    "GetLogEvents": lambda parsed: len(parsed.get("events", [])),
+    "DescribeLogStreams": lambda parsed: len(parsed.get("logStreams", [])),
+    "ListMetrics": lambda parsed: len(parsed.get("Metrics", [])),
+}
+
+
+def _response_size(http_response: Any) -> int:
+    """
+    Get the size of the response payload, in bytes
+    """
+    content_length = http_response.headers.get("content-length")
+    if content_length is not None:
+        return int(content_length)
+    if http_response.raw is None:
+        # stubbed responses have no payload
+        return 0
+    return len(http_response.content or b"")
+
+
+@dataclass
+class OperationStats:
+    """
+    Counters of an API operation or a handler
+
+    Args:
+        calls (int): The number of calls
+        errors (int): The number of failed calls
+        total_time (float): The total duration of the calls, in seconds
+        max_time (float): The longest duration of a call, in seconds
+        bytes_received (int): The size of the response payloads, in bytes
+        datapoints (int): The number of datapoints or events returned
+    """
+
+    calls: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    bytes_received: int = 0
+    datapoints: int = 0
+
+    @property
+    def mean_time(self) -> float:
+        """
+        The mean duration of a call, in seconds
+        """
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def add(self, duration: float, error: bool = False) -> None:
+        """
+        Record a call
+
+        Args:
+            duration (float): the duration of the call, in seconds
+            error (bool): whether the call failed
+        """
+        self.calls += 1
+        self.errors += error
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+
+class Instrumentation:
+    """
+    Record the API calls of the attached clients and the handlers execution times
+
+    The API calls are recorded per `service.operation`: the number of calls,
+    the failures, the latencies including the retries, the response payload
+    sizes and the number of datapoints or events returned.
+    """
+
+    def __init__(self) -> None:
+        self._operations: Dict[str, OperationStats] = {}
+        self._handlers: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def attach(self, client: Any) -> Any:
+        """
+        Record the calls of the client
+
+        Attaching the same client more than once has no effect.
+
+        Args:
+            client (Any): the boto3 client
+
+        Returns:
+            Any: the client
+        """
+        events = client.meta.events
+        # the parameters are built before any before-call handler can
+        # short-circuit the call, e.g. the botocore Stubber
+        events.register_first(
+            "before-parameter-build",
+            self._before_call,
+            unique_id=f"cloudwatcher-instrumentation-{id(self)}-before-call",
+        )
+        events.register(
+            "after-call",
+            self._after_call,
+            unique_id=f"cloudwatcher-instrumentation-{id(self)}-after-call",
+        )
+        events.register(
+            "after-call-error",
+            self._after_call_error,
+            unique_id=f"cloudwatcher-instrumentation-{id(self)}-after-call-error",
+        )
+        return client
+
+    def _stats(self, registry: Dict[str, OperationStats], key: str) -> OperationStats:
+        stats = registry.get(key)
+        if stats is None:
+            stats = registry.setdefault(key, OperationStats())
+        return stats
+
+    def _before_call(self, context: Dict, **kwargs) -> None:
+        context[_START_TIME_KEY] = time.perf_counter()
+
+    def _after_call(
+        self,
+        event_name: str,
+        http_response: Any,
+        parsed: Dict,
+        context: Dict,
+        **kwargs,
+    ) -> None:
+        started = context.pop(_START_TIME_KEY, None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        _, service, operation = event_name.split(".")
+        error = http_response.status_code >= 300
+        size = _response_size(http_response)
+        counter = DATAPOINTS_COUNTERS.get(operation)
+        datapoints = counter(parsed) if counter is not None and not error else 0
+        with self._lock:
+            stats = self._stats(self._operations, f"{service}.{operation}")
+            stats.add(duration, error=error)
+            stats.bytes_received += size
+            stats.datapoints += datapoints
+
+    def _after_call_error(self, event_name: str, context: Dict, **kwargs) -> None:
+        started = context.pop(_START_TIME_KEY, None)
+        if started is None:
+            return
+        _, service, operation = event_name.split(".")
+        with self._lock:
+            self._stats(self._operations, f"{service}.{operation}").add(
+                time.perf_counter() - started, error=True
+            )
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Record the execution time of the block as a handler call
+
+        Args:
+            name (str): the name of the handler
+        """
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record_handler(name, time.perf_counter() - started, error=error)
+
+    def record_handler(self, name: str, duration: float, error: bool = False) -> None:
+        """
+        Record a handler call timed elsewhere, e.g. in a worker process
+
+        Args:
+            name (str): the name of the handler
+            duration (float): the execution time in seconds
+            error (bool): whether the call failed
+        """
+        with self._lock:
+            self._stats(self._handlers, name).add(duration, error=error)
+
+    def reset(self) -> None:
+        """
+        Clear the recorded counters
+        """
+        with self._lock:
+            self._operations.clear()
+            self._handlers.clear()
+            self._started = time.perf_counter()
+
+    def snapshot(self, governor: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Get a snapshot of the recorded counters
+
+        Args:
+            governor (Optional[ApiGovernor]): the API governor to include
+                the retries and throttles counters of
+
+        Returns:
+            Dict[str, Any]: the elapsed time, and the counters of the API
+                operations and the handlers
+        """
+        governor_stats = governor.stats if governor is not None else {}
+        with self._lock:
+            operations = {}
+            for name, stats in sorted(self._operations.items()):
+                operations[name] = dict(asdict(stats), mean_time=stats.mean_time)
+                if name in governor_stats:
+                    operations[name].update(
+                        retries=governor_stats[name]["retries"],
+                        throttles=governor_stats[name]["throttles"],
+                    )
+            handlers = {
+                name: dict(asdict(stats), mean_time=stats.mean_time)
+                for name, stats in sorted(self._handlers.items())
+            }
+            return {
+                "elapsed_time": time.perf_counter() - self._started,
+                "operations": operations,
+                "handlers": handlers,
+            }
+
+    def to_json(self, governor: Optional[Any] = None) -> str:
+        """
+        Get a snapshot of the recorded counters as JSON
+
+        Args:
+            governor (Optional[ApiGovernor]): the API governor to include
+                the retries and throttles counters of
+
+        Returns:
+            str: the JSON document
+        """
+        return json.dumps(self.snapshot(governor), indent=4)
+
+    def summary_table(self, governor: Optional[Any] = None) -> Table:
+        """
+        Get a table summarizing the recorded counters
+
+        Args:
+            governor (Optional[ApiGovernor]): the API governor to include
+                the retries and throttles counters of
+
+        Returns:
+            Table: the summary table
+        """
+        snapshot = self.snapshot(governor)
+        table = Table(
+            show_header=True,
+            header_style="bold magenta",
+            title=f"Run statistics ({snapshot['elapsed_time']:.2f} s)",
+        )
+        table.add_column("Operation / handler", style="dim")
+        table.add_column("Calls", justify="right")
+        table.add_column("Errors", justify="right")
+        table.add_column("Retries", justify="right")
+        table.add_column("Throttles", justify="right")
+        table.add_column("Total (s)", justify="right")
+        table.add_column("Mean (ms)", justify="right")
+        table.add_column("Max (ms)", justify="right")
+        table.add_column("Received (KB)", justify="right")
+        table.add_column("Datapoints", justify="right")
+        for section in ["operations", "handlers"]:
+            for name, stats in snapshot[section].items():
+                table.add_row(
+                    name,
+                    str(stats["calls"]),
+                    str(stats["errors"]),
+                    str(stats.get("retries", "")),
+                    str(stats.get("throttles", "")),
+                    f"{stats['total_time']:.3f}",
+                    f"{stats['mean_time'] * 1000:.1f}",
+                    f"{stats['max_time'] * 1000:.1f}",
+                    f"{stats['bytes_received'] / 1024:.1f}"
+                    if section == "operations"
+                    else "",
+                    str(stats["datapoints"]) if section == "operations" else "",
+                )
+        return table
+
+
+_INSTRUMENTATION: Optional[Instrumentation] = None
+
+
+def get_instrumentation() -> Instrumentation:
+    """
+    Get the instrumentation shared by the clients created by cloudwatcher
+
+    Returns:
+        Instrumentation: the shared instrumentation
+    """
+    global _INSTRUMENTATION
+    if _INSTRUMENTATION is None:
+        _INSTRUMENTATION = Instrumentation()
+    return _INSTRUMENTATION
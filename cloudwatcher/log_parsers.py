@@ -0,0 +1,237 @@
+import json
+import re
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, Iterable, List, Optional, Type
+
+TIMESTAMP_KEY = "@timestamp"
+MESSAGE_KEY = "@message"
+
+_LOGFMT_PAIR = re.compile(r'([^\s=]+)(=("(?:[^"\\]|\\.)*"|\S*))?')
+
+
+def _iso_timestamp(timestamp_ms: int) -> str:
+    """
+    Format the epoch milliseconds timestamp as an ISO 8601 UTC string
+
+    Args:
+        timestamp_ms (int): the timestamp in milliseconds since the epoch
+
+    Returns:
+        str: the formatted timestamp
+    """
+    return (
+        datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+        .isoformat(timespec="milliseconds")
+        .replace("+00:00", "Z")
+    )
+
+
+class LogParser:
+    """
+    Class to establish the interface for a structured log message parsing
+
+    Each log event is converted to a flat record with the event time stored
+    under the `@timestamp` key. Messages that can't be parsed are kept verbatim
+    under the `@message` key.
+    """
+
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse the log message
+
+        Args:
+            message (str): the log message
+
+        Returns:
+            Optional[Dict[str, Any]]: the parsed fields or None if the message
+                could not be parsed
+        """
+        raise NotImplementedError
+
+    def parse_event(self, message: str, timestamp_ms: int) -> Dict[str, Any]:
+        """
+        Parse the log event into a structured record
+
+        Args:
+            message (str): the log message
+            timestamp_ms (int): the log timestamp in milliseconds since the epoch
+
+        Returns:
+            Dict[str, Any]: the structured record
+        """
+        record: Dict[str, Any] = {TIMESTAMP_KEY: _iso_timestamp(timestamp_ms)}
+        fields = self.parse(message)
+        if fields is None:
+            record[MESSAGE_KEY] = message.rstrip("\n")
+        else:
+            record.update(fields)
+        return record
+
+    def parse_records(self, records: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Parse a collection of log event records
+
+        Args:
+            records (Iterable[LogEventRecord]): the log event records
+
+        Returns:
+            List[Dict[str, Any]]: the structured records
+        """
+        parse_event = self.parse_event
+        return [parse_event(record.message, record.timestamp_ms) for record in records]
+
+
+class JsonLogParser(LogParser):
+    """
+    Parse JSON log messages, optionally preceded by a plain text prefix
+    """
+
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        start = message.find("{")
+        if start < 0:
+            return None
+        try:
+            fields = json.loads(message[start:])
+        except ValueError:
+            return None
+        return fields if isinstance(fields, dict) else None
+
+
+class LogfmtLogParser(LogParser):
+    """
+    Parse logfmt (key=value) log messages
+    """
+
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        fields: Dict[str, Any] = {}
+        has_pairs = False
+        for key, eq, value in _LOGFMT_PAIR.findall(message):
+            if not eq:
+                # bare keys are flags, e.g. "debug" in "level=info debug"
+                fields[key] = True
+                continue
+            has_pairs = True
+            if value.startswith('"'):
+                value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+            fields[key] = value
+        return fields if has_pairs else None
+
+
+class RegexLogParser(LogParser):
+    """
+    Parse log messages with a regex with named groups
+    """
+
+    def __init__(self, regex: str) -> None:
+        """
+        Initialize the parser
+
+        Args:
+            regex (str): the regex, the named groups become the record fields
+
+        Raises:
+            ValueError: if the regex does not define any named groups
+        """
+        self.pattern = re.compile(regex)
+        if not self.pattern.groupindex:
+            raise ValueError(f"The regex must define named groups: {regex}")
+
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        m = self.pattern.search(message)
+        return m.groupdict() if m else None
+
+
+LOG_PARSERS: Dict[str, Type[LogParser]] = {
+    "json": JsonLogParser,
+    "logfmt": LogfmtLogParser,
+    "regex": RegexLogParser,
+}
+
+
+def get_log_parser(name: str, regex: Optional[str] = None) -> LogParser:
+    """
+    Get a log parser by name
+
+    Args:
+        name (str): the name of the parser, one of: json, logfmt, regex
+        regex (Optional[str]): the regex to use with the regex parser
+
+    Returns:
+        LogParser: the log parser
+
+    Raises:
+        ValueError: if the parser is unknown or the regex is missing
+    """
+    if name not in LOG_PARSERS:
+        raise ValueError(
+            f"Unknown log parser: {name}. Available parsers: {', '.join(LOG_PARSERS)}"
+        )
+    if name == "regex":
+        if regex is None:
+            raise ValueError("The regex log parser requires a regex")
+        return RegexLogParser(regex)
+    return LOG_PARSERS[name]()
+
+
+class StructuredLogWriter:
+    """
+    Class to establish the interface for a structured log records writing
+    """
+
+    def __init__(self, stream: IO[str]) -> None:
+        """
+        Initialize the writer
+
+        Args:
+            stream (IO[str]): the text stream to write to
+        """
+        self.stream = stream
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Write a batch of structured records
+
+        Args:
+            records (List[Dict[str, Any]]): the records to write
+        """
+        raise NotImplementedError
+
+
+class NdjsonLogWriter(StructuredLogWriter):
+    """
+    Write one JSON object per log event
+    """
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        dumps = json.dumps
+        self.stream.writelines(dumps(record, default=str) + "\n" for record in records)
+
+
+class ColumnarLogWriter(StructuredLogWriter):
+    """
+    Write one JSON object of columns per batch of log events
+
+    The columns are the union of the record keys in the batch,
+    missing values are written as nulls.
+    """
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        columns: Dict[str, List[Any]] = {}
+        for i, record in enumerate(records):
+            for key, value in record.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [None] * i
+                column.append(value)
+            for column in columns.values():
+                if len(column) <= i:
+                    column.append(None)
+        self.stream.write(json.dumps(columns, default=str) + "\n")
+
+
+LOG_WRITERS: Dict[str, Type[StructuredLogWriter]] = {
+    "ndjson": NdjsonLogWriter,
+    "columnar": ColumnarLogWriter,
+}
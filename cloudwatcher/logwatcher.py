@@ -1,14 +1,350 @@
 import logging
 import re
-from datetime import datetime
-from typing import Any, Dict, Generator, List, Optional, Tuple
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import IO, Any, Dict, Generator, Iterable, List, Optional, Tuple
 
 from pydantic import BaseModel
 
 from cloudwatcher.cloudwatcher import CloudWatcher
+from cloudwatcher.const import LOG_EVENTS_LIMIT_MAX
+from cloudwatcher.log_parsers import LOG_WRITERS, LogParser
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_TIMESTAMP_REGEX = r"^\[\d+-\d+-\d+\s\d+:\d+:\d+(.|,)\d+(\]|\s-\s\w+\])"
+DEFAULT_FMT_STR_LOG = "[{time} UTC] {message}"
+DEFAULT_FMT_STR_DATETIME = "%d-%m-%Y %H:%M:%S"
+
+
+class LogEventFormatter:
+    """
+    A reusable formatter for AWS CloudWatch log events
+
+    The embedded timestamp regex is compiled once per formatter and the formatted
+    timestamps are cached per second, so formatting a page of events costs one
+    regex match and one string format call per event. The formatter works on any
+    object exposing `message` and `timestamp` attributes.
+    """
+
+    def __init__(
+        self,
+        regex: Optional[str] = None,
+        fmt_str_log: Optional[str] = None,
+        fmt_str_datetime: Optional[str] = None,
+        cache_size: int = 4096,
+    ) -> None:
+        """
+        Initialize LogEventFormatter
+
+        Args:
+            regex (Optional[str]): regex to match the timestamp in the message
+            fmt_str_log (Optional[str]): format string for the log message
+            fmt_str_datetime (Optional[str]): format string for the datetime
+            cache_size (int): maximum number of cached formatted timestamps
+        """
+        self.pattern = re.compile(regex or DEFAULT_TIMESTAMP_REGEX)
+        self.fmt_str_log = fmt_str_log or DEFAULT_FMT_STR_LOG
+        self.fmt_str_datetime = fmt_str_datetime or DEFAULT_FMT_STR_DATETIME
+        self.cache_size = cache_size
+        # sub-second directives make the per-second cache invalid
+        self._cacheable = "%f" not in self.fmt_str_datetime
+        self._time_cache: Dict[datetime, str] = {}
+        self._time_ms_cache: Dict[int, str] = {}
+
+    def format_time(self, timestamp: datetime) -> str:
+        """
+        Format the timestamp, reusing the result for timestamps within the same second
+
+        Args:
+            timestamp (datetime): the timestamp to format
+
+        Returns:
+            str: formatted timestamp
+        """
+        if not self._cacheable:
+            return timestamp.strftime(self.fmt_str_datetime)
+        key = timestamp.replace(microsecond=0)
+        formatted = self._time_cache.get(key)
+        if formatted is None:
+            if len(self._time_cache) >= self.cache_size:
+                self._time_cache.clear()
+            formatted = self._time_cache[key] = timestamp.strftime(
+                self.fmt_str_datetime
+            )
+        return formatted
+
+    def format_time_ms(self, timestamp_ms: int) -> str:
+        """
+        Format the epoch milliseconds timestamp as UTC, reusing the result for
+        timestamps within the same second
+
+        Args:
+            timestamp_ms (int): the timestamp in milliseconds since the epoch
+
+        Returns:
+            str: formatted timestamp
+        """
+        if not self._cacheable:
+            return datetime.fromtimestamp(
+                timestamp_ms / 1000, tz=timezone.utc
+            ).strftime(self.fmt_str_datetime)
+        key = timestamp_ms // 1000
+        formatted = self._time_ms_cache.get(key)
+        if formatted is None:
+            if len(self._time_ms_cache) >= self.cache_size:
+                self._time_ms_cache.clear()
+            formatted = self._time_ms_cache[key] = datetime.fromtimestamp(
+                key, tz=timezone.utc
+            ).strftime(self.fmt_str_datetime)
+        return formatted
+
+    def _strip(self, message: str) -> str:
+        """
+        Remove the embedded timestamp from the message
+
+        Args:
+            message (str): the log message
+
+        Returns:
+            str: the message without the embedded timestamp
+        """
+        m = self.pattern.search(message)
+        if m:
+            message = message[m.end() :]
+        return message.strip()
+
+    def format(self, message: str, timestamp: datetime) -> str:
+        """
+        Format the message by removing the embedded timestamp and adding a UTC timestamp
+
+        Args:
+            message (str): the log message
+            timestamp (datetime): the log timestamp
+
+        Returns:
+            str: formatted message
+        """
+        return self.fmt_str_log.format(
+            time=self.format_time(timestamp), message=self._strip(message)
+        )
+
+    def format_event(self, event: Any) -> str:
+        """
+        Format a single log event
+
+        Args:
+            event (Any): the log event, must have `message` and `timestamp` attributes
+
+        Returns:
+            str: formatted message
+        """
+        return self.format(event.message, event.timestamp)
+
+    def format_events(self, events: Iterable[Any]) -> List[str]:
+        """
+        Format a collection of log events
+
+        Args:
+            events (Iterable[Any]): the log events, must have `message` and
+                `timestamp` attributes
+
+        Returns:
+            List[str]: formatted messages
+        """
+        fmt = self.format
+        return [fmt(event.message, event.timestamp) for event in events]
+
+    def format_records(self, records: Iterable["LogEventRecord"]) -> List[str]:
+        """
+        Format a collection of lightweight log event records
+
+        The raw epoch milliseconds timestamps are formatted directly, without
+        creating a datetime object per record.
+
+        Args:
+            records (Iterable[LogEventRecord]): the log event records
+
+        Returns:
+            List[str]: formatted messages
+        """
+        fmt_str_log = self.fmt_str_log
+        strip = self._strip
+        format_time_ms = self.format_time_ms
+        return [
+            fmt_str_log.format(
+                time=format_time_ms(record.timestamp_ms),
+                message=strip(record.message),
+            )
+            for record in records
+        ]
+
+
+@lru_cache(maxsize=32)
+def get_log_event_formatter(
+    regex: Optional[str] = None,
+    fmt_str_log: Optional[str] = None,
+    fmt_str_datetime: Optional[str] = None,
+) -> LogEventFormatter:
+    """
+    Get a shared LogEventFormatter for the given settings
+
+    Args:
+        regex (Optional[str]): regex to match the timestamp in the message
+        fmt_str_log (Optional[str]): format string for the log message
+        fmt_str_datetime (Optional[str]): format string for the datetime
+
+    Returns:
+        LogEventFormatter: the formatter
+    """
+    return LogEventFormatter(
+        regex=regex, fmt_str_log=fmt_str_log, fmt_str_datetime=fmt_str_datetime
+    )
+
+
+class LogEventRecord:
+    """
+    A lightweight AWS CloudWatch log event
+
+    Keeps the raw epoch milliseconds timestamp and converts it to a UTC datetime
+    lazily. Use `to_model` to get the validated `LogEvent` view.
+
+    Attributes:
+        message (str): The log message
+        timestamp_ms (int): The log timestamp in milliseconds since the epoch
+    """
+
+    __slots__ = ("message", "timestamp_ms")
+
+    def __init__(self, message: str, timestamp_ms: int) -> None:
+        self.message = message
+        self.timestamp_ms = timestamp_ms
+
+    @property
+    def timestamp(self) -> datetime:
+        """
+        Get the log timestamp
+
+        Returns:
+            datetime: The log timestamp in UTC
+        """
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
+
+    def to_model(self) -> "LogEvent":
+        """
+        Convert the record to a LogEvent
+
+        Returns:
+            LogEvent: The LogEvent object
+        """
+        return LogEvent(message=self.message, timestamp=self.timestamp)
+
+    def __repr__(self) -> str:
+        return f"LogEventRecord({self.message!r}, {self.timestamp_ms})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LogEventRecord):
+            return NotImplemented
+        return (self.message, self.timestamp_ms) == (other.message, other.timestamp_ms)
+
+    def __bool__(self) -> bool:
+        """
+        Return True if the message is not empty
+
+        Returns:
+            bool: True if the message is not empty
+        """
+        return bool(self.message)
+
+
+class LogEventsPage:
+    """
+    A lightweight page of AWS CloudWatch log events
+
+    Parsing a page skips the pydantic validation, which makes it suitable
+    for streaming large numbers of events. Use `to_model` to get the validated
+    `LogEventsList` view.
+
+    Attributes:
+        events (List[LogEventRecord]): The list of log event records
+        next_forward_token (Optional[str]): The next forward token
+        next_backward_token (Optional[str]): The next backward token
+        last_ingestion_time (Optional[int]): The latest ingestion time of the events
+            in milliseconds since the epoch
+    """
+
+    __slots__ = (
+        "events",
+        "next_forward_token",
+        "next_backward_token",
+        "last_ingestion_time",
+    )
+
+    def __init__(
+        self,
+        events: List[LogEventRecord],
+        next_forward_token: Optional[str] = None,
+        next_backward_token: Optional[str] = None,
+        last_ingestion_time: Optional[int] = None,
+    ) -> None:
+        self.events = events
+        self.next_forward_token = next_forward_token
+        self.next_backward_token = next_backward_token
+        self.last_ingestion_time = last_ingestion_time
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any]) -> "LogEventsPage":
+        """
+        Create a LogEventsPage object from a response
+
+        Args:
+            response (Dict[str, Any]): The response from AWS
+
+        Returns:
+            LogEventsPage: The LogEventsPage object
+        """
+        events = response["events"]
+        return cls(
+            events=[
+                LogEventRecord(event["message"], event["timestamp"]) for event in events
+            ],
+            next_forward_token=response.get("nextForwardToken"),
+            next_backward_token=response.get("nextBackwardToken"),
+            last_ingestion_time=max(
+                (event.get("ingestionTime", 0) for event in events), default=None
+            ),
+        )
+
+    def to_model(self) -> "LogEventsList":
+        """
+        Convert the page to a LogEventsList
+
+        Returns:
+            LogEventsList: The LogEventsList object
+        """
+        return LogEventsList(
+            events=[event.to_model() for event in self.events],
+            next_forward_token=self.next_forward_token,
+            next_backward_token=self.next_backward_token,
+        )
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __bool__(self) -> bool:
+        """
+        Return True if the events page is not empty
+
+        Returns:
+            bool: True if the events page is not empty
+        """
+        return bool(self.events)
+
 
 class LogEvent(BaseModel):
     """
@@ -35,7 +371,9 @@ class LogEvent(BaseModel):
         """
         return cls(
             message=response["message"],
-            timestamp=datetime.fromtimestamp(response["timestamp"] / 1000),
+            timestamp=datetime.fromtimestamp(
+                response["timestamp"] / 1000, tz=timezone.utc
+            ),
         )
 
     def format_message(
@@ -55,15 +393,13 @@ class LogEvent(BaseModel):
         Returns:
             str: formatted message
         """
-        regex = regex or r"^\[\d+-\d+-\d+\s\d+:\d+:\d+(.|,)\d+(\]|\s-\s\w+\])"
-        fmt_str_log = fmt_str_log or "[{time} UTC] {message}"
-        fmt_str_datetime = fmt_str_datetime or "%d-%m-%Y %H:%M:%S"
-        m = re.search(regex, self.message)
-        msg = self.message[m.end() :] if m else self.message
-        formatted_message = fmt_str_log.format(
-            time=self.timestamp.strftime(fmt_str_datetime), message=msg.strip()
+        formatter = get_log_event_formatter(
+            regex=regex, fmt_str_log=fmt_str_log, fmt_str_datetime=fmt_str_datetime
+        )
+        return self.__class__.construct(
+            message=formatter.format(self.message, self.timestamp),
+            timestamp=self.timestamp,
         )
-        return LogEvent(message=formatted_message, timestamp=self.timestamp)
 
     def __bool__(self) -> bool:
         """
@@ -106,6 +442,19 @@ class LogEventsList(BaseModel):
             next_backward_token=response.get("nextBackwardToken"),
         )
 
+    @classmethod
+    def from_page(cls, page: LogEventsPage) -> "LogEventsList":
+        """
+        Create a LogEventsList object from a LogEventsPage
+
+        Args:
+            page (LogEventsPage): The page of log event records
+
+        Returns:
+            LogEventsList: The LogEventsList object
+        """
+        return page.to_model()
+
     def format_messages(
         self,
         regex: Optional[str] = None,
@@ -124,9 +473,13 @@ class LogEventsList(BaseModel):
         Returns:
             LogEventsList: The LogEventsList object, with formatted messages
         """
+        formatter = get_log_event_formatter(
+            regex=regex, fmt_str_log=fmt_str_log, fmt_str_datetime=fmt_str_datetime
+        )
         self.events = [
-            event.format_message(
-                regex=regex, fmt_str_datetime=fmt_str_datetime, fmt_str_log=fmt_str_log
+            LogEvent.construct(
+                message=formatter.format(event.message, event.timestamp),
+                timestamp=event.timestamp,
             )
             for event in self.events
         ]
@@ -142,6 +495,217 @@ class LogEventsList(BaseModel):
         return bool(self.events)
 
 
+@dataclass
+class LogStreamMetadata:
+    """
+    A class for AWS CloudWatch log stream metadata
+
+    All the times are expressed in milliseconds since the epoch.
+
+    Attributes:
+        name (str): The name of the log stream
+        creation_time (Optional[int]): The creation time of the log stream
+        first_event_timestamp (Optional[int]): The time of the first event
+        last_event_timestamp (Optional[int]): The time of the most recent event
+        last_ingestion_time (Optional[int]): The most recent ingestion time
+        stored_bytes (Optional[int]): The number of bytes stored
+    """
+
+    name: str
+    creation_time: Optional[int] = None
+    first_event_timestamp: Optional[int] = None
+    last_event_timestamp: Optional[int] = None
+    last_ingestion_time: Optional[int] = None
+    stored_bytes: Optional[int] = None
+
+    @classmethod
+    def from_response(cls, log_stream: Dict[str, Any]) -> "LogStreamMetadata":
+        """
+        Create a LogStreamMetadata object from a `describe_log_streams` response entry
+
+        Args:
+            log_stream (Dict[str, Any]): The log stream description from AWS
+
+        Returns:
+            LogStreamMetadata: The LogStreamMetadata object
+        """
+        return cls(
+            name=log_stream["logStreamName"],
+            creation_time=log_stream.get("creationTime"),
+            first_event_timestamp=log_stream.get("firstEventTimestamp"),
+            last_event_timestamp=log_stream.get("lastEventTimestamp"),
+            last_ingestion_time=log_stream.get("lastIngestionTime"),
+            stored_bytes=log_stream.get("storedBytes"),
+        )
+
+
+class LogStreamsIndex:
+    """
+    A time-to-live cache of the log streams metadata in a log group
+
+    The index is shared by all the LogWatchers that watch the same log group
+    with the same client, so the existence checks and new events checks are
+    answered locally until the entries expire. The watchers with other clients,
+    e.g. other credentials or accounts, get their own index.
+
+    A log stream is looked up on its own, with a single DescribeLogStreams call,
+    when it is not indexed or its entry expired. The missing log streams are
+    remembered for a shorter time, so a log stream created since is found soon.
+    Only the `streams` listing scans the whole log group.
+    """
+
+    _indexes: "weakref.WeakKeyDictionary[Any, Dict[str, LogStreamsIndex]]" = (
+        weakref.WeakKeyDictionary()
+    )
+    _indexes_lock = threading.Lock()
+
+    def __init__(
+        self,
+        client: Any,
+        log_group_name: str,
+        ttl: float = 60.0,
+        missing_ttl: float = 5.0,
+    ) -> None:
+        """
+        Initialize LogStreamsIndex
+
+        Args:
+            client (Any): The CloudWatch Logs client
+            log_group_name (str): The name of the log group
+            ttl (float): The number of seconds after which an entry is refreshed
+            missing_ttl (float): The number of seconds a log stream is reported
+                missing for before it is looked up again
+        """
+        self.client = client
+        self.log_group_name = log_group_name
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self._entries: Dict[str, Tuple[Optional[LogStreamMetadata], float]] = {}
+        self._streams: Dict[str, LogStreamMetadata] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_log_group(
+        cls, client: Any, log_group_name: str, ttl: float = 60.0
+    ) -> "LogStreamsIndex":
+        """
+        Get the shared index for the log group and the client
+
+        Args:
+            client (Any): The CloudWatch Logs client
+            log_group_name (str): The name of the log group
+            ttl (float): The number of seconds after which an entry is refreshed
+
+        Returns:
+            LogStreamsIndex: The shared index
+        """
+        with cls._indexes_lock:
+            indexes = cls._indexes.setdefault(client, {})
+            index = indexes.get(log_group_name)
+            if index is None:
+                index = indexes[log_group_name] = cls(client, log_group_name, ttl)
+            index.ttl = ttl
+        return index
+
+    @property
+    def expired(self) -> bool:
+        """
+        Check if the listing of the log group needs to be refreshed
+
+        Returns:
+            bool: True if the log group was never listed or its TTL passed
+        """
+        return (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > self.ttl
+        )
+
+    def refresh(self) -> None:
+        """
+        Reload the metadata of all the log streams in the log group
+        """
+        paginator = self.client.get_paginator("describe_log_streams")
+        streams: Dict[str, LogStreamMetadata] = {}
+        for page in paginator.paginate(logGroupName=self.log_group_name):
+            for log_stream in page["logStreams"]:
+                metadata = LogStreamMetadata.from_response(log_stream)
+                streams[metadata.name] = metadata
+        refreshed_at = time.monotonic()
+        with self._lock:
+            self._streams = streams
+            self._refreshed_at = refreshed_at
+            self._entries.update(
+                (name, (metadata, refreshed_at)) for name, metadata in streams.items()
+            )
+        _LOGGER.debug(
+            f"Indexed {len(streams)} log streams in log group: {self.log_group_name}"
+        )
+
+    def lookup(self, log_stream_name: str) -> Optional[LogStreamMetadata]:
+        """
+        Look up the metadata of a single log stream and index it
+
+        The log streams are listed by name, so the log stream is the first one
+        with its name as prefix, if it exists.
+
+        Args:
+            log_stream_name (str): The name of the log stream
+
+        Returns:
+            Optional[LogStreamMetadata]: The log stream metadata or None
+                if the log stream does not exist
+        """
+        response = self.client.describe_log_streams(
+            logGroupName=self.log_group_name,
+            logStreamNamePrefix=log_stream_name,
+            limit=1,
+        )
+        metadata = None
+        for log_stream in response["logStreams"]:
+            if log_stream["logStreamName"] == log_stream_name:
+                metadata = LogStreamMetadata.from_response(log_stream)
+        with self._lock:
+            self._entries[log_stream_name] = (metadata, time.monotonic())
+        return metadata
+
+    def get(
+        self, log_stream_name: str, refresh: bool = False
+    ) -> Optional[LogStreamMetadata]:
+        """
+        Get the log stream metadata
+
+        Args:
+            log_stream_name (str): The name of the log stream
+            refresh (bool): Whether to look up the log stream even if its entry
+                did not expire
+
+        Returns:
+            Optional[LogStreamMetadata]: The log stream metadata or None
+                if the log stream does not exist
+        """
+        entry = self._entries.get(log_stream_name)
+        if not refresh and entry is not None:
+            metadata, fetched_at = entry
+            ttl = self.ttl if metadata is not None else self.missing_ttl
+            if time.monotonic() - fetched_at <= ttl:
+                return metadata
+        return self.lookup(log_stream_name)
+
+    @property
+    def streams(self) -> Dict[str, LogStreamMetadata]:
+        """
+        Get the metadata of all the log streams in the log group, listing them
+        again if the listing expired
+
+        Returns:
+            Dict[str, LogStreamMetadata]: The log streams metadata keyed by name
+        """
+        if self.expired:
+            self.refresh()
+        return self._streams
+
+
 class LogWatcher(CloudWatcher):
     """
     A class for AWS CloudWatch log events retrieval and parsing
@@ -156,6 +720,8 @@ class LogWatcher(CloudWatcher):
         aws_secret_access_key: Optional[str] = None,
         aws_session_token: Optional[str] = None,
         aws_region_name: Optional[str] = None,
+        streams_cache_ttl: float = 60.0,
+        client: Optional[Any] = None,
     ) -> None:
         """
         Initialize LogWatcher
@@ -168,6 +734,10 @@ class LogWatcher(CloudWatcher):
             aws_secret_access_key (Optional[str]): The AWS secret access key
             aws_session_token (Optional[str]): The AWS session token
             aws_region_name (Optional[str]): The AWS region name
+            streams_cache_ttl (float): The number of seconds the log streams metadata
+                is cached for
+            client (Optional[Any]): An existing CloudWatch Logs client to reuse,
+                the log streams metadata is shared by the watchers of a client
         """
         super().__init__(
             service_name="logs",
@@ -175,10 +745,13 @@ class LogWatcher(CloudWatcher):
             aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
             aws_region_name=aws_region_name,
+            client=client,
         )
         self.log_group_name = log_group_name
         self.log_stream_name = log_stream_name
         self.start_token = start_token
+        self.streams_cache_ttl = streams_cache_ttl
+        self.last_ingestion_time: Optional[int] = None
 
     def __repr__(self) -> str:
         """
@@ -189,24 +762,82 @@ class LogWatcher(CloudWatcher):
         """
         return f"LogWatcher('{self.log_group_name}/{self.log_stream_name}')"
 
-    def check_log_exists(self) -> bool:
+    @property
+    def streams_index(self) -> LogStreamsIndex:
+        """
+        Get the shared log streams metadata index of the log group
+
+        Returns:
+            LogStreamsIndex: The log streams index
+        """
+        return LogStreamsIndex.for_log_group(
+            self.client, self.log_group_name, ttl=self.streams_cache_ttl
+        )
+
+    def get_log_stream_metadata(
+        self, refresh: bool = False
+    ) -> Optional[LogStreamMetadata]:
+        """
+        Get the cached metadata of the log stream
+
+        Args:
+            refresh (bool): Whether to refresh the cached metadata
+
+        Returns:
+            Optional[LogStreamMetadata]: The log stream metadata or None
+                if the log stream does not exist
+        """
+        return self.streams_index.get(self.log_stream_name, refresh=refresh)
+
+    def check_log_exists(self, use_cache: bool = True) -> bool:
         """
         Check if the log stream exists
 
+        Args:
+            use_cache (bool): Whether to use the cached log streams metadata
+
         Returns:
             bool: True if the log stream exists, False otherwise
         """
         try:
-            response = self.client.describe_log_streams(
+            if use_cache:
+                return self.get_log_stream_metadata() is not None
+            paginator = self.client.get_paginator("describe_log_streams")
+            for page in paginator.paginate(
                 logGroupName=self.log_group_name,
                 logStreamNamePrefix=self.log_stream_name,
-            )
-            return True if response["logStreams"] else False
+            ):
+                for log_stream in page["logStreams"]:
+                    if log_stream["logStreamName"] == self.log_stream_name:
+                        return True
+            return False
         except Exception as e:
             _LOGGER.error(f"Error checking if log stream exists: {e}")
             return False
 
-    def _get_events(self, query_kwargs: Dict[str, Any]) -> LogEventsList:
+    def has_new_events(
+        self, since: Optional[int] = None, refresh: bool = False
+    ) -> bool:
+        """
+        Check if the log stream ingested events since the provided time,
+        using the cached log streams metadata
+
+        Args:
+            since (Optional[int]): The ingestion time in milliseconds since the epoch.
+                Defaults to the latest ingestion time of the events streamed
+                by this LogWatcher.
+            refresh (bool): Whether to refresh the cached metadata
+
+        Returns:
+            bool: True if there are new events, False otherwise
+        """
+        metadata = self.get_log_stream_metadata(refresh=refresh)
+        if metadata is None or metadata.last_ingestion_time is None:
+            return False
+        since = since if since is not None else self.last_ingestion_time
+        return since is None or metadata.last_ingestion_time > since
+
+    def _get_events(self, query_kwargs: Dict[str, Any]) -> LogEventsPage:
         """
         Get events from CloudWatch and update the arguments
         for the next query with 'nextForwardToken'
@@ -214,25 +845,40 @@ class LogWatcher(CloudWatcher):
         Args:
             query_kwargs (Dict[str, Any]): The query arguments
         Returns:
-            List[Event]: The list of log events
+            LogEventsPage: The page of log events
         """
         response = self.client.get_log_events(**query_kwargs)
-        log_events_list = LogEventsList.from_response(response)
-        query_kwargs.update({"nextToken": log_events_list.next_forward_token})
-        return log_events_list
+        log_events_page = LogEventsPage.from_response(response)
+        query_kwargs.update({"nextToken": log_events_page.next_forward_token})
+        if log_events_page.last_ingestion_time is not None:
+            self.last_ingestion_time = max(
+                self.last_ingestion_time or 0, log_events_page.last_ingestion_time
+            )
+        return log_events_page
 
-    def stream_cloudwatch_logs(
-        self, events_limit: int = 1000, max_retry_attempts: int = 5
-    ) -> Generator[LogEventsList, None, None]:
+    def stream_log_events_pages(
+        self,
+        events_limit: int = 1000,
+        max_retry_attempts: int = 5,
+        prefetch: bool = False,
+    ) -> Generator[LogEventsPage, None, None]:
         """
-        A generator that retrieves desired number of log events per iteration
+        A generator that retrieves desired number of log events per iteration,
+        without validating the individual events
 
         Args:
             events_limit (int): The number of events to retrieve per iteration.
             max_retry_attempts (int): The number of retry attempts.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
         Returns:
-            List[Event]: The list of log events
+            LogEventsPage: The page of log events
         """
+        if not 0 < events_limit <= LOG_EVENTS_LIMIT_MAX:
+            raise ValueError(
+                f"Invalid events limit: {events_limit}. "
+                f"Must be between 1 and {LOG_EVENTS_LIMIT_MAX}"
+            )
         query_kwargs = dict(
             logGroupName=self.log_group_name,
             logStreamName=self.log_stream_name,
@@ -244,24 +890,69 @@ class LogWatcher(CloudWatcher):
         _LOGGER.debug(
             f"Retrieving log events from: {self.log_group_name}/{self.log_stream_name}"
         )
-        log_events_list = self._get_events(query_kwargs)
-        yield log_events_list
-        while log_events_list:
-            log_events_list = self._get_events(query_kwargs)
-            retry_attempts = 0
-            while not log_events_list and max_retry_attempts > retry_attempts:
-                log_events_list = self._get_events(query_kwargs)
-                retry_attempts += 1
-                _LOGGER.debug(
-                    f"Received empty log events list. Retry attempt: {retry_attempts}"
-                )
-            yield log_events_list
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        next_page: Optional[Future] = None
+        try:
+            log_events_page = self._get_events(query_kwargs)
+            while True:
+                if executor is not None and log_events_page:
+                    # the next token is known, fetch the next page in the background
+                    next_page = executor.submit(self._get_events, query_kwargs)
+                yield log_events_page
+                if not log_events_page:
+                    break
+                if next_page is not None:
+                    log_events_page = next_page.result()
+                    next_page = None
+                else:
+                    log_events_page = self._get_events(query_kwargs)
+                retry_attempts = 0
+                while not log_events_page and max_retry_attempts > retry_attempts:
+                    log_events_page = self._get_events(query_kwargs)
+                    retry_attempts += 1
+                    _LOGGER.debug(
+                        "Received empty log events list. "
+                        f"Retry attempt: {retry_attempts}"
+                    )
+                if not log_events_page:
+                    yield log_events_page
+                    break
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def stream_cloudwatch_logs(
+        self,
+        events_limit: int = 1000,
+        max_retry_attempts: int = 5,
+        prefetch: bool = False,
+    ) -> Generator[LogEventsList, None, None]:
+        """
+        A generator that retrieves desired number of log events per iteration
+
+        Args:
+            events_limit (int): The number of events to retrieve per iteration.
+            max_retry_attempts (int): The number of retry attempts.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
+        Returns:
+            List[Event]: The list of log events
+        """
+        for log_events_page in self.stream_log_events_pages(
+            events_limit=events_limit,
+            max_retry_attempts=max_retry_attempts,
+            prefetch=prefetch,
+        ):
+            yield log_events_page.to_model()
 
     def stream_formatted_logs(
         self,
         events_limit: int = 1000,
         max_retry_attempts: int = 5,
         sep: str = "<br>",
+        prefetch: bool = False,
     ) -> Generator[Tuple[str, Optional[str]], None, None]:
         """
         A generator that yields formatted log events
@@ -270,20 +961,26 @@ class LogWatcher(CloudWatcher):
             events_limit (int): The number of events to retrieve per iteration.
             max_retry_attempts (int): The number of retry attempts.
             sep (str): The separator to use between log events.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
         Returns:
             Tuple[List[str], str]: The list of formatted log events and the next token
         """
-        for log_events_list in self.stream_cloudwatch_logs(
+        formatter = get_log_event_formatter()
+        for log_events_page in self.stream_log_events_pages(
             events_limit=events_limit,
             max_retry_attempts=max_retry_attempts,
+            prefetch=prefetch,
         ):
-            formatted_log_events = log_events_list.format_messages().events
             yield sep.join(
-                [event.message for event in formatted_log_events]
-            ), log_events_list.next_forward_token
+                formatter.format_records(log_events_page.events)
+            ), log_events_page.next_forward_token
 
     def return_formatted_logs(
-        self, events_limit: int = 1000, max_retry_attempts: int = 5
+        self,
+        events_limit: int = 1000,
+        max_retry_attempts: int = 5,
+        prefetch: bool = False,
     ) -> Tuple[str, Optional[str]]:
         """
         A generator that yields formatted log events
@@ -291,29 +988,139 @@ class LogWatcher(CloudWatcher):
         Args:
             events_limit (int): The number of events to retrieve per iteration.
             max_retry_attempts (int): The number of retry attempts.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
         Returns:
             Tuple[str, str]: The list of formatted log events and the next token
         """
-        formatted_events = ""
-        for log_events_list in self.stream_cloudwatch_logs(
-            events_limit=events_limit, max_retry_attempts=max_retry_attempts
+        formatter = get_log_event_formatter()
+        formatted_events: List[str] = []
+        next_token = None
+        for log_events_page in self.stream_log_events_pages(
+            events_limit=events_limit,
+            max_retry_attempts=max_retry_attempts,
+            prefetch=prefetch,
+        ):
+            formatted_events.extend(formatter.format_records(log_events_page.events))
+            next_token = log_events_page.next_forward_token
+        return "\n".join(formatted_events), next_token
+
+    def stream_structured_logs(
+        self,
+        parser: LogParser,
+        events_limit: int = 1000,
+        max_retry_attempts: int = 5,
+        prefetch: bool = False,
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[str]], None, None]:
+        """
+        A generator that yields log events parsed into structured records
+
+        Args:
+            parser (LogParser): The parser to use to structure the log messages.
+            events_limit (int): The number of events to retrieve per iteration.
+            max_retry_attempts (int): The number of retry attempts.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: The list of structured records
+                and the next token
+        """
+        for log_events_page in self.stream_log_events_pages(
+            events_limit=events_limit,
+            max_retry_attempts=max_retry_attempts,
+            prefetch=prefetch,
+        ):
+            yield parser.parse_records(
+                log_events_page.events
+            ), log_events_page.next_forward_token
+
+    def write_structured_logs(
+        self,
+        stream: IO[str],
+        parser: LogParser,
+        output_format: str = "ndjson",
+        events_limit: int = 1000,
+        max_retry_attempts: int = 5,
+        prefetch: bool = False,
+    ) -> Optional[str]:
+        """
+        Write the log events parsed into structured records to a text stream
+
+        Args:
+            stream (IO[str]): The text stream to write to.
+            parser (LogParser): The parser to use to structure the log messages.
+            output_format (str): The output format, one of: ndjson, columnar.
+            events_limit (int): The number of events to retrieve per iteration.
+            max_retry_attempts (int): The number of retry attempts.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
+        Returns:
+            Optional[str]: The next token
+        """
+        if output_format not in LOG_WRITERS:
+            raise ValueError(
+                f"Unknown output format: {output_format}. "
+                f"Available formats: {', '.join(LOG_WRITERS)}"
+            )
+        writer = LOG_WRITERS[output_format](stream)
+        next_token = None
+        for records, next_token in self.stream_structured_logs(
+            parser=parser,
+            events_limit=events_limit,
+            max_retry_attempts=max_retry_attempts,
+            prefetch=prefetch,
         ):
-            formatted_log_events_list = log_events_list.format_messages()
-            formatted_events += "\n".join(
-                [event.message for event in formatted_log_events_list.events]
+            writer.write(records)
+        return next_token
+
+    def save_structured_log_file(
+        self,
+        file_path: str,
+        parser: LogParser,
+        output_format: str = "ndjson",
+        events_limit: int = 1000,
+        prefetch: bool = False,
+    ) -> None:
+        """
+        Save the log events parsed into structured records to the specified path
+
+        Args:
+            file_path (str): The path to save the log file to.
+            parser (LogParser): The parser to use to structure the log messages.
+            output_format (str): The output format, one of: ndjson, columnar.
+            events_limit (int): The number of events to retrieve per iteration.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
+        """
+        with open(file_path, "w") as f:
+            self.write_structured_logs(
+                stream=f,
+                parser=parser,
+                output_format=output_format,
+                events_limit=events_limit,
+                prefetch=prefetch,
             )
-        return formatted_events, formatted_log_events_list.next_forward_token
+        _LOGGER.info(
+            f"Logs '{self.log_group_name}/{self.log_stream_name}' saved to: {file_path}"
+        )
 
-    def save_log_file(self, file_path: str) -> None:
+    def save_log_file(
+        self, file_path: str, events_limit: int = 1000, prefetch: bool = False
+    ) -> None:
         """
         Save the log file to the specified path
 
         Args:
             file_path (str): The path to save the log file to.
+            events_limit (int): The number of events to retrieve per iteration.
+            prefetch (bool): Whether to fetch the next page on a background thread
+                while the current one is being processed.
         """
-        logs, _ = self.return_formatted_logs()
+        logs, _ = self.return_formatted_logs(
+            events_limit=events_limit, prefetch=prefetch
+        )
         with open(file_path, "w") as f:
             f.write(logs)
         _LOGGER.info(
             f"Logs '{self.log_group_name}/{self.log_stream_name}' saved to: {file_path}"
-        )
\ No newline at end of file
+        )
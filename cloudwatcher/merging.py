@@ -0,0 +1,97 @@
+import heapq
+from datetime import datetime
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+Run = Tuple[Sequence[datetime], Sequence[float]]
+ArrayRun = Tuple[np.ndarray, np.ndarray]
+
+
+def _descending(run_index: int, run: Run) -> Iterator[Tuple[datetime, int, float]]:
+    """
+    Iterate over the datapoints of a run newest first
+
+    The runs returned by CloudWatch are already sorted, either newest or oldest
+    first, so they are only reversed. The other runs are sorted.
+    """
+    timestamps, values = run
+    if len(timestamps) != len(values):
+        raise ValueError("The timestamps and values lengths are not equal")
+    if all(a >= b for a, b in zip(timestamps, timestamps[1:])):
+        pairs = zip(timestamps, values)
+    elif all(a <= b for a, b in zip(timestamps, timestamps[1:])):
+        pairs = zip(reversed(timestamps), reversed(values))
+    else:
+        pairs = iter(sorted(zip(timestamps, values), key=lambda x: x[0], reverse=True))
+    return ((timestamp, run_index, value) for timestamp, value in pairs)
+
+
+def merge_series(
+    runs: List[Run], descending: bool = True
+) -> Tuple[List[datetime], List[float]]:
+    """
+    Merge sorted runs of datapoints into a single sorted series without duplicates
+
+    The runs are merged in a single linear pass, rather than sorted again.
+    A timestamp present in multiple runs keeps the value of the last run, e.g.
+    of the most recent fetch, as CloudWatch revises the recent datapoints.
+
+    Args:
+        runs (List[Run]): the timestamps and values of each run, sorted in
+            either order
+        descending (bool): whether to return the newest datapoints first,
+            like CloudWatch does
+
+    Returns:
+        Tuple[List[datetime], List[float]]: the merged timestamps and values
+    """
+    timestamps: List[datetime] = []
+    values: List[float] = []
+    # the datapoints of equal timestamps come from the last run first
+    merged = heapq.merge(
+        *[_descending(i, run) for i, run in enumerate(runs)],
+        key=lambda x: (x[0], x[1]),
+        reverse=True,
+    )
+    for timestamp, _, value in merged:
+        if timestamps and timestamps[-1] == timestamp:
+            continue
+        timestamps.append(timestamp)
+        values.append(value)
+    if not descending:
+        timestamps.reverse()
+        values.reverse()
+    return timestamps, values
+
+
+def merge_arrays(
+    runs: List[ArrayRun], descending: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge runs of epoch timestamps and values arrays without duplicates
+
+    The vectorized counterpart of `merge_series`, for the compact series.
+    A timestamp present in multiple runs keeps the value of the last run.
+
+    Args:
+        runs (List[ArrayRun]): the epoch timestamps and values of each run,
+            in any order
+        descending (bool): whether to return the newest datapoints first,
+            like CloudWatch does
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the merged timestamps and values
+    """
+    if any(len(epochs) != len(values) for epochs, values in runs):
+        raise ValueError("The timestamps and values lengths are not equal")
+    if not runs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    # the first occurrence in the reversed runs is the one of the last run
+    epochs = np.concatenate([run[0] for run in reversed(runs)])
+    values = np.concatenate([run[1] for run in reversed(runs)])
+    epochs, first = np.unique(epochs, return_index=True)
+    values = values[first]
+    if descending:
+        return epochs[::-1], values[::-1]
+    return epochs, values
@@ -3,16 +3,30 @@ import json
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Callable, List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple, Union
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pytz
+from matplotlib.figure import Figure
 from rich.console import Console
 from rich.table import Table
 
+from cloudwatcher.merging import merge_series
+from cloudwatcher.resampling import (
+    AlignedSeries,
+    Fill,
+    align,
+    from_epoch,
+    resample,
+    stat_aggregation,
+    to_epoch,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
+HANDLER_EXECUTORS = ["serial", "thread", "process"]
+
 
 def convert_mem(value: float, force_suffix: Optional[str] = None) -> Tuple[float, str]:
     """
@@ -49,17 +63,136 @@ class TimedMetric:
         timestamps (List[datetime]): The timestamps of the metric
         values (List[float]): The values of the metric
         label (str): The label of the metric
+        id (Optional[str]): The ID of the metric data query
+        stat (Optional[str]): The statistic of the metric data query
     """
 
     label: str
     timestamps: List[datetime]
     values: List[float]
+    id: Optional[str] = None
+    stat: Optional[str] = None
 
     def __len__(self):
         if len(self.timestamps) == len(self.values):
             return len(self.values)
         raise ValueError("The internal timed metric lengths are not equal")
 
+    @property
+    def earliest(self) -> datetime:
+        """
+        The timestamp of the earliest datapoint, in either order
+
+        The timestamps are sorted, newest or oldest first, so only the first
+        and last ones are compared. Scanning all of them is much slower, as
+        comparing timestamps with distinct time zone objects calls the time zones.
+        """
+        return min(self.timestamps[0], self.timestamps[-1])
+
+    @property
+    def latest(self) -> datetime:
+        """
+        The timestamp of the latest datapoint, in either order
+        """
+        return max(self.timestamps[0], self.timestamps[-1])
+
+    @property
+    def timespan(self) -> timedelta:
+        """
+        The time between the earliest and the latest datapoints
+        """
+        if not self.timestamps:
+            return timedelta(0)
+        return self.latest - self.earliest
+
+    def merge(self, *others: "TimedMetric") -> "TimedMetric":
+        """
+        Merge the datapoints of other fetches of the same metric
+
+        The series are merged in a single pass, without duplicated timestamps.
+        The datapoints of the last fetch take precedence.
+
+        Args:
+            *others (TimedMetric): the other fetches, oldest first
+
+        Returns:
+            TimedMetric: the merged metric, with the newest datapoints first
+        """
+        timestamps, values = merge_series(
+            [(self.timestamps, self.values)]
+            + [(other.timestamps, other.values) for other in others]
+        )
+        return TimedMetric(
+            label=self.label,
+            timestamps=timestamps,
+            values=values,
+            id=self.id,
+            stat=self.stat,
+        )
+
+    def resample(
+        self, period: int, how: Optional[str] = None, fill: Fill = None
+    ) -> "TimedMetric":
+        """
+        Roll the metric up to buckets of the period, aligned to the epoch
+
+        Args:
+            period (int): the bucket size, in seconds
+            how (Optional[str]): the aggregation of the values of each bucket, one
+                of `min`, `max`, `mean`, `sum`, `first`, `last` and `count`.
+                Defaults to the aggregation matching the statistic
+            fill (Fill): how to fill the empty buckets: a constant, `previous`
+                to propagate the last value or `linear` to interpolate.
+                The empty buckets are dropped if not provided
+
+        Returns:
+            TimedMetric: the resampled metric, with the newest datapoints first
+        """
+        epochs, values = resample(
+            to_epoch(self.timestamps),
+            np.asarray(self.values, dtype=np.float64),
+            period=period,
+            how=how or stat_aggregation(self.stat),
+            fill=fill,
+        )
+        keep = ~np.isnan(values)
+        return TimedMetric(
+            label=self.label,
+            timestamps=from_epoch(epochs[keep][::-1]),
+            values=values[keep][::-1].tolist(),
+            id=self.id,
+            stat=self.stat,
+        )
+
+    @staticmethod
+    def align(
+        timed_metrics: List["TimedMetric"],
+        period: int,
+        how: Optional[Union[str, List[str]]] = None,
+        fill: Fill = "nan",
+    ) -> AlignedSeries:
+        """
+        Resample multiple metrics on a common time grid
+
+        Args:
+            timed_metrics (List[TimedMetric]): the metrics to align
+            period (int): the bucket size, in seconds
+            how (Optional[Union[str, List[str]]]): the aggregation, or one per
+                metric. Defaults to the aggregation matching each statistic
+            fill (Fill): how to fill the empty buckets: `nan`, a constant,
+                `previous` or `linear`
+
+        Returns:
+            AlignedSeries: the aligned metrics, with the timestamps in
+                ascending order
+        """
+        return align(
+            [(tm.label, tm.timestamps, tm.values) for tm in timed_metrics],
+            period=period,
+            how=how or [stat_aggregation(tm.stat) for tm in timed_metrics],
+            fill=fill,
+        )
+
 
 class ResponseHandler:
     """
@@ -79,8 +212,15 @@ class ResponseHandler:
 class TimedMetricHandler:
     """
     Class to establish the interface for a timed metric handling
+
+    The `executor` is where the handler runs when the timed metrics are handled
+    in parallel: `thread` for the handlers releasing the GIL, e.g. writing
+    files, `process` for the CPU bound ones and `serial` for the ones whose
+    output must stay in order, e.g. printed to the console.
     """
 
+    executor = "thread"
+
     def __init__(self, timed_metric: TimedMetric) -> None:
         """
         Initialize the handler
@@ -91,6 +231,27 @@ class TimedMetricHandler:
         self.timed_metric = timed_metric
 
 
+class TimedMetricHandlerError(RuntimeError):
+    """
+    The errors raised by a handler for some of the timed metrics
+
+    Args:
+        handler_name (str): The name of the handler
+        errors (List[Tuple[str, BaseException]]): The labels of the timed
+            metrics the handler failed for, and the errors
+    """
+
+    def __init__(
+        self, handler_name: str, errors: List[Tuple[str, BaseException]]
+    ) -> None:
+        self.handler_name = handler_name
+        self.errors = errors
+        details = "; ".join(f"'{label}': {error!r}" for label, error in errors)
+        super().__init__(
+            f"'{handler_name}' failed for {len(errors)} timed metrics: {details}"
+        )
+
+
 class ResponseSaver(ResponseHandler):
     """
     Save the response to a file
@@ -122,11 +283,16 @@ class ResponseLogger(ResponseHandler):
 
 
 class TimedMetricPlotter(TimedMetricHandler):
+    # matplotlib holds the GIL while rendering
+    executor = "process"
 
     def __call__(self, target: str, metric_unit: str) -> None:
         """
         Plot the timed metric
 
+        The figure is not registered with pyplot, so it is released once saved
+        and the plots can be drawn concurrently.
+
         Args:
             target (str): The target file to save the plot to
             metric_unit (str): The unit of the metric
@@ -135,21 +301,22 @@ class TimedMetricPlotter(TimedMetricHandler):
         if self.timed_metric.label.startswith("mem") and metric_unit == "Bytes":
             metric_unit = "GB"
             values = [convert_mem(v, force_suffix=metric_unit)[0] for v in values]
-        plt.figure()
-        plt.plot(
+        figure = Figure()
+        axes = figure.subplots()
+        axes.plot(
             self.timed_metric.timestamps,
             values,
             linewidth=0.8,
         )
-        plt.title(
+        axes.set_title(
             f"{self.timed_metric.label} over time",
             loc="right",
             fontstyle="italic",
         )
-        plt.ylabel(f"{self.timed_metric.label} ({metric_unit})")
-        plt.ticklabel_format(axis="y", style="plain", useOffset=False)
-        plt.tick_params(left=True, bottom=False, labelleft=True, labelbottom=False)
-        plt.savefig(
+        axes.set_ylabel(f"{self.timed_metric.label} ({metric_unit})")
+        axes.ticklabel_format(axis="y", style="plain", useOffset=False)
+        axes.tick_params(left=True, bottom=False, labelleft=True, labelbottom=False)
+        figure.savefig(
             target,
             bbox_inches="tight",
             pad_inches=0.1,
@@ -177,7 +344,7 @@ class TimedMetricSummarizer(TimedMetricHandler):
         """
         if target is not None:
             raise NotImplementedError("Logging to a file is not yet implemented.")
-        timespan = self.timed_metric.timestamps[0] - self.timed_metric.timestamps[-1]
+        timespan = self.timed_metric.timespan
         _LOGGER.info(
             f"Retrieved '{self.timed_metric.label}' {len(self.timed_metric.values)} "
             f"measurements over {timespan} timespan"
@@ -197,6 +364,9 @@ class TimedMetricSummarizer(TimedMetricHandler):
 
 
 class TimedMetricLogger(TimedMetricHandler):
+    # the tables are printed in the order of the timed metrics
+    executor = "serial"
+
     def __call__(self, target: str) -> None:
         """
         Log the timed metric as a table
@@ -241,13 +411,23 @@ class TimedMetricJsonSaver(TimedMetricHandler):
         Args:
             target (str): The target file to save the object to
         """
+        timestamps = self.timed_metric.timestamps
+        values = self.timed_metric.values
+        # the timed metrics loaded from the binary series files hold arrays
+        data = {
+            "Label": self.timed_metric.label,
+            "Timestamps": timestamps
+            if isinstance(timestamps, list)
+            else list(timestamps),
+            "Values": values
+            if isinstance(values, list)
+            else np.asarray(values).tolist(),
+        }
+        if self.timed_metric.stat is not None:
+            data["Stat"] = self.timed_metric.stat
         with open(target, "w") as f:
             json.dump(
-                {
-                    "Label": self.timed_metric.label,
-                    "Timestamps": self.timed_metric.timestamps,
-                    "Values": self.timed_metric.values,
-                },
+                data,
                 f,
                 indent=4,
                 default=str,
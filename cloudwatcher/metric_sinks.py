@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Any, Dict, List, Optional, Type
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricSample:
+    """
+    A single datapoint of a metric data result
+
+    Args:
+        timestamp (datetime): The timestamp of the datapoint
+        value (float): The value of the datapoint
+        namespace (Optional[str]): The namespace of the metric
+        metric_name (Optional[str]): The name of the metric
+        metric_id (Optional[str]): The ID of the metric data result
+        label (Optional[str]): The label of the metric data result
+        stat (Optional[str]): The statistic of the metric data result
+        unit (Optional[str]): The unit of the metric
+        dimensions (Dict[str, str]): The dimensions of the metric
+    """
+
+    timestamp: datetime
+    value: float
+    namespace: Optional[str] = None
+    metric_name: Optional[str] = None
+    metric_id: Optional[str] = None
+    label: Optional[str] = None
+    stat: Optional[str] = None
+    unit: Optional[str] = None
+    dimensions: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the sample to a JSON serializable dictionary
+
+        Returns:
+            Dict[str, Any]: The sample, with the timestamp in ISO 8601 format
+        """
+        return {
+            "timestamp": self.timestamp.isoformat(),
+            "value": self.value,
+            "namespace": self.namespace,
+            "metric_name": self.metric_name,
+            "metric_id": self.metric_id,
+            "label": self.label,
+            "stat": self.stat,
+            "unit": self.unit,
+            "dimensions": self.dimensions,
+        }
+
+
+class MetricSink:
+    """
+    Class to establish the interface for a metric samples sink
+    """
+
+    def write(self, samples: List[MetricSample]) -> None:
+        """
+        Write a batch of metric samples
+
+        Args:
+            samples (List[MetricSample]): The samples to write
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release the resources held by the sink
+        """
+        pass
+
+
+class StreamMetricSink(MetricSink):
+    """
+    Write one JSON object per metric sample to a text stream
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        """
+        Initialize the sink
+
+        Args:
+            stream (Optional[IO[str]]): The text stream to write to,
+                standard output by default
+        """
+        self.stream = stream or sys.stdout
+
+    def write(self, samples: List[MetricSample]) -> None:
+        self.stream.writelines(
+            json.dumps(sample.to_dict(), default=str) + "\n" for sample in samples
+        )
+        self.stream.flush()
+
+
+class RotatingFileMetricSink(MetricSink):
+    """
+    Write one JSON object per metric sample to a file, rotated by size
+
+    When the file would exceed `max_bytes`, it is renamed with a `.1` suffix,
+    the older files are shifted and the files beyond `backup_count` are removed.
+    """
+
+    def __init__(
+        self, file_path: str, max_bytes: int = 10485760, backup_count: int = 5
+    ) -> None:
+        """
+        Initialize the sink
+
+        Args:
+            file_path (str): The path of the file to write to
+            max_bytes (int): The maximum size of the file before it is rotated
+            backup_count (int): The number of rotated files to keep
+        """
+        if max_bytes < 1:
+            raise ValueError(f"Invalid maximum file size: {max_bytes}")
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file: Optional[IO[str]] = None
+
+    def _open(self) -> IO[str]:
+        if self._file is None:
+            self._file = open(self.file_path, "a", encoding="UTF8")
+        return self._file
+
+    def _rotate(self) -> None:
+        """
+        Rotate the file and its backups
+        """
+        self.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.file_path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
+        _LOGGER.debug(f"Rotated metric samples file: {self.file_path}")
+
+    def write(self, samples: List[MetricSample]) -> None:
+        f = self._open()
+        for sample in samples:
+            line = json.dumps(sample.to_dict(), default=str) + "\n"
+            if f.tell() > 0 and f.tell() + len(line.encode()) > self.max_bytes:
+                self._rotate()
+                f = self._open()
+            f.write(line)
+        f.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+METRIC_SINKS: Dict[str, Type[MetricSink]] = {
+    "stdout": StreamMetricSink,
+    "file": RotatingFileMetricSink,
+}
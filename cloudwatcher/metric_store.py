@@ -0,0 +1,360 @@
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from cloudwatcher.metric_sinks import MetricSample, MetricSink
+from cloudwatcher.resampling import stat_aggregation
+
+_LOGGER = logging.getLogger(__name__)
+
+# SQL aggregate functions used to downsample the datapoints
+AGGREGATES = {"min": "MIN", "max": "MAX", "mean": "AVG", "sum": "SUM"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    metric_name TEXT NOT NULL,
+    metric_id TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    dimensions TEXT NOT NULL,
+    label TEXT,
+    unit TEXT,
+    UNIQUE (namespace, metric_name, metric_id, stat, dimensions)
+);
+CREATE TABLE IF NOT EXISTS datapoints (
+    series_id INTEGER NOT NULL REFERENCES series (id),
+    timestamp INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_id, timestamp)
+) WITHOUT ROWID;
+"""
+
+IdentityKey = Tuple[str, str, str, str, str]
+
+
+def _identity(
+    namespace: Optional[str],
+    metric_name: Optional[str],
+    metric_id: Optional[str],
+    stat: Optional[str],
+    dimensions: Dict[str, str],
+) -> IdentityKey:
+    """
+    Get the identity of a series, the missing fields are stored as empty strings
+    so that they are unique in SQLite
+    """
+    return (
+        namespace or "",
+        metric_name or "",
+        metric_id or "",
+        stat or "",
+        json.dumps(dimensions, sort_keys=True),
+    )
+
+
+def _epoch(timestamp: datetime.datetime) -> int:
+    return int(timestamp.timestamp())
+
+
+@dataclass
+class StoredSeries:
+    """
+    A series of datapoints kept in the metric store
+
+    Args:
+        namespace (Optional[str]): The namespace of the metric
+        metric_name (Optional[str]): The name of the metric
+        metric_id (Optional[str]): The ID of the metric data result
+        stat (Optional[str]): The statistic of the metric data result
+        dimensions (Dict[str, str]): The dimensions of the metric
+        label (Optional[str]): The label of the latest written datapoints
+        unit (Optional[str]): The unit of the latest written datapoints
+        datapoints (int): The number of datapoints kept
+        earliest (Optional[datetime.datetime]): The oldest datapoint timestamp
+        latest (Optional[datetime.datetime]): The newest datapoint timestamp
+    """
+
+    namespace: Optional[str]
+    metric_name: Optional[str]
+    metric_id: Optional[str]
+    stat: Optional[str]
+    dimensions: Dict[str, str]
+    label: Optional[str]
+    unit: Optional[str]
+    datapoints: int
+    earliest: Optional[datetime.datetime]
+    latest: Optional[datetime.datetime]
+
+
+class MetricStore(MetricSink):
+    """
+    Embedded SQLite store of the metric datapoints
+
+    The datapoints are indexed by the series identity, i.e. the namespace,
+    metric name, result ID, statistic and dimensions, and by the timestamp,
+    so the range queries read a contiguous part of the index. A datapoint
+    written again for the same timestamp replaces the previous value, as
+    CloudWatch revises the most recent datapoints. The store keeps the history
+    beyond the CloudWatch retention and can be queried without any API call.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open or create the store
+
+        Args:
+            path (str): the path to the SQLite database file, `:memory:` for
+                a store that is not persisted
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._series_ids: Dict[IdentityKey, int] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"MetricStore({self.path})"
+
+    def _series_id(
+        self, key: IdentityKey, label: Optional[str] = None, unit: Optional[str] = None
+    ) -> int:
+        """
+        Get the ID of the series, create the series if it does not exist
+        """
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO series "
+                "(namespace, metric_name, metric_id, stat, dimensions) "
+                "VALUES (?, ?, ?, ?, ?)",
+                key,
+            )
+            series_id = self._find_series_id(key)
+            self._series_ids[key] = series_id
+        if label is not None or unit is not None:
+            self._connection.execute(
+                "UPDATE series SET label = COALESCE(?, label), "
+                "unit = COALESCE(?, unit) WHERE id = ?",
+                (label, unit, series_id),
+            )
+        return series_id
+
+    def _find_series_id(self, key: IdentityKey) -> Optional[int]:
+        row = self._connection.execute(
+            "SELECT id FROM series WHERE namespace = ? AND metric_name = ? "
+            "AND metric_id = ? AND stat = ? AND dimensions = ?",
+            key,
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def write(self, samples: List[MetricSample]) -> None:
+        rows = []
+        with self._lock, self._connection:
+            series_ids: Dict[IdentityKey, int] = {}
+            for sample in samples:
+                key = _identity(
+                    sample.namespace,
+                    sample.metric_name,
+                    sample.metric_id,
+                    sample.stat,
+                    sample.dimensions,
+                )
+                series_id = series_ids.get(key)
+                if series_id is None:
+                    series_id = series_ids[key] = self._series_id(
+                        key, label=sample.label, unit=sample.unit
+                    )
+                rows.append((series_id, _epoch(sample.timestamp), sample.value))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO datapoints (series_id, timestamp, value) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+        _LOGGER.debug(f"Stored {len(rows)} datapoints in {self.path}")
+
+    def read(
+        self,
+        namespace: Optional[str],
+        metric_name: Optional[str],
+        metric_id: Optional[str],
+        stat: Optional[str],
+        dimensions: Dict[str, str],
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        period: Optional[int] = None,
+        aggregate: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """
+        Read the datapoints of a series in the time range
+
+        Args:
+            namespace (Optional[str]): the namespace of the metric
+            metric_name (Optional[str]): the name of the metric
+            metric_id (Optional[str]): the ID of the metric data result
+            stat (Optional[str]): the statistic of the metric data result
+            dimensions (Dict[str, str]): the dimensions of the metric
+            start_time (datetime.datetime): the start of the time range, inclusive
+            end_time (datetime.datetime): the end of the time range, exclusive
+            period (Optional[int]): the period to downsample the datapoints to,
+                in seconds. The stored datapoints are returned if not provided
+            aggregate (Optional[str]): the aggregate used to downsample the
+                datapoints, one of `min`, `max`, `mean` and `sum`. Defaults to
+                the aggregate matching the statistic
+
+        Returns:
+            Optional[Dict]: the metric data result, in the structure of the
+                `get_metric_data` results with the newest datapoints first,
+                None if the series is not stored
+        """
+        key = _identity(namespace, metric_name, metric_id, stat, dimensions)
+        with self._lock:
+            series_id = self._series_ids.get(key) or self._find_series_id(key)
+            if series_id is None:
+                return None
+            (label,) = self._connection.execute(
+                "SELECT label FROM series WHERE id = ?", (series_id,)
+            ).fetchone()
+            params = dict(
+                series_id=series_id,
+                start=_epoch(start_time),
+                end=_epoch(end_time),
+                period=period,
+            )
+            if period is None:
+                rows = self._connection.execute(
+                    "SELECT timestamp, value FROM datapoints "
+                    "WHERE series_id = :series_id "
+                    "AND timestamp >= :start AND timestamp < :end "
+                    "ORDER BY timestamp DESC",
+                    params,
+                ).fetchall()
+            else:
+                if period <= 0:
+                    raise ValueError(f"Invalid period: {period}")
+                function = AGGREGATES[aggregate or stat_aggregation(stat)]
+                rows = self._connection.execute(
+                    f"SELECT timestamp / :period * :period AS bucket, "
+                    f"{function}(value) FROM datapoints "
+                    "WHERE series_id = :series_id "
+                    "AND timestamp >= :start AND timestamp < :end "
+                    "GROUP BY bucket ORDER BY bucket DESC",
+                    params,
+                ).fetchall()
+        return {
+            "Id": metric_id,
+            "Label": label or metric_id,
+            "Timestamps": [
+                datetime.datetime.fromtimestamp(timestamp, pytz.utc)
+                for timestamp, _ in rows
+            ],
+            "Values": [value for _, value in rows],
+            "StatusCode": "Complete",
+            "Stat": stat,
+        }
+
+    def series(self) -> List[StoredSeries]:
+        """
+        List the stored series
+
+        Returns:
+            List[StoredSeries]: the stored series and their time range
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT namespace, metric_name, metric_id, stat, dimensions, "
+                "label, unit, COUNT(timestamp), MIN(timestamp), MAX(timestamp) "
+                "FROM series LEFT JOIN datapoints ON datapoints.series_id = series.id "
+                "GROUP BY series.id ORDER BY namespace, metric_name, metric_id, stat"
+            ).fetchall()
+        return [
+            StoredSeries(
+                namespace=row[0] or None,
+                metric_name=row[1] or None,
+                metric_id=row[2] or None,
+                stat=row[3] or None,
+                dimensions=json.loads(row[4]),
+                label=row[5],
+                unit=row[6],
+                datapoints=row[7],
+                earliest=datetime.datetime.fromtimestamp(row[8], pytz.utc)
+                if row[8] is not None
+                else None,
+                latest=datetime.datetime.fromtimestamp(row[9], pytz.utc)
+                if row[9] is not None
+                else None,
+            )
+            for row in rows
+        ]
+
+    def compact(
+        self, before: datetime.datetime, period: int, vacuum: bool = False
+    ) -> int:
+        """
+        Downsample the datapoints older than the cutoff to the period
+
+        The datapoints of each period are replaced with their aggregate matching
+        the statistic of the series, like CloudWatch does for the older data.
+        Compacting the same range again has no effect.
+
+        Args:
+            before (datetime.datetime): the cutoff, rounded down to the period
+            period (int): the period to downsample to, in seconds
+            vacuum (bool): whether to release the freed space to the file system
+
+        Returns:
+            int: the number of datapoints removed
+        """
+        if period <= 0:
+            raise ValueError(f"Invalid period: {period}")
+        cutoff = _epoch(before) // period * period
+        removed = 0
+        with self._lock, self._connection:
+            for series_id, stat in self._connection.execute(
+                "SELECT id, stat FROM series"
+            ).fetchall():
+                function = AGGREGATES[stat_aggregation(stat or None)]
+                params = dict(series_id=series_id, cutoff=cutoff, period=period)
+                buckets = self._connection.execute(
+                    f"SELECT timestamp / :period * :period AS bucket, "
+                    f"{function}(value), COUNT(*), MIN(timestamp) FROM datapoints "
+                    "WHERE series_id = :series_id AND timestamp < :cutoff "
+                    "GROUP BY bucket",
+                    params,
+                ).fetchall()
+                if all(
+                    count == 1 and first == bucket
+                    for bucket, _, count, first in buckets
+                ):
+                    continue
+                self._connection.execute(
+                    "DELETE FROM datapoints "
+                    "WHERE series_id = :series_id AND timestamp < :cutoff",
+                    params,
+                )
+                self._connection.executemany(
+                    "INSERT INTO datapoints (series_id, timestamp, value) "
+                    "VALUES (?, ?, ?)",
+                    [(series_id, bucket, value) for bucket, value, _, _ in buckets],
+                )
+                removed += sum(bucket[2] for bucket in buckets) - len(buckets)
+        if vacuum:
+            with self._lock:
+                self._connection.execute("VACUUM")
+        _LOGGER.info(
+            f"Compacted {removed} datapoints older than "
+            f"{datetime.datetime.fromtimestamp(cutoff, pytz.utc)} to {period}s"
+        )
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -1,26 +1,583 @@
 import datetime
 import logging
-from typing import Dict, List, Optional, Type
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
 
 import boto3
+import numpy as np
 import pytz
 
 from cloudwatcher.cloudwatcher import CloudWatcher
+from cloudwatcher.governor import NO_RETRIES_CONFIG
+from cloudwatcher.merging import merge_arrays, merge_series
 from cloudwatcher.metric_handlers import (
+    HANDLER_EXECUTORS,
     ResponseLogger,
     ResponseSaver,
     TimedMetric,
     TimedMetricCsvSaver,
+    TimedMetricHandlerError,
     TimedMetricJsonSaver,
     TimedMetricLogger,
     TimedMetricPlotter,
     TimedMetricSummarizer,
 )
-from cloudwatcher.preset import Dimension
+from cloudwatcher.metric_sinks import MetricSample
+from cloudwatcher.metric_store import MetricStore
+from cloudwatcher.preset import Dimension, MetricExpression, MetricWatcherSetup
+from cloudwatcher.query_planner import (
+    MAX_DATAPOINTS_PER_REQUEST,
+    plan_query_windows,
+    retention_period,
+)
+from cloudwatcher.resampling import EpochTimestamps, to_epoch
+from cloudwatcher.series_file import TimedMetricBinarySaver
 
 _LOGGER = logging.getLogger(__name__)
 
 
+# maximum number of queries in a single GetMetricData call
+METRIC_DATA_QUERIES_MAX = 500
+# maximum number of query windows requested concurrently
+QUERY_WINDOWS_WORKERS = 4
+_LOG_BUFFER = threading.local()
+
+
+class _LogBufferFilter(logging.Filter):
+    """
+    Divert the records logged by the current thread to its buffer, if it has one
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        records = getattr(_LOG_BUFFER, "records", None)
+        if records is None:
+            return True
+        # the records are replayed by the parent process, the arguments and
+        # the traceback may not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        records.append(record)
+        return False
+
+
+_LOG_BUFFER_FILTER = _LogBufferFilter()
+
+
+def _run_timed_metric_handler(
+    handler_class: Type,
+    timed_metric: TimedMetric,
+    handler_kwargs: Dict,
+    log_level: Optional[int] = None,
+) -> Tuple[List[logging.LogRecord], float, Optional[Exception]]:
+    """
+    Run a TimedMetricHandler in a worker thread or process
+
+    The records logged by the handler are kept instead of emitted, so they
+    can be replayed in the order of the timed metrics.
+
+    Args:
+        handler_class (TimedMetricHandler): the TimedMetricHandler to execute
+        timed_metric (TimedMetric): the timed metric to handle
+        handler_kwargs (Dict): the kwargs to pass to the handler
+        log_level (Optional[int]): the level of the handler logger, set in the
+            worker processes that do not inherit the logging configuration
+
+    Returns:
+        Tuple[List[logging.LogRecord], float, Optional[Exception]]: the log
+            records, the execution time in seconds and the error, if any
+    """
+    logger = logging.getLogger(handler_class.__module__)
+    if log_level is not None:
+        logger.setLevel(log_level)
+    logger.addFilter(_LOG_BUFFER_FILTER)
+    records: List[logging.LogRecord] = []
+    _LOG_BUFFER.records = records
+    started = time.perf_counter()
+    error = None
+    try:
+        handler_class(timed_metric=timed_metric)(**handler_kwargs)
+    except Exception as e:
+        error = e
+    finally:
+        _LOG_BUFFER.records = None
+    return records, time.perf_counter() - started, error
+
+
+def _stats(stat: Union[str, List[str]]) -> List[str]:
+    """
+    Get the list of unique statistics to query
+
+    Args:
+        stat (Union[str, List[str]]): a statistic or a list of statistics
+
+    Returns:
+        List[str]: the statistics, in the order of appearance
+    """
+    stats = [stat] if isinstance(stat, str) else list(dict.fromkeys(stat))
+    if not stats:
+        raise ValueError("At least one statistic must be provided")
+    return stats
+
+
+def _time(x: datetime.datetime) -> str:
+    """
+    Format a datetime object for logging
+
+    Args:
+        x (datetime.datetime): the datetime object to format
+    """
+    return x.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _query_stats(queries: List[Dict]) -> Dict[str, str]:
+    """
+    Get the statistic of each metric query, by query ID
+    """
+    return {
+        query["Id"]: query["MetricStat"]["Stat"]
+        for query in queries
+        if "MetricStat" in query
+    }
+
+
+def _metric_data_pages(
+    client: Any,
+    queries: List[Dict],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+) -> Iterator[Optional[Dict]]:
+    """
+    Page through the GetMetricData results of the queries
+
+    The queries are sent in batches of up to 500 queries, newest datapoints
+    first. The generator does not hold on to a page once the next one is
+    requested.
+
+    Args:
+        client (Any): the CloudWatch client
+        queries (List[Dict]): the metric data queries
+        start_time (datetime.datetime): the start of the time window
+        end_time (datetime.datetime): the end of the time window
+
+    Yields:
+        Optional[Dict]: the pages, None after an invalid response status
+    """
+    for i in range(0, len(queries), METRIC_DATA_QUERIES_MAX):
+        query_kwargs: Dict[str, Any] = dict(
+            MetricDataQueries=queries[i : i + METRIC_DATA_QUERIES_MAX],
+            StartTime=start_time,
+            EndTime=end_time,
+            ScanBy="TimestampDescending",
+        )
+        while True:
+            response = client.get_metric_data(**query_kwargs)
+            resp_status = response["ResponseMetadata"]["HTTPStatusCode"]
+            if resp_status != 200:
+                _LOGGER.error(f"Invalid response status code: {resp_status}")
+                yield None
+                return
+            _LOGGER.debug(f"Response status code: {resp_status}")
+            next_token = response.get("NextToken")
+            yield response
+            del response
+            if not next_token:
+                break
+            query_kwargs["NextToken"] = next_token
+
+
+def get_metric_data(
+    client: Any,
+    queries: List[Dict],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+) -> Optional[Dict]:
+    """
+    Query the metric data in as few GetMetricData calls as possible
+
+    The queries are sent in batches of up to 500 queries and the paginated
+    results are merged, so that each query is represented by a single result.
+    The datapoints are requested newest first, so the pages are already in
+    order and only concatenated.
+    The results of the metric queries are annotated with the queried statistic
+    under the `Stat` key.
+
+    Args:
+        client (Any): the CloudWatch client
+        queries (List[Dict]): the metric data queries
+        start_time (datetime.datetime): the start of the time window
+        end_time (datetime.datetime): the end of the time window
+
+    Returns:
+        Dict: the merged response, check the structure of the
+        response [here](https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudwatch.html#CloudWatch.Client.get_metric_data) # noqa: E501
+    """
+    results: Dict[str, Dict] = {}
+    messages: List[Dict] = []
+    metadata: Dict = {}
+    query_stats = _query_stats(queries)
+    for response in _metric_data_pages(client, queries, start_time, end_time):
+        if response is None:
+            return None
+        for result in response["MetricDataResults"]:
+            merged = results.get(result["Id"])
+            if merged is None:
+                results[result["Id"]] = result
+                if result["Id"] in query_stats:
+                    result["Stat"] = query_stats[result["Id"]]
+            else:
+                merged["Timestamps"].extend(result["Timestamps"])
+                merged["Values"].extend(result["Values"])
+                merged["StatusCode"] = result["StatusCode"]
+        messages.extend(response.get("Messages", []))
+        metadata = response.get("ResponseMetadata", {})
+    return {
+        "MetricDataResults": list(results.values()),
+        "Messages": messages,
+        "ResponseMetadata": metadata,
+    }
+
+
+def compact_timed_metric(result: Dict, stat: Optional[str] = None) -> TimedMetric:
+    """
+    Convert a metric data result into a compact timed metric
+
+    The timestamps are kept as 64-bit integer seconds since the epoch and
+    the values as 64-bit floats, i.e. 16 bytes per datapoint instead of
+    the datetime and float objects of the parsed response.
+
+    Args:
+        result (Dict): the metric data result
+        stat (Optional[str]): the statistic of the result, if not in the result
+
+    Returns:
+        TimedMetric: the timed metric, with the timestamps as `EpochTimestamps`
+            and the values as an array
+    """
+    return TimedMetric(
+        label=result["Label"],
+        timestamps=EpochTimestamps(to_epoch(result["Timestamps"]).astype(np.int64)),
+        values=np.asarray(result["Values"], dtype=np.float64),
+        id=result.get("Id"),
+        stat=result.get("Stat", stat),
+    )
+
+
+def _concatenate(timed_metrics: List[TimedMetric]) -> TimedMetric:
+    """
+    Concatenate the compact pages of a series, already in order
+    """
+    first = timed_metrics[0]
+    if len(timed_metrics) == 1:
+        return first
+    return TimedMetric(
+        label=first.label,
+        timestamps=EpochTimestamps(
+            np.concatenate([tm.timestamps.epochs for tm in timed_metrics])
+        ),
+        values=np.concatenate([tm.values for tm in timed_metrics]),
+        id=first.id,
+        stat=first.stat,
+    )
+
+
+def get_compact_metric_data(
+    client: Any,
+    queries: List[Dict],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+) -> Optional[List[TimedMetric]]:
+    """
+    Query the metric data into compact timed metrics, page by page
+
+    Like `get_metric_data`, but each page is converted into compact arrays
+    as soon as it is received and then released, so at most one parsed page
+    is held in memory at a time, instead of the whole response.
+
+    Args:
+        client (Any): the CloudWatch client
+        queries (List[Dict]): the metric data queries
+        start_time (datetime.datetime): the start of the time window
+        end_time (datetime.datetime): the end of the time window
+
+    Returns:
+        Optional[List[TimedMetric]]: the compact timed metric of each query
+            returning data, with the newest datapoints first
+    """
+    pages: Dict[str, List[TimedMetric]] = {}
+    query_stats = _query_stats(queries)
+    for response in _metric_data_pages(client, queries, start_time, end_time):
+        if response is None:
+            return None
+        for result in response["MetricDataResults"]:
+            pages.setdefault(result["Id"], []).append(
+                compact_timed_metric(result, stat=query_stats.get(result["Id"]))
+            )
+        for message in response.get("Messages", []):
+            _LOGGER.debug(f"GetMetricData message: {message}")
+    return [_concatenate(pages.pop(result_id)) for result_id in list(pages)]
+
+
+def stitch_metric_data(responses: List[Dict]) -> Dict:
+    """
+    Stitch the responses of adjacent time windows into a single response
+
+    The results are merged by Id and the datapoints are ordered newest first,
+    like in a single GetMetricData response. The results of each window are
+    already sorted, so they are merged in a single pass, and the datapoints
+    at the boundaries of the windows are not duplicated.
+
+    Args:
+        responses (List[Dict]): the responses to stitch
+
+    Returns:
+        Dict: the stitched response
+    """
+    results: Dict[str, Dict] = {}
+    runs: Dict[str, List[Tuple[List, List]]] = {}
+    messages: List[Dict] = []
+    for response in responses:
+        for result in response["MetricDataResults"]:
+            merged = results.get(result["Id"])
+            if merged is None:
+                results[result["Id"]] = dict(result)
+                runs[result["Id"]] = []
+            elif result["StatusCode"] != "Complete":
+                merged["StatusCode"] = result["StatusCode"]
+            runs[result["Id"]].append((result["Timestamps"], result["Values"]))
+        messages.extend(response.get("Messages", []))
+    for result_id, result in results.items():
+        result["Timestamps"], result["Values"] = merge_series(runs[result_id])
+    return {
+        "MetricDataResults": list(results.values()),
+        "Messages": messages,
+        "ResponseMetadata": responses[-1].get("ResponseMetadata", {})
+        if responses
+        else {},
+    }
+
+
+def stitch_compact_metric_data(
+    windows: List[List[TimedMetric]],
+) -> List[TimedMetric]:
+    """
+    Stitch the compact timed metrics of adjacent time windows
+
+    The compact counterpart of `stitch_metric_data`: the series are merged by
+    ID, newest datapoints first, without the duplicates at the boundaries.
+
+    Args:
+        windows (List[List[TimedMetric]]): the compact timed metrics of each
+            window
+
+    Returns:
+        List[TimedMetric]: the stitched timed metrics
+    """
+    runs: Dict[Optional[str], List[TimedMetric]] = {}
+    for timed_metrics in windows:
+        for timed_metric in timed_metrics:
+            runs.setdefault(timed_metric.id, []).append(timed_metric)
+    stitched = []
+    for result_id in list(runs):
+        timed_metrics = runs.pop(result_id)
+        epochs, values = merge_arrays(
+            [(tm.timestamps.epochs, tm.values) for tm in timed_metrics]
+        )
+        stitched.append(
+            TimedMetric(
+                label=timed_metrics[0].label,
+                timestamps=EpochTimestamps(epochs),
+                values=values,
+                id=result_id,
+                stat=timed_metrics[0].stat,
+            )
+        )
+    return stitched
+
+
+def _query_windows(
+    fetch: Callable[..., Any],
+    client: Any,
+    queries_factory: Callable[[int], List[Dict]],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+    period: Optional[int],
+    max_datapoints: int,
+    high_resolution: bool,
+) -> Optional[List[Any]]:
+    """
+    Fetch the metric data of the time range, split into windows if the period
+    is planned
+
+    Args:
+        fetch (Callable[..., Any]): the function fetching the metric data of a
+            window, e.g. `get_metric_data`
+        client (Any): the CloudWatch client
+        queries_factory (Callable[[int], List[Dict]]): a function that returns
+            the metric data queries for the given period
+        start_time (datetime.datetime): the start of the time range
+        end_time (datetime.datetime): the end of the time range
+        period (Optional[int]): the period of the metric, planned if not provided
+        max_datapoints (int): the datapoints budget per metric, used to plan
+            the period
+        high_resolution (bool): whether the metric is a high resolution metric
+
+    Returns:
+        Optional[List[Any]]: the metric data of each window, None if any
+            window failed
+    """
+    if period is not None:
+        finest = retention_period(start_time, end_time, high_resolution)
+        if period < finest:
+            _LOGGER.warning(
+                f"The period of {period}s is finer than the {finest}s resolution "
+                f"retained for data starting at {_time(start_time)}, "
+                "some datapoints may be missing. Use 'auto' period to avoid that."
+            )
+        data = fetch(
+            client=client,
+            queries=queries_factory(period),
+            start_time=start_time,
+            end_time=end_time,
+        )
+        return None if data is None else [data]
+    windows = plan_query_windows(
+        start_time=start_time,
+        end_time=end_time,
+        max_datapoints=max_datapoints,
+        high_resolution=high_resolution,
+        now=end_time,
+    )
+    _LOGGER.info(
+        "Planned query windows: "
+        + ", ".join(
+            f"{_time(w.start_time)} - {_time(w.end_time)} ({w.period}s)"
+            for w in windows
+        )
+    )
+
+    def _query_window(window):
+        return fetch(
+            client=client,
+            queries=queries_factory(window.period),
+            start_time=window.start_time,
+            end_time=window.end_time,
+        )
+
+    if len(windows) == 1:
+        responses = [_query_window(windows[0])]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(QUERY_WINDOWS_WORKERS, len(windows))
+        ) as executor:
+            responses = list(executor.map(_query_window, windows))
+    if any(response is None for response in responses):
+        return None
+    return responses
+
+
+def query_metric_data(
+    client: Any,
+    queries_factory: Callable[[int], List[Dict]],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+    period: Optional[int] = None,
+    max_datapoints: int = 1440,
+    high_resolution: bool = False,
+) -> Optional[Dict]:
+    """
+    Query the metric data with a fixed or an automatically planned period
+
+    If the period is not provided, the time range is split into windows with
+    the finest period that fits the datapoints budget and the data retention
+    (see `plan_query_windows`). The windows are queried concurrently and the
+    responses are stitched into a single response.
+
+    Args:
+        client (Any): the CloudWatch client
+        queries_factory (Callable[[int], List[Dict]]): a function that returns
+            the metric data queries for the given period
+        start_time (datetime.datetime): the start of the time range
+        end_time (datetime.datetime): the end of the time range
+        period (Optional[int]): the period of the metric, planned if not provided
+        max_datapoints (int): the datapoints budget per metric, used to plan
+            the period
+        high_resolution (bool): whether the metric is a high resolution metric
+
+    Returns:
+        Dict: the response, check the structure of the
+        response [here](https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudwatch.html#CloudWatch.Client.get_metric_data) # noqa: E501
+    """
+    responses = _query_windows(
+        get_metric_data,
+        client=client,
+        queries_factory=queries_factory,
+        start_time=start_time,
+        end_time=end_time,
+        period=period,
+        max_datapoints=max_datapoints,
+        high_resolution=high_resolution,
+    )
+    if responses is None:
+        return None
+    if len(responses) == 1:
+        return responses[0]
+    return stitch_metric_data(responses)
+
+
+def query_compact_metric_data(
+    client: Any,
+    queries_factory: Callable[[int], List[Dict]],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+    period: Optional[int] = None,
+    max_datapoints: int = 1440,
+    high_resolution: bool = False,
+) -> Optional[List[TimedMetric]]:
+    """
+    Query the metric data into compact timed metrics, without keeping the
+    response
+
+    The compact counterpart of `query_metric_data`, see `get_compact_metric_data`.
+
+    Args:
+        client (Any): the CloudWatch client
+        queries_factory (Callable[[int], List[Dict]]): a function that returns
+            the metric data queries for the given period
+        start_time (datetime.datetime): the start of the time range
+        end_time (datetime.datetime): the end of the time range
+        period (Optional[int]): the period of the metric, planned if not provided
+        max_datapoints (int): the datapoints budget per metric, used to plan
+            the period
+        high_resolution (bool): whether the metric is a high resolution metric
+
+    Returns:
+        Optional[List[TimedMetric]]: the compact timed metric of each query
+            returning data, with the newest datapoints first
+    """
+    windows = _query_windows(
+        get_compact_metric_data,
+        client=client,
+        queries_factory=queries_factory,
+        start_time=start_time,
+        end_time=end_time,
+        period=period,
+        max_datapoints=max_datapoints,
+        high_resolution=high_resolution,
+    )
+    if windows is None:
+        return None
+    if len(windows) == 1:
+        return windows[0]
+    return stitch_compact_metric_data(windows)
+
+
 class MetricWatcher(CloudWatcher):
     """
     A class for AWS CloudWatch metric retrieval and parsing
@@ -38,6 +595,12 @@ class MetricWatcher(CloudWatcher):
         aws_secret_access_key: Optional[str] = None,
         aws_session_token: Optional[str] = None,
         aws_region_name: Optional[str] = None,
+        client: Optional[Any] = None,
+        expressions: Optional[List[MetricExpression]] = None,
+        return_data: bool = True,
+        store: Optional[MetricStore] = None,
+        handler_workers: int = 1,
+        handler_executor: Optional[str] = None,
     ) -> None:
         """
         Initialize MetricWatcher
@@ -45,42 +608,186 @@ class MetricWatcher(CloudWatcher):
         Args:
             namespace (str): the namespace of the metric
             dimensions_list (List[Dimension]): the dimensions of the metric
-            metric_name (str): the name of the metric
+            metric_name (str): the name of the metric. If None, only the
+                expressions are queried
             metric_id (str): the ID of the metric
             metric_unit (Optional[str]): the unit of the metric
             aws_access_key_id (Optional[str]): the AWS access key ID
             aws_secret_access_key (Optional[str]): the AWS secret access key
             aws_session_token (Optional[str]): the AWS session token
             aws_region_name (Optional[str]): the AWS region name
+            client (Optional[Any]): an existing CloudWatch client to reuse
+            expressions (Optional[List[MetricExpression]]): the metric math or
+                SEARCH expressions to query along with the metric
+            return_data (bool): whether to return the metric data, set to False
+                if the metric is only used in the expressions
+            store (Optional[MetricStore]): the local store the queried datapoints
+                are written to and the offline queries are read from
+            handler_workers (int): the maximum number of timed metrics handled
+                in parallel, e.g. saved or plotted, 1 to handle them serially
+            handler_executor (Optional[str]): where the timed metrics are handled,
+                `serial`, `thread` or `process`. By default where each handler
+                prefers, a process pool for the plots and a thread pool for
+                the files. The console tables are always printed serially
         """
+        if handler_workers < 1:
+            raise ValueError(f"Invalid number of handler workers: {handler_workers}")
+        if handler_executor is not None and handler_executor not in HANDLER_EXECUTORS:
+            raise ValueError(
+                f"Invalid handler executor: {handler_executor}. "
+                f"Must be one of: {HANDLER_EXECUTORS}"
+            )
         super().__init__(
             service_name="cloudwatch",
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
             aws_region_name=aws_region_name,
+            client=client,
         )
         self.namespace = namespace
         self.dimensions_list = dimensions_list
         self.metric_name = metric_name
         self.metric_id = metric_id
         self.metric_unit = metric_unit
-        self.ec2_resource = boto3.resource(
-            service_name="ec2",
-            region_name=self.aws_region_name,
+        self.expressions = expressions or []
+        self.return_data = return_data
+        self.store = store
+        self.handler_workers = handler_workers
+        self.handler_executor = handler_executor
+        self._aws_credentials = dict(
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
         )
+        self._ec2_resource = None
         self.metric_description = metric_description
 
+    @property
+    def ec2_resource(self) -> Any:
+        """
+        Get the EC2 resource, created on the first use
+
+        Returns:
+            Any: the EC2 resource
+        """
+        if self._ec2_resource is None:
+            self._ec2_resource = boto3.resource(
+                service_name="ec2",
+                region_name=self.aws_region_name,
+                config=NO_RETRIES_CONFIG,
+                **self._aws_credentials,
+            )
+            self.governor.attach(self._ec2_resource.meta.client)
+            self.instrumentation.attach(self._ec2_resource.meta.client)
+        return self._ec2_resource
+
+    @property
+    def query_ids(self) -> List[str]:
+        """
+        Get the IDs of the metric data results produced by the queries
+
+        Returns:
+            List[str]: the IDs of the metric data results
+        """
+        return [self.metric_id] + [expression.id for expression in self.expressions]
+
+    def stat_query_ids(self, stat: Union[str, List[str]]) -> Dict[str, str]:
+        """
+        Get the IDs of the metric queries for the statistics
+
+        The first statistic is queried with the metric ID, the other ones with
+        the metric ID suffixed with the statistic name, e.g. `mem_used_p99`.
+
+        Args:
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+
+        Returns:
+            Dict[str, str]: the statistics keyed by the query IDs
+        """
+        stats = _stats(stat)
+        query_ids = {self.metric_id: stats[0]}
+        for other_stat in stats[1:]:
+            query_id = self.metric_id + "_" + re.sub(r"\W", "_", other_stat.lower())
+            if query_id in query_ids or query_id in self.query_ids:
+                raise ValueError(
+                    f"Query ID '{query_id}' of the '{other_stat}' statistic is "
+                    f"not unique"
+                )
+            query_ids[query_id] = other_stat
+        return query_ids
+
+    def result_unit(self, result_id: Optional[str]) -> Optional[str]:
+        """
+        Get the unit of the metric data result
+
+        Args:
+            result_id (Optional[str]): the ID of the metric data result
+
+        Returns:
+            Optional[str]: the unit of the result, the expressions results
+                have no unit unless it is specified in the expression
+        """
+        for expression in self.expressions:
+            if expression.id == result_id:
+                return expression.unit
+        return self.metric_unit
+
+    def metric_data_queries(
+        self, stat: Union[str, List[str]], period: int
+    ) -> List[Dict]:
+        """
+        Build the metric data queries for the metric and its expressions
+
+        Multiple statistics are queried with sibling queries, labeled with
+        the metric name and the statistic, e.g. `mem_used p99`.
+
+        Args:
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query, including the extended statistics, e.g. `p99`
+            period (int): the period of the metric
+
+        Returns:
+            List[Dict]: the metric data queries
+        """
+        queries = [expression.to_query() for expression in self.expressions]
+        if self.metric_name is None:
+            return queries
+        stat_query_ids = self.stat_query_ids(stat)
+        metric_queries = []
+        for query_id, query_stat in stat_query_ids.items():
+            metric_query = {
+                "Id": query_id,
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": self.namespace,
+                        "MetricName": self.metric_name,
+                        "Dimensions": [dim.dict() for dim in self.dimensions_list],
+                    },
+                    "Stat": query_stat,
+                    "Unit": str(
+                        self.metric_unit
+                    ),  # str(None) is desired, if no unit is specified
+                    "Period": period,
+                },
+            }
+            if len(stat_query_ids) > 1:
+                metric_query["Label"] = f"{self.metric_name} {query_stat}"
+            if not self.return_data:
+                metric_query["ReturnData"] = False
+            metric_queries.append(metric_query)
+        return metric_queries + queries
+
     def query_ec2_metrics(
         self,
         days: int,
         hours: int,
         minutes: int,
-        stat: str,
-        period: int,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
     ) -> Optional[Dict]:
         """
         Query EC2 metrics
@@ -92,68 +799,260 @@ class MetricWatcher(CloudWatcher):
                 the metric collection start time
             minutes (int): how many minutes to subtract from the current time to
                 determine the metric collection start time
-            stat (str): the statistic to query
-            period (int): the period of the metric
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metric, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metric is a high resolution metric
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
 
         Returns:
             Dict: the response from the query, check the structure of the
             response [here](https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudwatch.html#CloudWatch.Client.get_metric_data) # noqa: E501
         """
-        if self.namespace is None:
-            raise ValueError(f"Invalid metric namespace to watch: {self.namespace}")
-        # Create CloudWatch client
         now = datetime.datetime.now(pytz.utc)
-        start_time = now - datetime.timedelta(days=days, hours=hours, minutes=minutes)
+        return self.query_metrics(
+            start_time=now
+            - datetime.timedelta(days=days, hours=hours, minutes=minutes),
+            end_time=now,
+            stat=stat,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
+            offline=offline,
+        )
 
-        def _time(x: datetime.datetime):
-            """
-            Format a datetime object for logging
+    def query_metrics(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
+    ) -> Optional[Dict]:
+        """
+        Query the metric in the time range
 
-            Args:
-                x (datetime.datetime): the datetime object to format
-            """
-            return x.strftime("%Y-%m-%d %H:%M:%S")
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metric, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metric is a high resolution metric
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
 
+        Returns:
+            Dict: the response from the query, check the structure of the
+            response [here](https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudwatch.html#CloudWatch.Client.get_metric_data) # noqa: E501
+        """
+        if self.namespace is None and self.metric_name is not None:
+            raise ValueError(f"Invalid metric namespace to watch: {self.namespace}")
+        if offline:
+            return self.query_stored_metrics(
+                start_time=start_time, end_time=end_time, stat=stat, period=period
+            )
         _LOGGER.info(
-            f"Querying '{self.metric_name}' for dimensions {self.dimensions_list} "
-            f"from {_time(start_time)} to {_time(now)}"
+            f"Querying '{self.metric_name or self.metric_id}' "
+            f"for dimensions {self.dimensions_list} "
+            f"from {_time(start_time)} to {_time(end_time)}"
         )
-
-        response = self.client.get_metric_data(
-            MetricDataQueries=[
-                {
-                    "Id": self.metric_id,
-                    "MetricStat": {
-                        "Metric": {
-                            "Namespace": self.namespace,
-                            "MetricName": self.metric_name,
-                            "Dimensions": [dim.dict() for dim in self.dimensions_list],
-                        },
-                        "Stat": stat,
-                        "Unit": str(
-                            self.metric_unit
-                        ),  # str(None) is desired, if no unit is specified
-                        "Period": period,
-                    },
-                },
-            ],
-            StartTime=start_time,
-            EndTime=now,
+        response = query_metric_data(
+            client=self.client,
+            queries_factory=lambda p: self.metric_data_queries(stat=stat, period=p),
+            start_time=start_time,
+            end_time=end_time,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
         )
-        resp_status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if resp_status != 200:
-            _LOGGER.error(f"Invalid response status code: {resp_status}")
-            return None
-        _LOGGER.debug(f"Response status code: {resp_status}")
+        if response is not None and self.store is not None:
+            self.store_response(response)
         return response
 
+    def query_metric_series(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
+    ) -> Optional[List[TimedMetric]]:
+        """
+        Query the metric in the time range into compact timed metrics
+
+        Unlike `query_metrics`, the response is not kept: each page is parsed
+        into arrays as soon as it is received, see `get_compact_metric_data`.
+
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metric, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metric is a high resolution metric
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
+
+        Returns:
+            Optional[List[TimedMetric]]: the timed metric of each result, with
+                the timestamps as `EpochTimestamps` and the values as arrays
+        """
+        if self.namespace is None and self.metric_name is not None:
+            raise ValueError(f"Invalid metric namespace to watch: {self.namespace}")
+        if offline:
+            results = self.query_stored_metrics(
+                start_time=start_time, end_time=end_time, stat=stat, period=period
+            )["MetricDataResults"]
+            return [compact_timed_metric(result) for result in results]
+        _LOGGER.info(
+            f"Querying '{self.metric_name or self.metric_id}' "
+            f"for dimensions {self.dimensions_list} "
+            f"from {_time(start_time)} to {_time(end_time)}"
+        )
+        series = query_compact_metric_data(
+            client=self.client,
+            queries_factory=lambda p: self.metric_data_queries(stat=stat, period=p),
+            start_time=start_time,
+            end_time=end_time,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
+        )
+        if series is not None and self.store is not None:
+            for timed_metric in series:
+                self.store.write(self.metric_samples(timed_metric))
+        return series
+
+    def query_stored_metrics(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: Union[str, List[str]],
+        period: Optional[int] = None,
+    ) -> Dict:
+        """
+        Read the metric in the time range from the local store
+
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+            period (Optional[int]): the period to downsample the stored
+                datapoints to, the stored datapoints are returned if not provided
+
+        Returns:
+            Dict: the response in the structure of the `get_metric_data`
+                response, with an empty result for each series not stored
+        """
+        if self.store is None:
+            raise ValueError("No metric store to read the metrics from")
+        _LOGGER.info(
+            f"Reading '{self.metric_name or self.metric_id}' "
+            f"for dimensions {self.dimensions_list} "
+            f"from {_time(start_time)} to {_time(end_time)} from {self.store}"
+        )
+        stat_query_ids = (
+            self.stat_query_ids(stat)
+            if self.metric_name is not None and self.return_data
+            else {}
+        )
+        series = list(stat_query_ids.items()) + [
+            (expression.id, None)
+            for expression in self.expressions
+            if expression.return_data
+        ]
+        dimensions = {dim.Name: dim.Value for dim in self.dimensions_list}
+        results = []
+        for query_id, query_stat in series:
+            result = self.store.read(
+                namespace=self.namespace,
+                metric_name=self.metric_name,
+                metric_id=query_id,
+                stat=query_stat,
+                dimensions=dimensions,
+                start_time=start_time,
+                end_time=end_time,
+                period=period,
+            )
+            if result is None:
+                _LOGGER.warning(f"No stored datapoints for '{query_id}'")
+                result = {
+                    "Id": query_id,
+                    "Label": query_id,
+                    "Timestamps": [],
+                    "Values": [],
+                    "StatusCode": "Complete",
+                    "Stat": query_stat,
+                }
+            results.append(result)
+        return {"MetricDataResults": results, "Messages": []}
+
+    def metric_samples(self, timed_metric: TimedMetric) -> List[MetricSample]:
+        """
+        Convert the timed metric of a result of this metric into samples
+
+        Args:
+            timed_metric (TimedMetric): the timed metric to convert
+
+        Returns:
+            List[MetricSample]: the samples, in the order of the datapoints
+        """
+        dimensions = {dim.Name: dim.Value for dim in self.dimensions_list}
+        unit = self.result_unit(timed_metric.id)
+        return [
+            MetricSample(
+                timestamp=timestamp,
+                value=value,
+                namespace=self.namespace,
+                metric_name=self.metric_name,
+                metric_id=timed_metric.id,
+                label=timed_metric.label,
+                stat=timed_metric.stat,
+                unit=unit,
+                dimensions=dimensions,
+            )
+            for timestamp, value in zip(timed_metric.timestamps, timed_metric.values)
+        ]
+
+    def store_response(self, response: Dict) -> int:
+        """
+        Write the datapoints of the response to the local store
+
+        Args:
+            response (Dict): the response from the query
+
+        Returns:
+            int: the number of datapoints written
+        """
+        if self.store is None:
+            raise ValueError("No metric store to write the metrics to")
+        samples = [
+            sample
+            for timed_metric in self.timed_metric_factory(response)
+            for sample in self.metric_samples(timed_metric)
+        ]
+        self.store.write(samples)
+        return len(samples)
+
     def get_ec2_uptime(
         self,
         ec2_instance_id: str,
         days: int,
         hours: int,
         minutes: int,
-        period: int = 60,
+        period: Optional[int] = None,
     ) -> Optional[float]:
         """
         Get the runtime of an EC2 instance
@@ -166,6 +1065,8 @@ class MetricWatcher(CloudWatcher):
                  the metric collection start time
             minutes (int): how many minutes to subtract from the current time to
                 determine the metric collection start time
+            period (Optional[int]): the period of the metric, if not provided
+                the finest period retained is used for each part of the time range
 
         Returns:
             float: the runtime of the EC2 instance in minutes
@@ -185,22 +1086,17 @@ class MetricWatcher(CloudWatcher):
                 hours=hours,
                 minutes=minutes,
                 stat="Maximum",  # any stat works
-                period=period,  # most precise period that AWS stores for instances
-                # where start time is between 3 hours and 15 days ago is 60 seconds
+                period=period,
+                max_datapoints=MAX_DATAPOINTS_PER_REQUEST,
             )
             if metrics_response is None:
                 return None
-            # extract the latest metric report time
+            # the time between the earliest and the latest metric reports
             timed_metrics = self.timed_metric_factory(metrics_response)
-            try:
-                earliest_metric_report_time = timed_metrics[-1].timestamps[0]
-                latest_metric_report_time = timed_metrics[-1].timestamps[-1]
-                return (
-                    earliest_metric_report_time - latest_metric_report_time
-                ).total_seconds()
-            except IndexError:
+            if not timed_metrics or not timed_metrics[-1].timestamps:
                 _LOGGER.warning(f"No metric data found for EC2: {ec2_instance_id}")
                 return None
+            return timed_metrics[-1].timespan.total_seconds()
         instances = self.ec2_resource.instances.filter(
             Filters=[{"Name": "instance-id", "Values": [ec2_instance_id]}]
         )
@@ -253,6 +1149,8 @@ class MetricWatcher(CloudWatcher):
                 label=metric_data_result["Label"],
                 timestamps=metric_data_result["Timestamps"],
                 values=metric_data_result["Values"],
+                id=metric_data_result.get("Id"),
+                stat=metric_data_result.get("Stat"),
             )
             for metric_data_result in response["MetricDataResults"]
         ]
@@ -281,12 +1179,177 @@ class MetricWatcher(CloudWatcher):
                 raise ValueError("Either response or query_kwargs must be provided")
         if response is None:
             return None
-        timed_metrics = self.timed_metric_factory(response)
-        for timed_metric in timed_metrics:
-            if len(timed_metric.values) < 1:
-                continue
-            handler = handler_class(timed_metric=timed_metric)
-            handler(**kwargs)
+        timed_metrics = [
+            timed_metric
+            for timed_metric in self.timed_metric_factory(response)
+            if len(timed_metric.values) > 0
+        ]
+        jobs = [
+            (timed_metric, self._handler_kwargs(timed_metric, kwargs))
+            for timed_metric in timed_metrics
+        ]
+        pool = self._handler_pool(handler_class, len(jobs))
+        if pool is None:
+            for timed_metric, handler_kwargs in jobs:
+                handler = handler_class(timed_metric=timed_metric)
+                with self.instrumentation.timer(handler_class.__name__):
+                    handler(**handler_kwargs)
+            return None
+        self._exec_timed_metric_handler_pool(handler_class, jobs, pool)
+
+    def _handler_kwargs(self, timed_metric: TimedMetric, kwargs: Dict) -> Dict:
+        """
+        Get the kwargs to pass to a handler for a timed metric
+
+        Args:
+            timed_metric (TimedMetric): the timed metric to handle
+            kwargs (Dict): the kwargs of the handler
+
+        Returns:
+            Dict: the kwargs, with the unit and the target of the timed metric
+        """
+        handler_kwargs = dict(kwargs)
+        if "metric_unit" in handler_kwargs:
+            handler_kwargs["metric_unit"] = self.result_unit(timed_metric.id)
+        target = handler_kwargs.get("target")
+        if (
+            target is not None
+            and timed_metric.id is not None
+            and timed_metric.id != self.metric_id
+        ):
+            # results other than the metric itself, e.g. the expressions
+            # results, are saved next to the metric result
+            root, ext = os.path.splitext(target)
+            handler_kwargs["target"] = f"{root}_{timed_metric.id}{ext}"
+        return handler_kwargs
+
+    def handle_series(
+        self,
+        series: List[TimedMetric],
+        handlers: List[Tuple[Type, Dict[str, Any]]],
+        transform: Optional[Callable[[TimedMetric], TimedMetric]] = None,
+    ) -> None:
+        """
+        Run the handlers over the timed metrics in small batches, releasing them
+
+        The timed metrics are removed from the list a batch of `handler_workers`
+        at a time, and each batch is handled by all the handlers, on the pool of
+        the handler, before the next one. So at most a batch is held besides the
+        list, and the memory used shrinks as the series are handled.
+
+        Args:
+            series (List[TimedMetric]): the timed metrics, e.g. from
+                `query_metric_series`. The list is emptied
+            handlers (List[Tuple[Type, Dict[str, Any]]]): the TimedMetricHandlers
+                to execute and the kwargs to pass to each of them
+            transform (Optional[Callable[[TimedMetric], TimedMetric]]): a function
+                applied to each timed metric before it is handled, e.g. to
+                resample it
+        """
+        series.reverse()
+        while series:
+            batch = []
+            while series and len(batch) < self.handler_workers:
+                timed_metric = series.pop()
+                if transform is not None:
+                    timed_metric = transform(timed_metric)
+                if len(timed_metric.values) > 0:
+                    batch.append(timed_metric)
+                del timed_metric
+            for handler_class, kwargs in handlers:
+                jobs = [
+                    (timed_metric, self._handler_kwargs(timed_metric, kwargs))
+                    for timed_metric in batch
+                ]
+                pool = self._handler_pool(handler_class, len(jobs))
+                if pool is None:
+                    for timed_metric, handler_kwargs in jobs:
+                        handler = handler_class(timed_metric=timed_metric)
+                        with self.instrumentation.timer(handler_class.__name__):
+                            handler(**handler_kwargs)
+                        del handler
+                else:
+                    self._exec_timed_metric_handler_pool(handler_class, jobs, pool)
+                del jobs
+            del batch
+
+    def _handler_pool(self, handler_class: Type, count: int) -> Optional[str]:
+        """
+        Get the pool to handle the timed metrics on, None to handle them serially
+
+        Args:
+            handler_class (TimedMetricHandler): the TimedMetricHandler to execute
+            count (int): the number of timed metrics to handle
+
+        Returns:
+            Optional[str]: the pool, `thread` or `process`
+        """
+        if self.handler_workers < 2 or count < 2 or handler_class.executor == "serial":
+            return None
+        executor = self.handler_executor or handler_class.executor
+        return None if executor == "serial" else executor
+
+    def _exec_timed_metric_handler_pool(
+        self, handler_class: Type, jobs: List[Tuple[TimedMetric, Dict]], pool: str
+    ) -> None:
+        """
+        Internal method to execute a TimedMetricHandler on a pool
+
+        The records logged by the handler are emitted in the order of the timed
+        metrics, and the failures are raised together once all the timed metrics
+        are handled.
+
+        Args:
+            handler_class (TimedMetricHandler): the TimedMetricHandler to execute
+            jobs (List[Tuple[TimedMetric, Dict]]): the timed metrics and the
+                kwargs to pass to the handler for each of them
+            pool (str): the pool, `thread` or `process`
+        """
+        executor_class = (
+            ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+        )
+        log_level = (
+            logging.getLogger(handler_class.__module__).getEffectiveLevel()
+            if pool == "process"
+            else None
+        )
+        _LOGGER.debug(
+            f"Executing '{handler_class.__name__}' for {len(jobs)} timed metrics "
+            f"on a {pool} pool of {self.handler_workers} workers"
+        )
+        errors = []
+        with executor_class(
+            max_workers=min(self.handler_workers, len(jobs))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_timed_metric_handler,
+                    handler_class,
+                    timed_metric,
+                    handler_kwargs,
+                    log_level,
+                )
+                for timed_metric, handler_kwargs in jobs
+            ]
+            for (timed_metric, _), future in zip(jobs, futures):
+                try:
+                    records, duration, error = future.result()
+                except Exception as e:
+                    # e.g. a worker process died or the result is not picklable
+                    records, duration, error = [], 0.0, e
+                for record in records:
+                    logging.getLogger(record.name).handle(record)
+                self.instrumentation.record_handler(
+                    handler_class.__name__, duration, error=error is not None
+                )
+                if error is not None:
+                    _LOGGER.error(
+                        f"'{handler_class.__name__}' failed for "
+                        f"'{timed_metric.label}': {error!r}"
+                    )
+                    errors.append((timed_metric.label, error))
+        if errors:
+            raise TimedMetricHandlerError(handler_class.__name__, errors)
 
     def _exec_response_handler(
         self,
@@ -312,10 +1375,11 @@ class MetricWatcher(CloudWatcher):
             else:
                 raise ValueError("Either response or query_kwargs must be provided")
         handler = handler_class(response=response)
-        if kwargs is None:
-            handler()
-        else:
-            handler(**kwargs)
+        with self.instrumentation.timer(handler_class.__name__):
+            if kwargs is None:
+                handler()
+            else:
+                handler(**kwargs)
 
     def save_metric_json(
         self,
@@ -359,6 +1423,31 @@ class MetricWatcher(CloudWatcher):
             query_kwargs=query_kwargs,
         )
 
+    def save_metric_binary(
+        self,
+        file_path: str,
+        response: Optional[Dict] = None,
+        query_kwargs: Optional[Dict] = None,
+    ):
+        """
+        Query and save the metric data to a binary series file
+
+        The file can be memory-mapped back into a `TimedMetric` with
+        `cloudwatcher.series_file.read_series`.
+
+        Args:
+            file_path (str): the file path to save the metric data to
+            response (Optional[Dict]): the response from the query
+            query_kwargs (Optional[str]): the query preset to use for the query
+        """
+        self._exec_timed_metric_handler(
+            TimedMetricBinarySaver,
+            target=file_path,
+            metric_unit=self.metric_unit,
+            response=response,
+            query_kwargs=query_kwargs,
+        )
+
     def log_metric(self, response: Optional[Dict] = None):
         """
         Query and log the metric data
@@ -442,3 +1531,348 @@ class MetricWatcher(CloudWatcher):
             target=None,
             response=response,
         )
+
+
+class MetricBundleWatcher(CloudWatcher):
+    """
+    A class for AWS CloudWatch retrieval of multiple metrics in batched requests
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        dimensions_list: List[Dimension],
+        metrics: List[MetricWatcherSetup],
+        bundle_description: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        aws_region_name: Optional[str] = None,
+        client: Optional[Any] = None,
+        store: Optional[MetricStore] = None,
+        handler_workers: int = 1,
+        handler_executor: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize MetricBundleWatcher
+
+        Args:
+            namespace (str): the namespace of the metrics
+            dimensions_list (List[Dimension]): the dimensions shared by the metrics
+            metrics (List[MetricWatcherSetup]): the setups of the metrics
+            bundle_description (Optional[str]): the description of the bundle
+            aws_access_key_id (Optional[str]): the AWS access key ID
+            aws_secret_access_key (Optional[str]): the AWS secret access key
+            aws_session_token (Optional[str]): the AWS session token
+            aws_region_name (Optional[str]): the AWS region name
+            client (Optional[Any]): an existing CloudWatch client to reuse
+            store (Optional[MetricStore]): the local store the queried datapoints
+                are written to and the offline queries are read from
+            handler_workers (int): the maximum number of timed metrics of each
+                metric handled in parallel
+            handler_executor (Optional[str]): where the timed metrics are
+                handled, `serial`, `thread` or `process`, see `MetricWatcher`
+        """
+        super().__init__(
+            service_name="cloudwatch",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            aws_region_name=aws_region_name,
+            client=client,
+        )
+        self.namespace = namespace
+        self.dimensions_list = dimensions_list
+        self.store = store
+        self.bundle_description = bundle_description
+        self.watchers: Dict[str, MetricWatcher] = {}
+        for metric_setup in metrics:
+            setup_dict = dict(metric_setup.to_dict())
+            setup_dict.update(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                aws_session_token=aws_session_token,
+                aws_region_name=self.aws_region_name,
+            )
+            self.watchers[metric_setup.metric_id] = MetricWatcher(
+                **setup_dict,
+                client=self.client,
+                store=store,
+                handler_workers=handler_workers,
+                handler_executor=handler_executor,
+            )
+        self._query_id_owners = {
+            query_id: watcher
+            for watcher in self.watchers.values()
+            for query_id in watcher.query_ids
+        }
+
+    def __repr__(self) -> str:
+        return f"MetricBundleWatcher({list(self.watchers)})"
+
+    def query_ec2_metrics(
+        self,
+        days: int,
+        hours: int,
+        minutes: int,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
+    ) -> Optional[Dict]:
+        """
+        Query all the metrics in the bundle in a single batched request
+
+        Args:
+            days (int): how many days to subtract from the current date to determine
+                the metric collection start time
+            hours (int): how many hours to subtract from the current time to determine
+                the metric collection start time
+            minutes (int): how many minutes to subtract from the current time to
+                determine the metric collection start time
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metrics, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metrics are high resolution metrics
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
+
+        Returns:
+            Dict: the response from the query, with the results of all the metrics
+        """
+        now = datetime.datetime.now(pytz.utc)
+        return self.query_metrics(
+            start_time=now
+            - datetime.timedelta(days=days, hours=hours, minutes=minutes),
+            end_time=now,
+            stat=stat,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
+            offline=offline,
+        )
+
+    def query_metrics(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
+    ) -> Optional[Dict]:
+        """
+        Query all the metrics in the bundle in the time range in a single batched
+        request
+
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metrics, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metrics are high resolution metrics
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
+
+        Returns:
+            Dict: the response from the query, with the results of all the metrics
+        """
+        if self.namespace is None:
+            raise ValueError(f"Invalid metric namespace to watch: {self.namespace}")
+        _LOGGER.info(
+            f"Querying {len(self.watchers)} metrics "
+            f"({', '.join(w.metric_name for w in self.watchers.values())}) "
+            f"for dimensions {self.dimensions_list} "
+            f"from {_time(start_time)} to {_time(end_time)}"
+        )
+        self._register_query_ids(stat)
+
+        if offline:
+            return {
+                "MetricDataResults": [
+                    result
+                    for watcher in self.watchers.values()
+                    for result in watcher.query_stored_metrics(
+                        start_time=start_time,
+                        end_time=end_time,
+                        stat=stat,
+                        period=period,
+                    )["MetricDataResults"]
+                ],
+                "Messages": [],
+            }
+
+        def _queries(p: int) -> List[Dict]:
+            return [
+                query
+                for watcher in self.watchers.values()
+                for query in watcher.metric_data_queries(stat=stat, period=p)
+            ]
+
+        response = query_metric_data(
+            client=self.client,
+            queries_factory=_queries,
+            start_time=start_time,
+            end_time=end_time,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
+        )
+        if response is not None and self.store is not None:
+            for watcher, watcher_response in self.route_response(response).values():
+                watcher.store_response(watcher_response)
+        return response
+
+    def _register_query_ids(self, stat: Union[str, List[str]]) -> None:
+        """
+        Register the owners of the query IDs of the statistics
+
+        Args:
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+        """
+        for watcher in self.watchers.values():
+            for query_id in watcher.stat_query_ids(stat):
+                owner = self._query_id_owners.setdefault(query_id, watcher)
+                if owner is not watcher:
+                    raise ValueError(
+                        f"Query ID '{query_id}' of '{watcher.metric_id}' "
+                        f"clashes with '{owner.metric_id}'"
+                    )
+
+    def query_metric_series(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        stat: Union[str, List[str]],
+        period: Optional[int],
+        max_datapoints: int = 1440,
+        high_resolution: bool = False,
+        offline: bool = False,
+    ) -> Optional[List[TimedMetric]]:
+        """
+        Query all the metrics in the bundle in the time range into compact
+        timed metrics, in a single batched request
+
+        See `MetricWatcher.query_metric_series`, the timed metrics are split
+        by metric with `route_series`.
+
+        Args:
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            stat (Union[str, List[str]]): a statistic or a list of statistics
+                to query in a single request
+            period (Optional[int]): the period of the metrics, if not provided
+                the period is planned automatically
+            max_datapoints (int): the datapoints budget used to plan the period
+            high_resolution (bool): whether the metrics are high resolution metrics
+            offline (bool): whether to read the datapoints from the local store
+                instead of querying CloudWatch
+
+        Returns:
+            Optional[List[TimedMetric]]: the timed metrics of all the metrics
+        """
+        if self.namespace is None:
+            raise ValueError(f"Invalid metric namespace to watch: {self.namespace}")
+        self._register_query_ids(stat)
+        if offline:
+            return [
+                timed_metric
+                for watcher in self.watchers.values()
+                for timed_metric in watcher.query_metric_series(
+                    start_time=start_time,
+                    end_time=end_time,
+                    stat=stat,
+                    period=period,
+                    offline=True,
+                )
+            ]
+        _LOGGER.info(
+            f"Querying {len(self.watchers)} metrics "
+            f"({', '.join(w.metric_name for w in self.watchers.values())}) "
+            f"for dimensions {self.dimensions_list} "
+            f"from {_time(start_time)} to {_time(end_time)}"
+        )
+
+        def _queries(p: int) -> List[Dict]:
+            return [
+                query
+                for watcher in self.watchers.values()
+                for query in watcher.metric_data_queries(stat=stat, period=p)
+            ]
+
+        series = query_compact_metric_data(
+            client=self.client,
+            queries_factory=_queries,
+            start_time=start_time,
+            end_time=end_time,
+            period=period,
+            max_datapoints=max_datapoints,
+            high_resolution=high_resolution,
+        )
+        if series is not None and self.store is not None:
+            for watcher, watcher_series in self.route_series(series).values():
+                for timed_metric in watcher_series:
+                    watcher.store.write(watcher.metric_samples(timed_metric))
+        return series
+
+    def route_response(self, response: Dict) -> Dict[str, Tuple[MetricWatcher, Dict]]:
+        """
+        Split the bundle response into the responses of the individual metrics
+
+        Args:
+            response (Dict): the response from the bundle query
+
+        Returns:
+            Dict[str, Tuple[MetricWatcher, Dict]]: the metric watchers and their
+                responses keyed by the metric ID
+        """
+        routed: Dict[str, Tuple[MetricWatcher, Dict]] = {
+            metric_id: (
+                watcher,
+                {
+                    "MetricDataResults": [],
+                    "Messages": response.get("Messages", []),
+                    "ResponseMetadata": response.get("ResponseMetadata", {}),
+                },
+            )
+            for metric_id, watcher in self.watchers.items()
+        }
+        for result in response["MetricDataResults"]:
+            owner = self._query_id_owners.get(result["Id"])
+            if owner is None:
+                _LOGGER.warning(f"Unexpected metric data result: {result['Id']}")
+                continue
+            routed[owner.metric_id][1]["MetricDataResults"].append(result)
+        return routed
+
+    def route_series(
+        self, series: List[TimedMetric]
+    ) -> Dict[str, Tuple[MetricWatcher, List[TimedMetric]]]:
+        """
+        Split the timed metrics of the bundle into the timed metrics of the
+        individual metrics
+
+        Args:
+            series (List[TimedMetric]): the timed metrics from the bundle query
+
+        Returns:
+            Dict[str, Tuple[MetricWatcher, List[TimedMetric]]]: the metric watchers
+                and their timed metrics keyed by the metric ID
+        """
+        routed: Dict[str, Tuple[MetricWatcher, List[TimedMetric]]] = {
+            metric_id: (watcher, []) for metric_id, watcher in self.watchers.items()
+        }
+        for timed_metric in series:
+            owner = self._query_id_owners.get(timed_metric.id)
+            if owner is None:
+                _LOGGER.warning(f"Unexpected metric data result: {timed_metric.id}")
+                continue
+            routed[owner.metric_id][1].append(timed_metric)
+        return routed
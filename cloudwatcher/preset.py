@@ -1,16 +1,22 @@
 import argparse
+import copy
 import json
 import logging
 import os
-from dataclasses import dataclass
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from rich.table import Table
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_PRESETS_DIR = Path(__file__).parent / "presets"
+
 
 class PresetFilesInventory:
     def __init__(self, presets_dir: Optional[Union[Path, str]] = None) -> None:
@@ -24,9 +30,7 @@ class PresetFilesInventory:
             ValueError: If the presets directory does not exist
         """
         preset_dir = (
-            Path(presets_dir)
-            if presets_dir is not None
-            else Path(__file__).parent / "presets"
+            Path(presets_dir) if presets_dir is not None else DEFAULT_PRESETS_DIR
         )
         if not preset_dir.exists():
             raise ValueError(f"Presets directory {preset_dir} does not exist")
@@ -122,7 +126,7 @@ class Dimension(BaseModel):
 
     def __repr__(self):
         return self.__str__()
-    
+
     @classmethod
     def from_cli(cls, cli_arg: str):
         """
@@ -137,6 +141,60 @@ class Dimension(BaseModel):
         return cls(Name=name, Value=value)
 
 
+QUERY_ID_REGEX = re.compile(r"^[a-z][a-zA-Z0-9_]*$")
+
+
+class MetricExpression(BaseModel):
+    """
+    A class for AWS CloudWatch metric math or search expression
+
+    The expression can reference the IDs of the other queries in the same request.
+    See the [syntax](https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/using-metric-math.html) # noqa: E501
+
+    Args:
+        id (str): The ID of the expression result
+        expression (str): The metric math or SEARCH expression
+        label (Optional[str]): The label of the expression result
+        unit (Optional[str]): The unit of the expression result
+        period (Optional[int]): The granularity of the expression result
+        return_data (bool): Whether to return the expression result
+    """
+
+    id: str
+    expression: str
+    label: Optional[str] = None
+    unit: Optional[str] = None
+    period: Optional[int] = None
+    return_data: bool = True
+
+    @validator("id")
+    def _valid_id(cls, value: str) -> str:
+        if not QUERY_ID_REGEX.match(value):
+            raise ValueError(
+                f"Invalid expression ID: {value}. "
+                "Must be of the form '^[a-z][a-zA-Z0-9_]*$'"
+            )
+        return value
+
+    def to_query(self) -> Dict:
+        """
+        Convert the expression to a metric data query
+
+        Returns:
+            Dict: The metric data query
+        """
+        query: Dict = {
+            "Id": self.id,
+            "Expression": self.expression,
+            "ReturnData": self.return_data,
+        }
+        if self.label is not None:
+            query["Label"] = self.label
+        if self.period is not None:
+            query["Period"] = self.period
+        return query
+
+
 @dataclass
 class MetricWatcherSetup:
     """
@@ -153,8 +211,16 @@ class MetricWatcherSetup:
     aws_session_token: Optional[str] = None
     aws_region_name: Optional[str] = None
     metric_description: Optional[str] = None
+    expressions: List[MetricExpression] = field(default_factory=list)
+    return_data: bool = True
 
     def __post_init__(self):
+        self.expressions = [
+            expression
+            if isinstance(expression, MetricExpression)
+            else MetricExpression(**expression)
+            for expression in self.expressions
+        ]
         self.aws_access_key_id = self.aws_access_key_id or os.environ.get(
             "AWS_ACCESS_KEY_ID"
         )
@@ -168,7 +234,8 @@ class MetricWatcherSetup:
             "AWS_DEFAULT_REGION"
         )
         self.dimensions_list = [
-            Dimension(**dimension) for dimension in self.dimensions_list
+            dimension if isinstance(dimension, Dimension) else Dimension(**dimension)
+            for dimension in self.dimensions_list
         ]
 
     @classmethod
@@ -193,6 +260,19 @@ class MetricWatcherSetup:
             data = json.load(f)
         return cls.from_dict(data)
 
+    def copy(self) -> "MetricWatcherSetup":
+        """
+        Create a copy of the MetricWatcherSetup object that can be modified
+        without affecting the original one
+
+        Returns:
+            MetricWatcherSetup: The copy of the object
+        """
+        setup = copy.copy(self)
+        setup.dimensions_list = [dimension.copy() for dimension in self.dimensions_list]
+        setup.expressions = list(self.expressions)
+        return setup
+
     def to_dict(self) -> dict:
         """
         Convert the MetricWatcherSetup object to a dictionary
@@ -221,32 +301,400 @@ class MetricWatcherSetup:
                 self.dimensions_list.append(Dimension(Name=name, Value=value))
 
 
+@dataclass
+class MetricBundleSetup:
+    """
+    A class for the setup of the MetricBundleWatcher
+
+    A bundle lists multiple metrics that share the namespace and dimensions.
+    Each metric can extend or override the shared dimensions.
+    """
+
+    namespace: str
+    dimensions_list: List[Dimension]
+    metrics: List[MetricWatcherSetup]
+    bundle_description: Optional[str] = None
+    aws_access_key_id: Optional[str] = None
+    aws_secret_access_key: Optional[str] = None
+    aws_session_token: Optional[str] = None
+    aws_region_name: Optional[str] = None
+
+    def __post_init__(self):
+        self.dimensions_list = [
+            dimension if isinstance(dimension, Dimension) else Dimension(**dimension)
+            for dimension in self.dimensions_list
+        ]
+        self.metrics = [
+            metric if isinstance(metric, MetricWatcherSetup) else self._member(metric)
+            for metric in self.metrics
+        ]
+        self.aws_access_key_id = self.aws_access_key_id or os.environ.get(
+            "AWS_ACCESS_KEY_ID"
+        )
+        self.aws_secret_access_key = self.aws_secret_access_key or os.environ.get(
+            "AWS_SECRET_ACCESS_KEY"
+        )
+        self.aws_session_token = self.aws_session_token or os.environ.get(
+            "AWS_SESSION_TOKEN"
+        )
+        self.aws_region_name = self.aws_region_name or os.environ.get(
+            "AWS_DEFAULT_REGION"
+        )
+        query_ids = [
+            query_id
+            for metric in self.metrics
+            for query_id in [metric.metric_id]
+            + [expression.id for expression in metric.expressions]
+        ]
+        duplicated = {i for i in query_ids if query_ids.count(i) > 1}
+        if duplicated:
+            raise ValueError(
+                f"Metric and expression IDs in a bundle must be unique, "
+                f"duplicated: {duplicated}"
+            )
+
+    def _member(self, data: dict) -> MetricWatcherSetup:
+        """
+        Create the setup of a bundle metric, with the shared namespace and dimensions
+
+        Args:
+            data (dict): The metric specification
+
+        Returns:
+            MetricWatcherSetup: The setup of the metric
+        """
+        data = dict(data)
+        dimensions = {dim.Name: dim.copy() for dim in self.dimensions_list}
+        for dimension in data.pop("dimensions_list", []):
+            dimension = Dimension(**dimension)
+            dimensions[dimension.Name] = dimension
+        data.setdefault("namespace", self.namespace)
+        data.setdefault("metric_unit", None)
+        return MetricWatcherSetup(dimensions_list=list(dimensions.values()), **data)
+
+    @staticmethod
+    def is_bundle(data: dict) -> bool:
+        """
+        Check if the preset data describes a bundle
+
+        Args:
+            data (dict): The preset data
+
+        Returns:
+            bool: True if the preset data describes a bundle
+        """
+        return "metrics" in data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MetricBundleSetup":
+        """
+        Create a MetricBundleSetup object from a dictionary
+
+        Args:
+            data (dict): The dictionary to use
+        """
+        return cls(**data)
+
+    @classmethod
+    def from_json(cls, file_path: Path) -> "MetricBundleSetup":
+        """
+        Create a MetricBundleSetup object from a JSON file
+
+        Args:
+            file_path (str): The path to the JSON file
+        """
+        with open(file_path) as f:
+            data = json.load(f)
+        return cls.from_dict(data)
+
+    def copy(self) -> "MetricBundleSetup":
+        """
+        Create a copy of the MetricBundleSetup object that can be modified
+        without affecting the original one
+
+        Returns:
+            MetricBundleSetup: The copy of the object
+        """
+        setup = copy.copy(self)
+        setup.dimensions_list = [dimension.copy() for dimension in self.dimensions_list]
+        setup.metrics = [metric.copy() for metric in self.metrics]
+        return setup
+
+    def to_dict(self) -> dict:
+        """
+        Convert the MetricBundleSetup object to a dictionary
+
+        Returns:
+            dict: The dictionary representation of the object
+        """
+        return self.__dict__
+
+    def upsert_dimensions(self, dimensions_specs: Optional[List[str]] = None):
+        """
+        Upsert the shared dimensions list and the dimensions lists of all the metrics
+        with the dimensions specified in the environment
+
+        Args:
+            dimensions_specs (List[str]): A list of strings. Format: "Name:Value"
+        """
+        if dimensions_specs is None:
+            return
+        for dimension_spec in dimensions_specs:
+            name, value = dimension_spec.split(":")
+            for dimension in self.dimensions_list:
+                if dimension.Name == name:
+                    dimension.Value = value
+                    break
+            else:
+                self.dimensions_list.append(Dimension(Name=name, Value=value))
+        for metric in self.metrics:
+            metric.upsert_dimensions(dimensions_specs)
+
+
+def load_preset(file_path: Path) -> Union[MetricWatcherSetup, MetricBundleSetup]:
+    """
+    Load a single metric or a bundle preset from a JSON file
+
+    Args:
+        file_path (Path): The path to the JSON file
+
+    Returns:
+        Union[MetricWatcherSetup, MetricBundleSetup]: The preset
+    """
+    with open(file_path) as f:
+        data = json.load(f)
+    if MetricBundleSetup.is_bundle(data):
+        return MetricBundleSetup.from_dict(data)
+    return MetricWatcherSetup.from_dict(data)
+
+
+Preset = Union[MetricWatcherSetup, MetricBundleSetup]
+
+
+class PresetRegistry:
+    """
+    An in-memory registry of the validated presets
+
+    The presets are loaded from the search paths once and cached by name.
+    A preset is reloaded only if its file modification time changes and the
+    search paths are rescanned only if their modification time changes.
+    The registry hands out copies of the cached presets, so they can be
+    modified freely.
+    """
+
+    def __init__(
+        self, search_paths: Optional[Iterable[Union[Path, str]]] = None
+    ) -> None:
+        """
+        Initialize the preset registry
+
+        Args:
+            search_paths (Optional[Iterable[Union[Path, str]]]): The directories to
+                look for the presets in. If a preset with the same name is found
+                in multiple directories, the first one is used. Defaults to the
+                built-in presets directory.
+
+        Raises:
+            ValueError: If any of the search paths does not exist
+        """
+        paths = [Path(p) for p in search_paths] if search_paths else []
+        self._search_paths = paths or [DEFAULT_PRESETS_DIR]
+        for path in self._search_paths:
+            if not path.exists():
+                raise ValueError(f"Presets directory {path} does not exist")
+        _LOGGER.debug(f"Presets search paths: {self._search_paths}")
+        self._lock = threading.Lock()
+        self._dirs_mtimes: Dict[Path, int] = {}
+        self._presets: Dict[str, Path] = {}
+        self._cache: Dict[Path, Tuple[int, Preset]] = {}
+
+    @property
+    def search_paths(self) -> List[Path]:
+        """
+        Get the presets search paths
+
+        Returns:
+            List[Path]: The presets search paths
+        """
+        return self._search_paths
+
+    def _scan(self) -> Dict[str, Path]:
+        """
+        Rescan the search paths if any of them changed
+
+        Returns:
+            Dict[str, Path]: The available presets
+        """
+        mtimes = {path: os.stat(path).st_mtime_ns for path in self._search_paths}
+        if mtimes != self._dirs_mtimes:
+            presets: Dict[str, Path] = {}
+            for path in reversed(self._search_paths):
+                presets.update(
+                    {
+                        preset_file.stem: preset_file
+                        for preset_file in path.iterdir()
+                        if preset_file.is_file() and preset_file.suffix == ".json"
+                    }
+                )
+            self._presets = presets
+            self._dirs_mtimes = mtimes
+        return self._presets
+
+    @property
+    def presets(self) -> Dict[str, Path]:
+        """
+        Get the available presets
+
+        Returns:
+            Dict[str, Path]: The available presets
+        """
+        with self._lock:
+            return dict(self._scan())
+
+    @property
+    def presets_list(self) -> List[str]:
+        """
+        Get the list of available presets
+
+        Returns:
+            List[str]: The list of available presets
+        """
+        return list(self.presets.keys())
+
+    @property
+    def presets_table(self) -> Table:
+        """
+        Get a rich table with the available presets
+
+        Returns:
+            Table: The rich table
+        """
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Name")
+        table.add_column("Path", style="dim")
+        for preset_name, preset_path in self.presets.items():
+            table.add_row(preset_name, preset_path.as_posix())
+        table.title = "Presets available in: " + ", ".join(
+            path.as_posix() for path in self.search_paths
+        )
+        return table
+
+    def get_preset_path(self, preset_name: str) -> Path:
+        """
+        Get the preset file path
+
+        Args:
+            preset_name (str): The name of the preset
+
+        Returns:
+            Path: the path to the preset file
+
+        Raises:
+            ValueError: If the preset is not found
+        """
+        with self._lock:
+            presets = self._scan()
+            if preset_name in presets:
+                return presets[preset_name]
+        raise ValueError(
+            f"Preset {preset_name} not found. Available presets: "
+            f"{', '.join(presets.keys())}"
+        )
+
+    def load(self, preset_path: Union[Path, str]) -> "Preset":
+        """
+        Load the preset file, using the cached preset if the file did not change
+
+        Args:
+            preset_path (Union[Path, str]): The path to the preset file
+
+        Returns:
+            Preset: A copy of the preset
+        """
+        preset_path = Path(os.path.abspath(preset_path))
+        mtime = os.stat(preset_path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(preset_path)
+            if cached is None or cached[0] != mtime:
+                _LOGGER.debug(f"Loading preset: {preset_path}")
+                cached = self._cache[preset_path] = (mtime, load_preset(preset_path))
+        return cached[1].copy()
+
+    def get(self, preset_name: str) -> "Preset":
+        """
+        Get the preset by name
+
+        Args:
+            preset_name (str): The name of the preset
+
+        Returns:
+            Preset: A copy of the preset
+        """
+        return self.load(self.get_preset_path(preset_name))
+
+
+@lru_cache(maxsize=None)
+def _get_preset_registry(search_paths: Tuple[Path, ...]) -> PresetRegistry:
+    return PresetRegistry(search_paths)
+
+
+def get_preset_registry(
+    search_paths: Optional[Union[Path, str, Iterable[Union[Path, str]]]] = None
+) -> PresetRegistry:
+    """
+    Get the shared preset registry for the search paths
+
+    Args:
+        search_paths (Optional[Union[Path, str, Iterable[Union[Path, str]]]]): The
+            directory or directories to look for the presets in. Defaults to the
+            built-in presets directory.
+
+    Returns:
+        PresetRegistry: The preset registry
+    """
+    if search_paths is None:
+        paths: Tuple[Path, ...] = (DEFAULT_PRESETS_DIR,)
+    elif isinstance(search_paths, (str, Path)):
+        paths = (Path(search_paths),)
+    else:
+        paths = tuple(Path(p) for p in search_paths) or (DEFAULT_PRESETS_DIR,)
+    return _get_preset_registry(tuple(p.resolve() for p in paths))
+
+
 def get_metric_watcher_setup(
-    namespace: argparse.Namespace, presets_dir: Path
-) -> MetricWatcherSetup:
+    namespace: argparse.Namespace,
+    presets_dir: Optional[Union[Path, str, Iterable[Union[Path, str]]]] = None,
+) -> Preset:
     """
-    Get a MetricWatcherSetup object from a preset
+    Get a MetricWatcherSetup object, or a MetricBundleSetup object for bundle
+    presets, from a preset
 
     Args:
         namespace (argparse.Namespace): The namespace to use
-        logger (Logger): The logger to use. Defaults to None
-        presets_dir (Path): The path to the presets directory
+        presets_dir (Optional[Union[Path, str, Iterable[Union[Path, str]]]]): The
+            path or paths to the presets directories
 
     Returns:
-        MetricWatcherSetup: The MetricWatcherSetup object
+        Preset: The MetricWatcherSetup or MetricBundleSetup object
     """
 
     if namespace.preset_name is not None or namespace.preset_path is not None:
+        presets_registry = get_preset_registry(presets_dir)
         if namespace.preset_path is not None:
             preset_path = Path(namespace.preset_path)
         else:
-            presets_inventory = PresetFilesInventory(presets_dir)
-            preset_path = presets_inventory.get_preset_path(namespace.preset_name)
+            preset_path = presets_registry.get_preset_path(namespace.preset_name)
         _LOGGER.info(f"Using preset: {preset_path}")
-        mw_setup = MetricWatcherSetup.from_json(preset_path)
-        mw_setup.namespace = namespace.namespace or mw_setup.namespace
-        mw_setup.metric_name = namespace.metric or mw_setup.metric_name
-        mw_setup.metric_id = namespace.id or mw_setup.metric_id
+        mw_setup = presets_registry.load(preset_path)
+        if isinstance(mw_setup, MetricBundleSetup):
+            if namespace.namespace:
+                mw_setup.namespace = namespace.namespace
+                for metric_setup in mw_setup.metrics:
+                    metric_setup.namespace = namespace.namespace
+        else:
+            mw_setup.namespace = namespace.namespace or mw_setup.namespace
+            mw_setup.metric_name = namespace.metric or mw_setup.metric_name
+            mw_setup.metric_id = namespace.id or mw_setup.metric_id
     else:
         mw_setup = MetricWatcherSetup(
             namespace=namespace.namespace,
@@ -256,5 +704,5 @@ def get_metric_watcher_setup(
             dimensions_list=[],
         )
     mw_setup.upsert_dimensions(namespace.dimensions)
-    _LOGGER.debug(f"MetricWatcherSetup: {mw_setup}")
+    _LOGGER.debug(f"{mw_setup.__class__.__name__}: {mw_setup}")
     return mw_setup
@@ -0,0 +1,184 @@
+import datetime
+import logging
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import pytz
+
+_LOGGER = logging.getLogger(__name__)
+
+# (maximum data age, finest period available) pairs, see:
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/APIReference/API_GetMetricStatistics.html # noqa: E501
+RETENTION_TIERS: List[Tuple[datetime.timedelta, int]] = [
+    (datetime.timedelta(hours=3), 1),
+    (datetime.timedelta(days=15), 60),
+    (datetime.timedelta(days=63), 300),
+    (datetime.timedelta(days=455), 3600),
+]
+HIGH_RESOLUTION_PERIODS = [1, 5, 10, 30]
+# maximum number of datapoints returned by a single GetMetricData call
+MAX_DATAPOINTS_PER_REQUEST = 100800
+
+
+@dataclass
+class QueryWindow:
+    """
+    A time window to query with a fixed period
+
+    Args:
+        start_time (datetime.datetime): The start of the window
+        end_time (datetime.datetime): The end of the window
+        period (int): The period to query the window with, in seconds
+    """
+
+    start_time: datetime.datetime
+    end_time: datetime.datetime
+    period: int
+
+    @property
+    def datapoints(self) -> int:
+        """
+        Get the maximum number of datapoints in the window
+
+        Returns:
+            int: The maximum number of datapoints
+        """
+        return math.ceil(
+            (self.end_time - self.start_time).total_seconds() / self.period
+        )
+
+
+def round_period(seconds: float, high_resolution: bool = False) -> int:
+    """
+    Round the number of seconds up to the closest valid period
+
+    Args:
+        seconds (float): The number of seconds
+        high_resolution (bool): Whether the sub-minute periods are allowed
+
+    Returns:
+        int: The period, one of 1, 5, 10, 30 (high resolution only) or
+            a multiple of 60
+    """
+    if high_resolution:
+        for period in HIGH_RESOLUTION_PERIODS:
+            if seconds <= period:
+                return period
+    return max(60, 60 * math.ceil(seconds / 60))
+
+
+def retention_period(
+    start_time: datetime.datetime,
+    now: Optional[datetime.datetime] = None,
+    high_resolution: bool = False,
+) -> int:
+    """
+    Get the finest period available for the data starting at the given time
+
+    Args:
+        start_time (datetime.datetime): The start of the data
+        now (Optional[datetime.datetime]): The current time
+        high_resolution (bool): Whether the metric is a high resolution metric
+
+    Returns:
+        int: The finest period available, in seconds
+    """
+    now = now or datetime.datetime.now(pytz.utc)
+    age = now - start_time
+    for max_age, period in RETENTION_TIERS:
+        if age <= max_age and (high_resolution or period >= 60):
+            return period
+    return RETENTION_TIERS[-1][1]
+
+
+def _floor_time(time: datetime.datetime, period: int) -> datetime.datetime:
+    """
+    Round the time down to a multiple of the period since the epoch
+    """
+    epoch = time.timestamp()
+    return time - datetime.timedelta(seconds=epoch - period * (epoch // period))
+
+
+def plan_query_windows(
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+    max_datapoints: int = 1440,
+    high_resolution: bool = False,
+    now: Optional[datetime.datetime] = None,
+    max_window_datapoints: int = MAX_DATAPOINTS_PER_REQUEST,
+) -> List[QueryWindow]:
+    """
+    Plan the query windows for the time range
+
+    The period is the finest one that keeps the number of datapoints within the
+    budget, but not finer than the data retention allows. The time range is split
+    at the retention tiers boundaries, so that the recent data is queried at the
+    finest resolution available, and into windows of at most
+    `max_window_datapoints` datapoints, so that each window can be queried
+    separately.
+
+    Args:
+        start_time (datetime.datetime): The start of the time range
+        end_time (datetime.datetime): The end of the time range
+        max_datapoints (int): The datapoints budget for the whole time range
+        high_resolution (bool): Whether the metric is a high resolution metric
+        now (Optional[datetime.datetime]): The current time
+        max_window_datapoints (int): The maximum number of datapoints in a window
+
+    Returns:
+        List[QueryWindow]: The query windows, oldest first
+    """
+    if end_time <= start_time:
+        raise ValueError(f"Invalid time range: {start_time} - {end_time}")
+    if max_datapoints < 1:
+        raise ValueError(f"Invalid datapoints budget: {max_datapoints}")
+    now = now or datetime.datetime.now(pytz.utc)
+    budget_period = round_period(
+        (end_time - start_time).total_seconds() / max_datapoints, high_resolution
+    )
+    tiers = [
+        (max_age, max(tier_period, budget_period))
+        for max_age, tier_period in RETENTION_TIERS
+        if high_resolution or tier_period >= 60
+    ]
+    # split the time range at the retention tiers boundaries, newest first
+    windows: List[QueryWindow] = []
+    window_end = end_time
+    for i, (max_age, period) in enumerate(tiers):
+        older_period = tiers[i + 1][1] if i + 1 < len(tiers) else period
+        window_start = max(start_time, now - max_age)
+        if window_start > start_time:
+            # align the boundary to the coarser period, so that the datapoints
+            # of the adjacent windows do not overlap
+            window_start = min(
+                _floor_time(window_start, older_period)
+                + datetime.timedelta(seconds=older_period),
+                window_end,
+            )
+        if window_start >= window_end:
+            continue
+        if windows and windows[-1].period == period:
+            windows[-1].start_time = window_start
+        else:
+            windows.append(QueryWindow(window_start, window_end, period))
+        window_end = window_start
+        if window_end <= start_time:
+            break
+    if window_end > start_time:
+        period = tiers[-1][1]
+        if windows and windows[-1].period == period:
+            windows[-1].start_time = start_time
+        else:
+            windows.append(QueryWindow(start_time, window_end, period))
+    # split the windows that exceed the datapoints limit of a single request
+    planned: List[QueryWindow] = []
+    for window in reversed(windows):
+        span = datetime.timedelta(seconds=window.period * max_window_datapoints)
+        chunk_start = window.start_time
+        while chunk_start < window.end_time:
+            chunk_end = min(chunk_start + span, window.end_time)
+            planned.append(QueryWindow(chunk_start, chunk_end, window.period))
+            chunk_start = chunk_end
+    _LOGGER.debug(f"Planned query windows: {planned}")
+    return planned
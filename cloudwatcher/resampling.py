@@ -0,0 +1,364 @@
+import datetime
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+import numpy as np
+import pytz
+
+AGGREGATIONS = ["min", "max", "mean", "sum", "first", "last", "count"]
+FILL_METHODS = ["nan", "previous", "linear"]
+# the aggregations preserving the meaning of the statistics, the percentiles and
+# the other statistics are aggregated to their maximum, an upper bound
+STAT_AGGREGATIONS = {
+    "Minimum": "min",
+    "Maximum": "max",
+    "Average": "mean",
+    "Sum": "sum",
+    "SampleCount": "sum",
+}
+
+Fill = Optional[Union[float, str]]
+
+
+def stat_aggregation(stat: Optional[str]) -> str:
+    """
+    Get the aggregation preserving the meaning of the statistic
+
+    Args:
+        stat (Optional[str]): the statistic, e.g. `Maximum` or `p99`
+
+    Returns:
+        str: the aggregation, `max` for the percentiles and the unknown statistics
+    """
+    return STAT_AGGREGATIONS.get(stat, "max")
+
+
+class EpochTimestamps(Sequence[datetime.datetime]):
+    """
+    Read-only sequence of UTC timestamps backed by an array of epoch seconds
+
+    The timestamps are created on access, so the array, e.g. memory-mapped
+    from a file, is not copied, and the vectorized functions of this module
+    use the array directly.
+    """
+
+    def __init__(self, epochs: np.ndarray) -> None:
+        """
+        Initialize the sequence
+
+        Args:
+            epochs (np.ndarray): the seconds since the epoch
+        """
+        self.epochs = epochs
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    @overload
+    def __getitem__(self, index: int) -> datetime.datetime:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "EpochTimestamps":
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return EpochTimestamps(self.epochs[index])
+        return datetime.datetime.fromtimestamp(float(self.epochs[index]), pytz.utc)
+
+    def __iter__(self) -> Iterator[datetime.datetime]:
+        # created one at a time, not as a list of all the timestamps
+        return (
+            datetime.datetime.fromtimestamp(epoch, pytz.utc) for epoch in self.epochs
+        )
+
+    def __repr__(self) -> str:
+        return f"EpochTimestamps({len(self)} timestamps)"
+
+
+def to_epoch(timestamps: Sequence[datetime.datetime]) -> np.ndarray:
+    """
+    Convert the timestamps to seconds since the epoch
+
+    Args:
+        timestamps (Sequence[datetime.datetime]): the timezone aware timestamps
+
+    Returns:
+        np.ndarray: the timestamps, as floats
+    """
+    if isinstance(timestamps, EpochTimestamps):
+        return np.asarray(timestamps.epochs, dtype=np.float64)
+    return np.fromiter(
+        (timestamp.timestamp() for timestamp in timestamps),
+        dtype=np.float64,
+        count=len(timestamps),
+    )
+
+
+def from_epoch(epochs: np.ndarray) -> List[datetime.datetime]:
+    """
+    Convert the seconds since the epoch to UTC timestamps
+
+    Args:
+        epochs (np.ndarray): the seconds since the epoch
+
+    Returns:
+        List[datetime.datetime]: the timestamps
+    """
+    return [datetime.datetime.fromtimestamp(epoch, pytz.utc) for epoch in epochs]
+
+
+def _aggregate(
+    epochs: np.ndarray, buckets: np.ndarray, values: np.ndarray, how: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate the values of each bucket
+
+    Args:
+        epochs (np.ndarray): the timestamps of the values
+        buckets (np.ndarray): the bucket index of each value
+        values (np.ndarray): the values
+        how (str): the aggregation
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the non-empty buckets, in ascending order,
+            and their aggregates
+    """
+    # sorted in time, so that the first and last values are the oldest and newest
+    order = np.argsort(epochs, kind="stable")
+    buckets, values = buckets[order], values[order]
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    counts = np.diff(np.append(starts, len(values)))
+    if how == "min":
+        aggregates = np.minimum.reduceat(values, starts)
+    elif how == "max":
+        aggregates = np.maximum.reduceat(values, starts)
+    elif how == "sum":
+        aggregates = np.add.reduceat(values, starts)
+    elif how == "mean":
+        aggregates = np.add.reduceat(values, starts) / counts
+    elif how == "first":
+        aggregates = values[starts]
+    elif how == "last":
+        aggregates = values[starts + counts - 1]
+    elif how == "count":
+        aggregates = counts.astype(np.float64)
+    else:
+        raise ValueError(f"Invalid aggregation: {how}. Must be one of: {AGGREGATIONS}")
+    return buckets[starts], aggregates
+
+
+def _fill(values: np.ndarray, fill: Fill) -> np.ndarray:
+    """
+    Fill the empty buckets, marked with NaN
+
+    Args:
+        values (np.ndarray): the aggregates on the full grid
+        fill (Fill): a constant, `nan` to keep the gaps, `previous` to propagate
+            the last aggregate or `linear` to interpolate between the aggregates
+
+    Returns:
+        np.ndarray: the filled aggregates
+    """
+    missing = np.isnan(values)
+    if fill == "nan" or not missing.any():
+        return values
+    if fill == "previous":
+        positions = np.where(missing, 0, np.arange(len(values)))
+        np.maximum.accumulate(positions, out=positions)
+        return values[positions]
+    if fill == "linear":
+        present = np.flatnonzero(~missing)
+        return np.interp(np.arange(len(values)), present, values[present])
+    if isinstance(fill, str):
+        raise ValueError(f"Invalid fill method: {fill}. Must be one of: {FILL_METHODS}")
+    return np.where(missing, float(fill), values)
+
+
+def resample(
+    epochs: np.ndarray,
+    values: np.ndarray,
+    period: int,
+    how: str = "mean",
+    fill: Fill = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resample a series to buckets of the period, aligned to the epoch
+
+    Args:
+        epochs (np.ndarray): the timestamps, in seconds since the epoch,
+            in any order
+        values (np.ndarray): the values
+        period (int): the bucket size, in seconds
+        how (str): the aggregation of the values of each bucket
+        fill (Fill): how to fill the empty buckets between `start` and `end`,
+            see `_fill`. The empty buckets are dropped if not provided
+        start (Optional[float]): the start of the grid, defaults to the first
+            timestamp. Only used with `fill`
+        end (Optional[float]): the end of the grid, exclusive, defaults to the
+            bucket after the last timestamp. Only used with `fill`
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the bucket start timestamps, in ascending
+            order, and their values
+    """
+    if period <= 0:
+        raise ValueError(f"Invalid period: {period}")
+    epochs = np.asarray(epochs, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(epochs) != len(values):
+        raise ValueError("The timestamps and values lengths are not equal")
+    buckets = np.floor_divide(epochs, period).astype(np.int64)
+    if fill is None:
+        if not len(values):
+            return epochs, values
+        buckets, aggregates = _aggregate(epochs, buckets, values, how)
+        return buckets.astype(np.float64) * period, aggregates
+    first = int(start // period) if start is not None else None
+    last = int(-(-end // period)) if end is not None else None
+    if not len(values) and (first is None or last is None):
+        return epochs, values
+    first = buckets.min() if first is None else first
+    last = buckets.max() + 1 if last is None else last
+    grid = np.full(max(last - first, 0), np.nan)
+    inside = (buckets >= first) & (buckets < last)
+    if inside.any():
+        present, aggregates = _aggregate(
+            epochs[inside], buckets[inside], values[inside], how
+        )
+        grid[present - first] = aggregates
+    if grid.size and not np.isnan(grid).all():
+        grid = _fill(grid, fill)
+    return np.arange(first, last, dtype=np.float64) * period, grid
+
+
+@dataclass
+class AlignedSeries:
+    """
+    Series resampled on a common time grid
+
+    Args:
+        timestamps (List[datetime.datetime]): The bucket start timestamps,
+            in ascending order
+        labels (List[str]): The labels of the series
+        values (np.ndarray): The values, one row per series and one column
+            per timestamp
+    """
+
+    timestamps: List[datetime.datetime]
+    labels: List[str]
+    values: np.ndarray
+
+    def to_dict(self) -> Dict[str, List]:
+        """
+        Convert the aligned series to columns
+
+        Returns:
+            Dict[str, List]: the timestamps and the values of each series,
+                keyed by the label, with None for the missing values
+        """
+        columns: Dict[str, List] = {"timestamp": self.timestamps}
+        for label, row in zip(self.labels, self.values):
+            columns[label] = [None if np.isnan(v) else float(v) for v in row]
+        return columns
+
+
+def align(
+    series: List[Tuple[str, Sequence[datetime.datetime], Sequence[float]]],
+    period: int,
+    how: Union[str, List[str]] = "mean",
+    fill: Fill = "nan",
+) -> AlignedSeries:
+    """
+    Resample multiple series on a common time grid
+
+    The grid spans all the series, the buckets without datapoints are filled
+    according to `fill`.
+
+    Args:
+        series (List[Tuple[str, Sequence[datetime.datetime], Sequence[float]]]):
+            the labels, timestamps and values of the series
+        period (int): the bucket size, in seconds
+        how (Union[str, List[str]]): the aggregation, or one per series
+        fill (Fill): how to fill the empty buckets, see `_fill`
+
+    Returns:
+        AlignedSeries: the aligned series
+    """
+    if fill is None:
+        raise ValueError("The empty buckets of the aligned series must be filled")
+    hows = [how] * len(series) if isinstance(how, str) else how
+    if len(hows) != len(series):
+        raise ValueError("One aggregation per series is required")
+    epochs = [to_epoch(timestamps) for _, timestamps, _ in series]
+    nonempty = [e for e in epochs if len(e)]
+    if not nonempty:
+        return AlignedSeries(
+            timestamps=[],
+            labels=[label for label, _, _ in series],
+            values=np.empty((len(series), 0)),
+        )
+    start = min(e.min() for e in nonempty)
+    end = max(e.max() for e in nonempty) // period * period + period
+    rows = []
+    grid = None
+    for (_, _, values), series_epochs, series_how in zip(series, epochs, hows):
+        grid, row = resample(
+            series_epochs,
+            np.asarray(values, dtype=np.float64),
+            period=period,
+            how=series_how,
+            fill=fill,
+            start=start,
+            end=end,
+        )
+        rows.append(row)
+    return AlignedSeries(
+        timestamps=from_epoch(grid),
+        labels=[label for label, _, _ in series],
+        values=np.vstack(rows),
+    )
+
+
+def resample_response(
+    response: Dict,
+    period: int,
+    how: Optional[str] = None,
+    fill: Fill = None,
+) -> Dict:
+    """
+    Resample the results of a `get_metric_data` response
+
+    Args:
+        response (Dict): the response
+        period (int): the bucket size, in seconds
+        how (Optional[str]): the aggregation, defaults to the aggregation
+            matching the statistic of each result
+        fill (Fill): how to fill the empty buckets, see `_fill`. The empty
+            buckets are dropped if not provided
+
+    Returns:
+        Dict: a copy of the response with the resampled results, with the
+            newest datapoints first
+    """
+    results = []
+    for result in response["MetricDataResults"]:
+        epochs, values = resample(
+            to_epoch(result["Timestamps"]),
+            np.asarray(result["Values"], dtype=np.float64),
+            period=period,
+            how=how or stat_aggregation(result.get("Stat")),
+            fill=fill,
+        )
+        keep = ~np.isnan(values)
+        results.append(
+            dict(
+                result,
+                Timestamps=from_epoch(epochs[keep][::-1]),
+                Values=values[keep][::-1].tolist(),
+            )
+        )
+    return dict(response, MetricDataResults=results)
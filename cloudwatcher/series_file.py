@@ -0,0 +1,228 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pytz
+
+from cloudwatcher.metric_handlers import TimedMetric, TimedMetricHandler
+from cloudwatcher.resampling import EpochTimestamps, to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+SERIES_FILE_EXTENSION = ".cws"
+SERIES_FILE_MAGIC = b"CWSERIES"
+SERIES_FILE_VERSION = 1
+# magic, version, reserved, metadata length, datapoints count,
+# earliest and latest timestamps
+_HEADER = struct.Struct("<8sHHIQqq")
+_TIMESTAMPS_DTYPE = np.dtype("<i8")
+_VALUES_DTYPE = np.dtype("<f8")
+
+
+@dataclass
+class SeriesHeader:
+    """
+    The header of a binary series file
+
+    Args:
+        label (str): The label of the metric
+        id (Optional[str]): The ID of the metric data query
+        stat (Optional[str]): The statistic of the metric data query
+        unit (Optional[str]): The unit of the metric
+        datapoints (int): The number of datapoints
+        earliest (Optional[datetime.datetime]): The oldest datapoint timestamp
+        latest (Optional[datetime.datetime]): The newest datapoint timestamp
+        data_offset (int): The offset of the timestamps array in the file
+    """
+
+    label: str
+    id: Optional[str]
+    stat: Optional[str]
+    unit: Optional[str]
+    datapoints: int
+    earliest: Optional[datetime.datetime]
+    latest: Optional[datetime.datetime]
+    data_offset: int
+
+
+def _aligned(offset: int) -> int:
+    """
+    Round the offset up to the alignment of the arrays
+    """
+    return -(-offset // _TIMESTAMPS_DTYPE.itemsize) * _TIMESTAMPS_DTYPE.itemsize
+
+
+def write_series(
+    file_path: str, timed_metric: TimedMetric, unit: Optional[str] = None
+) -> None:
+    """
+    Write a timed metric to a binary series file
+
+    The file holds a fixed size header, the JSON metadata, and the timestamps
+    and values arrays, as little-endian 64-bit integer seconds since the epoch
+    and 64-bit floats, in the order of the timed metric.
+
+    Args:
+        file_path (str): the path of the file to write
+        timed_metric (TimedMetric): the timed metric
+        unit (Optional[str]): the unit of the metric
+    """
+    epochs = to_epoch(timed_metric.timestamps).astype(_TIMESTAMPS_DTYPE)
+    values = np.asarray(timed_metric.values, dtype=_VALUES_DTYPE)
+    if len(epochs) != len(values):
+        raise ValueError("The internal timed metric lengths are not equal")
+    metadata = json.dumps(
+        {
+            "label": timed_metric.label,
+            "id": timed_metric.id,
+            "stat": timed_metric.stat,
+            "unit": unit,
+        }
+    ).encode()
+    header = _HEADER.pack(
+        SERIES_FILE_MAGIC,
+        SERIES_FILE_VERSION,
+        0,
+        len(metadata),
+        len(epochs),
+        int(epochs.min()) if len(epochs) else 0,
+        int(epochs.max()) if len(epochs) else 0,
+    )
+    padding = _aligned(len(header) + len(metadata)) - len(header) - len(metadata)
+    with open(file_path, "wb") as f:
+        f.write(header)
+        f.write(metadata)
+        f.write(b"\0" * padding)
+        f.write(epochs.tobytes())
+        f.write(values.tobytes())
+    _LOGGER.info(f"Saved '{timed_metric.label}' data to: {file_path}")
+
+
+def read_header(file_path: str) -> SeriesHeader:
+    """
+    Read the header of a binary series file, without reading the datapoints
+
+    Args:
+        file_path (str): the path of the file
+
+    Returns:
+        SeriesHeader: the header
+    """
+    with open(file_path, "rb") as f:
+        fixed = f.read(_HEADER.size)
+        if len(fixed) < _HEADER.size:
+            raise ValueError(f"Not a binary series file: {file_path}")
+        magic, version, _, metadata_length, count, earliest, latest = _HEADER.unpack(
+            fixed
+        )
+        if magic != SERIES_FILE_MAGIC:
+            raise ValueError(f"Not a binary series file: {file_path}")
+        if version != SERIES_FILE_VERSION:
+            raise ValueError(
+                f"Unsupported binary series file version {version}: {file_path}"
+            )
+        metadata = json.loads(f.read(metadata_length))
+    return SeriesHeader(
+        label=metadata["label"],
+        id=metadata.get("id"),
+        stat=metadata.get("stat"),
+        unit=metadata.get("unit"),
+        datapoints=count,
+        earliest=datetime.datetime.fromtimestamp(earliest, pytz.utc) if count else None,
+        latest=datetime.datetime.fromtimestamp(latest, pytz.utc) if count else None,
+        data_offset=_aligned(_HEADER.size + metadata_length),
+    )
+
+
+def map_series(file_path: str) -> Tuple[SeriesHeader, np.ndarray, np.ndarray]:
+    """
+    Memory-map the arrays of a binary series file
+
+    Args:
+        file_path (str): the path of the file
+
+    Returns:
+        Tuple[SeriesHeader, np.ndarray, np.ndarray]: the header, and the
+            read-only timestamps, in seconds since the epoch, and values arrays
+    """
+    header = read_header(file_path)
+    if not header.datapoints:
+        return (
+            header,
+            np.empty(0, dtype=_TIMESTAMPS_DTYPE),
+            np.empty(0, dtype=_VALUES_DTYPE),
+        )
+    expected = header.data_offset + header.datapoints * (
+        _TIMESTAMPS_DTYPE.itemsize + _VALUES_DTYPE.itemsize
+    )
+    if os.path.getsize(file_path) < expected:
+        raise ValueError(f"Truncated binary series file: {file_path}")
+    data = np.memmap(
+        file_path,
+        dtype=np.uint8,
+        mode="r",
+        offset=header.data_offset,
+        shape=(expected - header.data_offset,),
+    )
+    split = header.datapoints * _TIMESTAMPS_DTYPE.itemsize
+    epochs = data[:split].view(_TIMESTAMPS_DTYPE)
+    values = data[split:].view(_VALUES_DTYPE)
+    return header, epochs, values
+
+
+def read_series(file_path: str) -> TimedMetric:
+    """
+    Load a timed metric from a binary series file, without copying the datapoints
+
+    The timestamps and values are views of the memory-mapped file, only the
+    parts that are accessed are read from the disk.
+
+    Args:
+        file_path (str): the path of the file
+
+    Returns:
+        TimedMetric: the timed metric, with the timestamps as `EpochTimestamps`
+            and the values as a read-only array
+    """
+    header, epochs, values = map_series(file_path)
+    return TimedMetric(
+        label=header.label,
+        timestamps=EpochTimestamps(epochs),
+        values=values,
+        id=header.id,
+        stat=header.stat,
+    )
+
+
+def iter_series(directory: str) -> Iterator[Tuple[str, TimedMetric]]:
+    """
+    Load the binary series files of a directory
+
+    Args:
+        directory (str): the directory to look for the files in
+
+    Yields:
+        Tuple[str, TimedMetric]: the path of each file and its timed metric
+    """
+    for file_path in sorted(
+        glob.glob(os.path.join(directory, f"*{SERIES_FILE_EXTENSION}"))
+    ):
+        yield file_path, read_series(file_path)
+
+
+class TimedMetricBinarySaver(TimedMetricHandler):
+    def __call__(self, target: str, metric_unit: Optional[str] = None) -> None:
+        """
+        Write the object to a binary series file
+
+        Args:
+            target (str): The target file to save the object to
+            metric_unit (Optional[str]): The unit of the metric
+        """
+        write_series(target, self.timed_metric, unit=metric_unit)
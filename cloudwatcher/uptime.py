@@ -0,0 +1,428 @@
+import csv
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional
+
+import boto3
+import pytz
+from rich.table import Table
+
+from cloudwatcher.cloudwatcher import CloudWatcher
+from cloudwatcher.fleet import FleetWatcher
+from cloudwatcher.governor import NO_RETRIES_CONFIG
+from cloudwatcher.metricwatcher import METRIC_DATA_QUERIES_MAX
+
+_LOGGER = logging.getLogger(__name__)
+
+# maximum number of values of a DescribeInstances filter
+DESCRIBE_INSTANCES_FILTER_VALUES_MAX = 200
+# the highest state code of a running instance, pending (0) or running (16),
+# the high byte of the code is internal and ignored, see:
+# https://docs.aws.amazon.com/AWSEC2/latest/APIReference/API_InstanceState.html # noqa: E501
+RUNNING_STATE_CODE_MAX = 16
+STATE_CODE_MASK = 0xFF
+# maximum number of requests sent concurrently
+UPTIME_WORKERS = 4
+REPORT_FORMATS = ["csv", "parquet"]
+
+
+@dataclass
+class InstanceLifetime:
+    """
+    The lifetime of an EC2 instance
+
+    Args:
+        instance_id (str): The ID of the instance
+        state (Optional[str]): The state of the instance, None if it is not
+            described by EC2 anymore
+        instance_type (Optional[str]): The type of the instance
+        launch_time (Optional[datetime.datetime]): The time the instance was
+            last launched
+        first_seen (Optional[datetime.datetime]): The timestamp of the earliest
+            datapoint reported by the instance
+        last_seen (Optional[datetime.datetime]): The timestamp of the latest
+            datapoint reported by the instance
+        uptime (Optional[float]): The uptime of the instance in seconds, None
+            if it could not be determined
+        source (Optional[str]): How the uptime was determined, `launch_time`
+            for the running instances and `metrics` for the other ones
+    """
+
+    instance_id: str
+    state: Optional[str] = None
+    instance_type: Optional[str] = None
+    launch_time: Optional[datetime.datetime] = None
+    first_seen: Optional[datetime.datetime] = None
+    last_seen: Optional[datetime.datetime] = None
+    uptime: Optional[float] = None
+    source: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the lifetime to a row of the report
+
+        Returns:
+            Dict[str, Any]: the lifetime, with the timestamps in ISO 8601 format
+                and the uptime in seconds and hours
+        """
+        row: Dict[str, Any] = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            row[f.name] = (
+                value.isoformat() if isinstance(value, datetime.datetime) else value
+            )
+        row["uptime_hours"] = self.uptime / 3600 if self.uptime is not None else None
+        return row
+
+
+class UptimeReporter(CloudWatcher):
+    """
+    A class for the uptime of many EC2 instances
+
+    The instances are described in bulk, with up to 200 instances per
+    `DescribeInstances` request. The uptime of the running instances is
+    computed from their launch time. The stopped, terminated and no longer
+    described instances are queried for a metric reported by every instance,
+    `CPUUtilization` by default, with up to 500 instances per batched
+    `GetMetricData` request, and their uptime is the time between their
+    first and last datapoints. The requests are sent by a bounded pool of
+    workers and each series is reduced to its first and last datapoints
+    as soon as it is received.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "AWS/EC2",
+        metric_name: str = "CPUUtilization",
+        dimension_name: str = "InstanceId",
+        workers: int = UPTIME_WORKERS,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        aws_region_name: Optional[str] = None,
+        client: Optional[Any] = None,
+        ec2_client: Optional[Any] = None,
+    ) -> None:
+        """
+        Initialize UptimeReporter
+
+        Args:
+            namespace (str): the namespace of the metric reported by the instances
+            metric_name (str): the name of the metric reported by the instances
+            dimension_name (str): the name of the dimension holding the instance ID
+            workers (int): the maximum number of requests sent concurrently
+            aws_access_key_id (Optional[str]): the AWS access key ID
+            aws_secret_access_key (Optional[str]): the AWS secret access key
+            aws_session_token (Optional[str]): the AWS session token
+            aws_region_name (Optional[str]): the AWS region name
+            client (Optional[Any]): an existing CloudWatch client to reuse
+            ec2_client (Optional[Any]): an existing EC2 client to reuse
+        """
+        if workers < 1:
+            raise ValueError(f"Invalid number of workers: {workers}")
+        super().__init__(
+            service_name="cloudwatch",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            aws_region_name=aws_region_name,
+            client=client,
+        )
+        self.namespace = namespace
+        self.metric_name = metric_name
+        self.dimension_name = dimension_name
+        self.workers = workers
+        self._aws_credentials = dict(
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+        )
+        self._ec2_client = ec2_client
+        if ec2_client is not None:
+            self.governor.attach(ec2_client)
+            self.instrumentation.attach(ec2_client)
+
+    def __repr__(self) -> str:
+        return f"UptimeReporter({self.namespace}/{self.metric_name})"
+
+    @property
+    def ec2_client(self) -> Any:
+        """
+        Get the EC2 client, created on the first use
+
+        Returns:
+            Any: the EC2 client
+        """
+        if self._ec2_client is None:
+            self._ec2_client = boto3.client(
+                service_name="ec2",
+                region_name=self.aws_region_name,
+                config=NO_RETRIES_CONFIG,
+                **self._aws_credentials,
+            )
+            self.governor.attach(self._ec2_client)
+            self.instrumentation.attach(self._ec2_client)
+        return self._ec2_client
+
+    def _describe(self, filters: List[Dict]) -> List[Dict]:
+        paginator = self.ec2_client.get_paginator("describe_instances")
+        return [
+            instance
+            for page in paginator.paginate(Filters=filters)
+            for reservation in page["Reservations"]
+            for instance in reservation["Instances"]
+        ]
+
+    def describe_instances(
+        self, instance_ids: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Describe the instances in bulk
+
+        The instances are filtered by ID rather than requested by ID, so that
+        the instances that are not described by EC2 anymore do not fail
+        the requests.
+
+        Args:
+            instance_ids (Optional[List[str]]): the IDs of the instances,
+                all the instances described by EC2 if not provided
+
+        Returns:
+            Dict[str, Dict]: the descriptions of the instances found, by ID
+        """
+        if instance_ids is None:
+            batches = [[]]
+        else:
+            batches = [
+                [
+                    {
+                        "Name": "instance-id",
+                        "Values": instance_ids[
+                            i : i + DESCRIBE_INSTANCES_FILTER_VALUES_MAX
+                        ],
+                    }
+                ]
+                for i in range(
+                    0, len(instance_ids), DESCRIBE_INSTANCES_FILTER_VALUES_MAX
+                )
+            ]
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, max(len(batches), 1))
+        ) as executor:
+            pages = list(executor.map(self._describe, batches))
+        instances = {
+            instance["InstanceId"]: instance for page in pages for instance in page
+        }
+        _LOGGER.info(f"Described {len(instances)} EC2 instances")
+        return instances
+
+    def _metric_lifetimes(
+        self,
+        instance_ids: List[str],
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        period: int,
+    ) -> Dict[str, InstanceLifetime]:
+        fleet_watcher = FleetWatcher(
+            namespace=self.namespace,
+            metric_name=self.metric_name,
+            dimension_name=self.dimension_name,
+            dimension_values=instance_ids,
+            client=self.client,
+        )
+        lifetimes: Dict[str, InstanceLifetime] = {}
+        for instance_id, timed_metric in fleet_watcher.iter_timed_metrics(
+            start_time=start_time,
+            end_time=end_time,
+            stat="SampleCount",
+            period=period,
+        ):
+            if not timed_metric.timestamps:
+                continue
+            lifetimes[instance_id] = InstanceLifetime(
+                instance_id=instance_id,
+                first_seen=timed_metric.earliest,
+                last_seen=timed_metric.latest,
+                uptime=timed_metric.timespan.total_seconds(),
+                source="metrics",
+            )
+        return lifetimes
+
+    def metric_lifetimes(
+        self,
+        instance_ids: List[str],
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        period: int = 300,
+    ) -> Dict[str, InstanceLifetime]:
+        """
+        Estimate the lifetimes of the instances from their first and last datapoints
+
+        Args:
+            instance_ids (List[str]): the IDs of the instances
+            start_time (datetime.datetime): the start of the time range
+            end_time (datetime.datetime): the end of the time range
+            period (int): the period of the metric, the precision of the uptime
+
+        Returns:
+            Dict[str, InstanceLifetime]: the lifetimes of the instances with
+                datapoints in the time range, by ID
+        """
+        batches = [
+            instance_ids[i : i + METRIC_DATA_QUERIES_MAX]
+            for i in range(0, len(instance_ids), METRIC_DATA_QUERIES_MAX)
+        ]
+        if not batches:
+            return {}
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(batches))
+        ) as executor:
+            results = list(
+                executor.map(
+                    lambda batch: self._metric_lifetimes(
+                        batch, start_time, end_time, period
+                    ),
+                    batches,
+                )
+            )
+        return {k: v for result in results for k, v in result.items()}
+
+    def report(
+        self,
+        start_time: datetime.datetime,
+        end_time: Optional[datetime.datetime] = None,
+        instance_ids: Optional[List[str]] = None,
+        period: int = 300,
+    ) -> List[InstanceLifetime]:
+        """
+        Get the lifetimes of the instances
+
+        Args:
+            start_time (datetime.datetime): the start of the time range the
+                metric is queried in, for the instances not running
+            end_time (Optional[datetime.datetime]): the end of the time range,
+                now if not provided
+            instance_ids (Optional[List[str]]): the IDs of the instances,
+                all the instances described by EC2 if not provided
+            period (int): the period of the metric, the precision of the uptime
+                of the instances not running
+
+        Returns:
+            List[InstanceLifetime]: the lifetimes, in the order of the instance IDs
+        """
+        end_time = end_time or datetime.datetime.now(pytz.utc)
+        if instance_ids is not None:
+            instance_ids = list(dict.fromkeys(instance_ids))
+        descriptions = self.describe_instances(instance_ids)
+        if instance_ids is None:
+            instance_ids = sorted(descriptions)
+        lifetimes: Dict[str, InstanceLifetime] = {}
+        stopped = []
+        for instance_id in instance_ids:
+            description = descriptions.get(instance_id)
+            lifetime = InstanceLifetime(instance_id=instance_id)
+            if description is not None:
+                lifetime.state = description["State"]["Name"]
+                lifetime.instance_type = description.get("InstanceType")
+                lifetime.launch_time = description.get("LaunchTime")
+            if (
+                description is not None
+                and (description["State"]["Code"] & STATE_CODE_MASK)
+                <= RUNNING_STATE_CODE_MAX
+            ):
+                lifetime.uptime = (end_time - lifetime.launch_time).total_seconds()
+                lifetime.source = "launch_time"
+            else:
+                stopped.append(instance_id)
+            lifetimes[instance_id] = lifetime
+        _LOGGER.info(
+            f"Querying '{self.metric_name}' for {len(stopped)} instances not running"
+        )
+        for instance_id, estimate in self.metric_lifetimes(
+            stopped, start_time=start_time, end_time=end_time, period=period
+        ).items():
+            lifetime = lifetimes[instance_id]
+            lifetime.first_seen = estimate.first_seen
+            lifetime.last_seen = estimate.last_seen
+            lifetime.uptime = estimate.uptime
+            lifetime.source = estimate.source
+        missing = [lt.instance_id for lt in lifetimes.values() if lt.uptime is None]
+        if missing:
+            _LOGGER.warning(
+                f"No uptime found for {len(missing)} instances: "
+                + ", ".join(missing[:10])
+                + (", ..." if len(missing) > 10 else "")
+            )
+        return [lifetimes[instance_id] for instance_id in instance_ids]
+
+    @staticmethod
+    def table(lifetimes: Iterable[InstanceLifetime], title: str) -> Table:
+        """
+        Create a table of the total uptime per instance type and state
+
+        Args:
+            lifetimes (Iterable[InstanceLifetime]): the lifetimes
+            title (str): the title of the table
+
+        Returns:
+            Table: the table
+        """
+        totals: Dict[tuple, List[float]] = {}
+        for lifetime in lifetimes:
+            key = (lifetime.instance_type or "unknown", lifetime.state or "unknown")
+            total = totals.setdefault(key, [0, 0.0])
+            total[0] += 1
+            total[1] += lifetime.uptime or 0.0
+        table = Table(title=title)
+        table.add_column("Instance type")
+        table.add_column("State")
+        table.add_column("Instances", justify="right")
+        table.add_column("Uptime (h)", justify="right")
+        for (instance_type, state), (count, uptime) in sorted(totals.items()):
+            table.add_row(instance_type, state, str(count), f"{uptime / 3600:.2f}")
+        return table
+
+    @staticmethod
+    def save(
+        file_path: str, lifetimes: List[InstanceLifetime], file_format: str = "csv"
+    ) -> None:
+        """
+        Save the lifetimes to a table
+
+        Args:
+            file_path (str): the path of the file to write
+            lifetimes (List[InstanceLifetime]): the lifetimes
+            file_format (str): the format of the file, `csv`, or `parquet` if
+                `pyarrow` is installed
+        """
+        rows = [lifetime.to_dict() for lifetime in lifetimes]
+        columns = [f.name for f in fields(InstanceLifetime)] + ["uptime_hours"]
+        if file_format == "csv":
+            with open(file_path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+        elif file_format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError(
+                    "The parquet format requires pyarrow, "
+                    "install it with: pip install cloudwatcher[parquet]"
+                )
+            # the timestamps are kept as timestamps rather than strings
+            data = {
+                f.name: [getattr(lifetime, f.name) for lifetime in lifetimes]
+                for f in fields(InstanceLifetime)
+            }
+            data["uptime_hours"] = [row["uptime_hours"] for row in rows]
+            pq.write_table(pa.table(data), file_path)
+        else:
+            raise ValueError(
+                f"Invalid report format: {file_format}. "
+                f"Must be one of: {REPORT_FORMATS}"
+            )
+        _LOGGER.info(f"Saved the uptime of {len(rows)} instances to: {file_path}")